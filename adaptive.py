@@ -0,0 +1,222 @@
+"""
+adaptive.py
+Online ability / difficulty estimates and the adaptive quiz mode.
+
+Ratings follow a 1PL (Rasch) model fitted online with an Elo-style rule: the
+chance that a user of ability θ answers a question of difficulty b correctly
+is 1 / (1 + e^(b − θ)), and every answer nudges both towards the outcome:
+
+    θ += K(n_user) · (correct − p)        b −= K(n_question) · (correct − p)
+
+with K(n) = ELO_K / (1 + ELO_DECAY · n), so new users and new questions move
+fast and settle as evidence builds up. Abilities are kept per (user,
+category); a question starts from its hand label (1/2/3 → −1/0/+1).
+record_result() applies the update in the grading transaction: two point
+reads and two upserts.
+
+Adaptive quizzes pick each next question after the previous answer is graded:
+the one whose difficulty is nearest θ − ln(p/(1−p)) for a target success rate
+p (ADAPTIVE_TARGET, default 0.7), taken from a per-category list of
+(difficulty, question_id) kept sorted in memory — a bisect plus a short walk
+past questions already in the quiz.
+"""
+
+import math
+import os
+import random
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from content_watch import content_watch
+
+ELO_K = 0.8
+ELO_DECAY = 0.05
+DIFFICULTY_PRIOR = {1: -1.0, 2: 0.0, 3: 1.0}
+ADAPTIVE_TARGET = float(os.environ.get("ADAPTIVE_TARGET", 0.7))
+ADAPTIVE_SPREAD = 3  # pick at random among this many nearest questions
+DIFFICULTY_INDEX_TTL = float(os.environ.get("DIFFICULTY_INDEX_TTL", 300))
+
+
+def expected(ability, difficulty):
+    """Probability of a correct answer under the 1PL model."""
+    return 1.0 / (1.0 + math.exp(difficulty - ability))
+
+
+def k_factor(answers):
+    return ELO_K / (1.0 + ELO_DECAY * answers)
+
+
+def ensure_ratings_tables(db):
+    """Create user_ability / question_ratings and fill them by replaying results
+    the first time. Safe to call on every startup; needs the partition catalog (partitions.py)."""
+    exists = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'question_ratings'"
+    ).fetchone()
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS user_ability (
+            user_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            ability REAL NOT NULL DEFAULT 0,
+            answers INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category_id)
+        ) WITHOUT ROWID
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS question_ratings (
+            question_id INTEGER PRIMARY KEY,
+            difficulty REAL NOT NULL,
+            answers INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    db.commit()
+    if not exists:
+        backfill_ratings(db)
+
+
+def update_ratings(db, user_id, question_id, is_correct):
+    """Apply one answer to the user's ability in the question's category and to
+    the question's difficulty. Caller commits."""
+    row = db.execute("""
+        SELECT q.category_id, q.difficulty AS label, r.difficulty, r.answers AS question_answers,
+               u.ability, u.answers AS user_answers
+        FROM questions q
+        LEFT JOIN question_ratings r ON r.question_id = q.id
+        LEFT JOIN user_ability u ON u.user_id = ? AND u.category_id = q.category_id
+        WHERE q.id = ?
+    """, (user_id, question_id)).fetchone()
+    if row is None:
+        return
+    ability = row["ability"] if row["ability"] is not None else 0.0
+    difficulty = row["difficulty"] if row["difficulty"] is not None else DIFFICULTY_PRIOR.get(row["label"], 0.0)
+    user_answers, question_answers = row["user_answers"] or 0, row["question_answers"] or 0
+
+    surprise = is_correct - expected(ability, difficulty)
+    ability += k_factor(user_answers) * surprise
+    difficulty -= k_factor(question_answers) * surprise
+
+    db.execute("""
+        INSERT INTO user_ability (user_id, category_id, ability, answers) VALUES (?, ?, ?, 1)
+        ON CONFLICT (user_id, category_id) DO UPDATE SET ability = excluded.ability, answers = answers + 1
+    """, (user_id, row["category_id"], ability))
+    db.execute("""
+        INSERT INTO question_ratings (question_id, difficulty, answers) VALUES (?, ?, 1)
+        ON CONFLICT (question_id) DO UPDATE SET difficulty = excluded.difficulty, answers = answers + 1
+    """, (question_id, difficulty))
+    difficulty_index.move(question_id, difficulty)
+
+
+def backfill_ratings(db):
+    """Rebuild user_ability and question_ratings by replaying every result in
+    answer order, archived months included. The replay is order-dependent, so
+    it runs under the write lock: answers graded meanwhile wait instead of
+    being overwritten."""
+    from partitions import replay_results  # partitions imports helpers, which imports this module
+
+    db.execute("BEGIN IMMEDIATE")
+    questions = {qid: (category_id, DIFFICULTY_PRIOR.get(label, 0.0), 0)
+                 for qid, category_id, label in db.execute("SELECT id, category_id, difficulty FROM questions")}
+    users = {}
+    for user_id, question_id, is_correct in replay_results(db, ("user_id", "question_id", "is_correct")):
+        if question_id not in questions:
+            continue
+        category_id, difficulty, question_answers = questions[question_id]
+        ability, user_answers = users.get((user_id, category_id), (0.0, 0))
+        surprise = is_correct - expected(ability, difficulty)
+        users[(user_id, category_id)] = (ability + k_factor(user_answers) * surprise, user_answers + 1)
+        questions[question_id] = (category_id, difficulty - k_factor(question_answers) * surprise,
+                                  question_answers + 1)
+
+    db.execute("DELETE FROM user_ability")
+    db.execute("DELETE FROM question_ratings")
+    db.executemany("INSERT INTO user_ability (user_id, category_id, ability, answers) VALUES (?, ?, ?, ?)",
+                   [(u, c, ability, n) for (u, c), (ability, n) in users.items()])
+    db.executemany("INSERT INTO question_ratings (question_id, difficulty, answers) VALUES (?, ?, ?)",
+                   [(qid, difficulty, n) for qid, (_, difficulty, n) in questions.items() if n])
+    db.commit()
+    difficulty_index.invalidate()
+    return len(users) + len(questions)
+
+
+def user_ability(db, user_id, category_id):
+    row = db.execute("SELECT ability FROM user_ability WHERE user_id = ? AND category_id = ?",
+                     (user_id, category_id)).fetchone()
+    return row[0] if row else 0.0
+
+
+# ─────────────────────────────────────────────
+# DIFFICULTY INDEX
+# ─────────────────────────────────────────────
+
+class DifficultyIndex:
+    """
+    Per-category lists of (difficulty, question_id), kept sorted. Loaded lazily,
+    reloaded after invalidate() (content_watch calls it when questions change)
+    or DIFFICULTY_INDEX_TTL seconds (so other workers' rating updates show up),
+    and patched in place by move() for answers graded in this worker.
+    """
+
+    def __init__(self, ttl=DIFFICULTY_INDEX_TTL):
+        self.ttl = ttl
+        self._entries = None
+        self._where = {}
+        self._loaded_at = 0.0
+
+    def invalidate(self):
+        self._entries = None
+
+    def entries(self, db):
+        if self._entries is None or time.monotonic() - self._loaded_at > self.ttl:
+            entries, where = defaultdict(list), {}
+            for qid, category_id, label, difficulty in db.execute("""
+                    SELECT q.id, q.category_id, q.difficulty, r.difficulty
+                    FROM questions q LEFT JOIN question_ratings r ON r.question_id = q.id"""):
+                if difficulty is None:
+                    difficulty = DIFFICULTY_PRIOR.get(label, 0.0)
+                entries[category_id].append((difficulty, qid))
+                where[qid] = (category_id, difficulty)
+            for items in entries.values():
+                items.sort()
+            self._entries, self._where = dict(entries), where
+            self._loaded_at = time.monotonic()
+        return self._entries
+
+    def move(self, question_id, difficulty):
+        """Re-file one question under its new difficulty (no-op until loaded)."""
+        if self._entries is None or question_id not in self._where:
+            return
+        category_id, old = self._where[question_id]
+        items = self._entries[category_id]
+        i = bisect_left(items, (old, question_id))
+        if i < len(items) and items[i] == (old, question_id):
+            del items[i]
+        insort(items, (difficulty, question_id))
+        self._where[question_id] = (category_id, difficulty)
+
+    def nearest(self, db, category_id, target, exclude=(), spread=ADAPTIVE_SPREAD):
+        """One of the `spread` questions whose difficulty is closest to target,
+        skipping ids in exclude; None when the category has nothing left."""
+        items = self.entries(db).get(category_id, [])
+        hi = bisect_left(items, (target, -1))
+        lo = hi - 1
+        found = []
+        while len(found) < spread and (lo >= 0 or hi < len(items)):
+            if hi >= len(items) or (lo >= 0 and target - items[lo][0] <= items[hi][0] - target):
+                qid, lo = items[lo][1], lo - 1
+            else:
+                qid, hi = items[hi][1], hi + 1
+            if qid not in exclude:
+                found.append(qid)
+        return random.choice(found) if found else None
+
+
+def pick_adaptive_question(db, user_id, category_id, exclude=()):
+    """Next question for an adaptive quiz: difficulty pitched so the user's
+    expected success rate is ADAPTIVE_TARGET."""
+    target = user_ability(db, user_id, category_id) - math.log(ADAPTIVE_TARGET / (1 - ADAPTIVE_TARGET))
+    return difficulty_index.nearest(db, category_id, target, set(exclude))
+
+
+# One per process, dropped whenever the question bank changes
+difficulty_index = DifficultyIndex()
+content_watch.subscribe(difficulty_index.invalidate)
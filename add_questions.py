@@ -4,10 +4,7 @@ Run to add additional questions to the existing database.
 Usage: python add_questions.py
 """
 
-import sqlite3
-import os
-
-DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nuclear_quiz.db")
+from content_db import edit_content
 
 
 def add_question(db, category_id, question_text, answers, correct_index, explanation, difficulty=1, source=""):
@@ -23,11 +20,7 @@ def add_question(db, category_id, question_text, answers, correct_index, explana
         """, (question_id, answer_text, 1 if i == correct_index else 0))
 
 
-def main():
-    db = sqlite3.connect(DATABASE)
-    db.row_factory = sqlite3.Row
-    db.execute("PRAGMA foreign_keys = ON")
-
+def add_all(db):
     # ── CANDU REACTOR SYSTEMS (category_id = 1) ──────────────────────────────
 
     add_question(db, 1,
@@ -528,8 +521,11 @@ def main():
         source="IAEA INFCIRC/153; CNSC Regulatory Framework"
     )
 
-    db.commit()
-    db.close()
+
+def main():
+    # The question bank is content.db now; edit_content() swaps in the updated copy
+    with edit_content() as db:
+        add_all(db)
 
     print("Done! Added questions:")
     print("  CANDU Reactor Systems:        8 new questions")
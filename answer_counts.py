@@ -0,0 +1,149 @@
+"""
+answer_counts.py
+Live answer-distribution counters for distractor analysis.
+
+question_counters holds attempts and correct answers per question and
+answer_counters how many times each option has been picked. record_result()
+bumps both in the grading transaction (two primary-key upserts), so "how
+often is each wrong answer chosen" is a lookup instead of a GROUP BY
+answer_id over the whole of results.
+
+Counts are lifetime totals, like the dashboard counters in stats.py: deleting
+a user or rolling results into partitions does not subtract anything.
+`maintenance.py rebuild-answer-counts` recomputes them from results_all and
+the archived months.
+item_analysis.py adds the slower, periodically computed statistics
+(discrimination, flags) on top.
+"""
+
+
+def ensure_answer_counts_tables(db):
+    """Create question_counters / answer_counters and fill them from results the
+    first time. Safe to call on every startup; needs results_all (partitions.py)."""
+    exists = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'answer_counters'"
+    ).fetchone()
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS question_counters (
+            question_id INTEGER PRIMARY KEY,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS answer_counters (
+            answer_id INTEGER PRIMARY KEY,
+            question_id INTEGER NOT NULL,
+            picks INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_answer_counters_question ON answer_counters (question_id)")
+    db.commit()
+    if not exists:
+        rebuild_answer_counts(db)
+
+
+def update_answer_counts(db, question_id, answer_id, is_correct):
+    """Count one graded answer. Caller commits."""
+    db.execute("""
+        INSERT INTO question_counters (question_id, attempts, correct) VALUES (?, 1, ?)
+        ON CONFLICT (question_id) DO UPDATE SET
+            attempts = attempts + 1,
+            correct = correct + excluded.correct
+    """, (question_id, is_correct))
+    if answer_id is not None:
+        db.execute("""
+            INSERT INTO answer_counters (answer_id, question_id, picks) VALUES (?, ?, 1)
+            ON CONFLICT (answer_id) DO UPDATE SET picks = picks + 1
+        """, (answer_id, question_id))
+
+
+def rebuild_answer_counts(db):
+    """Recompute both tables from results_all (hot table and partitions) plus every
+    archive file. Archives are summed before the write lock is taken."""
+    from partitions import iter_archive  # partitions imports helpers, which imports this module
+
+    questions, answers = {}, {}
+    for archive in db.execute(
+            "SELECT archive_path FROM results_partitions WHERE state = 'archived' ORDER BY month").fetchall():
+        for row in iter_archive(archive["archive_path"]):
+            attempts, correct = questions.get(row["question_id"], (0, 0))
+            questions[row["question_id"]] = (attempts + 1, correct + row["is_correct"])
+            question_id, picks = answers.get(row["answer_id"], (row["question_id"], 0))
+            answers[row["answer_id"]] = (min(question_id, row["question_id"]), picks + 1)
+
+    db.execute("BEGIN IMMEDIATE")
+    db.execute("DELETE FROM question_counters")
+    db.execute("DELETE FROM answer_counters")
+    db.execute("""
+        INSERT INTO question_counters (question_id, attempts, correct)
+        SELECT question_id, COUNT(*), SUM(is_correct) FROM results_all GROUP BY question_id
+    """)
+    db.execute("""
+        INSERT INTO answer_counters (answer_id, question_id, picks)
+        SELECT answer_id, MIN(question_id), COUNT(*) FROM results_all
+        WHERE answer_id IS NOT NULL GROUP BY answer_id
+    """)
+    db.executemany("""
+        INSERT INTO question_counters (question_id, attempts, correct) VALUES (?, ?, ?)
+        ON CONFLICT (question_id) DO UPDATE SET
+            attempts = attempts + excluded.attempts,
+            correct = correct + excluded.correct
+    """, [(qid, attempts, correct) for qid, (attempts, correct) in questions.items()])
+    db.executemany("""
+        INSERT INTO answer_counters (answer_id, question_id, picks) VALUES (?, ?, ?)
+        ON CONFLICT (answer_id) DO UPDATE SET
+            question_id = MIN(question_id, excluded.question_id),
+            picks = picks + excluded.picks
+    """, [(aid, qid, picks) for aid, (qid, picks) in answers.items()])
+    db.commit()
+    return db.execute("SELECT (SELECT COUNT(*) FROM question_counters) + (SELECT COUNT(*) FROM answer_counters)"
+                      ).fetchone()[0]
+
+
+def _distribution(attempts, correct, options):
+    return {
+        "attempts": attempts,
+        "correct": correct,
+        "accuracy": round(correct / attempts, 4) if attempts else None,
+        "answers": [dict(option, pick_rate=round(option["picks"] / attempts, 4) if attempts else None)
+                    for option in options],
+    }
+
+
+def answer_distribution(db, question_id):
+    """Attempts, accuracy and every option's picks / pick rate for one question,
+    or None if it doesn't exist. Options come back in id order."""
+    question = db.execute("""
+        SELECT q.id, COALESCE(c.attempts, 0) AS attempts, COALESCE(c.correct, 0) AS correct
+        FROM questions q LEFT JOIN question_counters c ON c.question_id = q.id
+        WHERE q.id = ?
+    """, (question_id,)).fetchone()
+    if question is None:
+        return None
+    options = [dict(r) for r in db.execute("""
+        SELECT a.id AS answer_id, a.answer_text, a.is_correct, COALESCE(c.picks, 0) AS picks
+        FROM answers a LEFT JOIN answer_counters c ON c.answer_id = a.id
+        WHERE a.question_id = ?
+        ORDER BY a.id
+    """, (question_id,))]
+    return dict(_distribution(question["attempts"], question["correct"], options), question_id=question_id)
+
+
+def distributions_for_questions(db, question_ids):
+    """{question_id: answer_distribution without answer texts} for a page of
+    questions; ones never answered are absent."""
+    if not question_ids:
+        return {}
+    marks = ",".join("?" * len(question_ids))
+    totals = {r["question_id"]: (r["attempts"], r["correct"]) for r in db.execute(
+        f"SELECT * FROM question_counters WHERE question_id IN ({marks}) AND attempts > 0", question_ids)}
+    options = {}
+    for r in db.execute(f"""
+            SELECT a.question_id, a.id AS answer_id, a.is_correct, COALESCE(c.picks, 0) AS picks
+            FROM answers a LEFT JOIN answer_counters c ON c.answer_id = a.id
+            WHERE a.question_id IN ({marks}) ORDER BY a.id""", question_ids):
+        options.setdefault(r["question_id"], []).append(
+            {"answer_id": r["answer_id"], "is_correct": r["is_correct"], "picks": r["picks"]})
+    return {qid: _distribution(attempts, correct, options.get(qid, []))
+            for qid, (attempts, correct) in totals.items()}
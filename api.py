@@ -1,12 +1,25 @@
-import json
-import uuid
 from datetime import datetime, timezone, timedelta
 
 import jwt
-from flask import Blueprint, g, jsonify, request, current_app
+from flask import Blueprint, Response, g, jsonify, request, current_app
 from werkzeug.security import check_password_hash, generate_password_hash
 
-from helpers import get_db, jwt_required
+from helpers import get_db, jwt_required, api_admin_required, delete_user_data
+from quizzes import (QUIZ_LENGTH, QUIZ_MODES, MODE_LABELS, MAX_MIX_LENGTH, EXAM_LENGTH, MAX_EXAM_LENGTH,
+                     create_quiz_session, get_open_quiz, question_count, question_id_at, parse_blueprint,
+                     pick_category_questions, pick_exam_questions, start_adaptive_quiz, advance_quiz,
+                     quiz_review, get_quiz_session)
+from question_index import parse_difficulty, parse_difficulty_mix
+from question_bank import question_bank
+from spaced_repetition import due_question_ids, next_due_at
+from question_state import mistake_question_ids, weak_questions
+from search import search_questions, parse_cursor, SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE
+from training_records import RECORD_FORMATS, USER_COLUMNS, iter_records, export_records, parse_bound
+from leaderboard import METRICS, GLOBAL, LEADERBOARD_CACHE_ROWS, leaderboard
+from answer_counts import answer_distribution
+from item_analysis import stats_for_questions
+from ratelimit import rate_limited, rate_limit_metrics, prometheus_text
+from json_provider import json_bytes_response
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
@@ -34,15 +47,12 @@ def _get_quiz_session(db, quiz_id, user_id):
     return quiz, None
 
 
-def _parse_question_ids(quiz):
-    return json.loads(quiz["question_ids"])
-
-
 # ─────────────────────────────────────────────
 # AUTH & ACCOUNT
 # ─────────────────────────────────────────────
 
 @api_bp.route("/auth/register", methods=["POST"])
+@rate_limited("register")
 def api_register():
     data = request.get_json(silent=True) or {}
     username = data.get("username", "").strip()
@@ -68,6 +78,7 @@ def api_register():
 
 
 @api_bp.route("/auth/login", methods=["POST"])
+@rate_limited("login")
 def api_login():
     data = request.get_json(silent=True) or {}
     username = data.get("username", "").strip()
@@ -86,6 +97,7 @@ def api_login():
 
 
 @api_bp.route("/auth/reset-password", methods=["POST"])
+@rate_limited("reset-password")
 def api_reset_password():
     # Admin/Safety reset: Overwrites password using username.
     # In a real app, this would require email verification.
@@ -133,9 +145,7 @@ def api_change_password():
 def api_delete_account():
     db = get_db()
     # Delete results, sessions, and then the user
-    db.execute("DELETE FROM results WHERE user_id = ?", (g.user_id,))
-    db.execute("DELETE FROM quiz_sessions WHERE user_id = ?", (g.user_id,))
-    db.execute("DELETE FROM users WHERE id = ?", (g.user_id,))
+    delete_user_data(db, g.user_id)
     db.commit()
     return jsonify({"message": "Account deleted forever"}), 200
 
@@ -156,7 +166,47 @@ def api_categories():
         GROUP BY c.id
         ORDER BY c.name
     """).fetchall()
-    return jsonify([dict(r) for r in rows])
+    return jsonify(rows)
+
+
+# ─────────────────────────────────────────────
+# SEARCH
+# ─────────────────────────────────────────────
+
+@api_bp.route("/search")
+@jwt_required
+def api_search():
+    """
+    Ranked full-text search over questions, explanations, sources and answers.
+    ?q=xenon [&category_id=3] [&limit=20] [&cursor=<next_cursor from the previous page>]
+    Snippets are HTML-escaped with matches wrapped in <mark>.
+    """
+    text = request.args.get("q", "").strip()
+    if not text:
+        return jsonify({"error": "q is required"}), 400
+    limit = min(max(request.args.get("limit", SEARCH_PAGE_SIZE, type=int), 1), MAX_SEARCH_PAGE_SIZE)
+    after = None
+    if request.args.get("cursor"):
+        try:
+            after = parse_cursor(request.args["cursor"])
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    db = get_db()
+    rows, next_cursor = search_questions(db, text, limit, after, request.args.get("category_id", type=int))
+    return jsonify({
+        "query": text,
+        "results": [{
+            "question_id": r["id"],
+            "category_id": r["category_id"],
+            "category_name": r["category_name"],
+            "difficulty": r["difficulty"],
+            "question_text": r["question_text"],
+            "snippet": r["snippet"],
+            "score": round(-r["score"], 4),  # bm25 is lower-is-better; flip so higher is better
+        } for r in rows],
+        "next_cursor": next_cursor,
+    })
 
 
 # ─────────────────────────────────────────────
@@ -165,39 +215,120 @@ def api_categories():
 
 @api_bp.route("/quiz/start", methods=["POST"])
 @jwt_required
+@rate_limited("quiz-start")
 def api_quiz_start():
     data = request.get_json(silent=True) or {}
+    mode = data.get("mode", "category")
     category_id = data.get("category_id")
-    if not category_id:
+    if mode not in QUIZ_MODES:
+        return jsonify({"error": f"mode must be one of: {', '.join(QUIZ_MODES)}"}), 400
+    if not category_id and mode in ("category", "adaptive"):
         return jsonify({"error": "category_id is required"}), 400
+    if mode == "exam":
+        category_id = None  # exams span categories; see "blueprint"
 
     db = get_db()
-    category = db.execute("SELECT * FROM categories WHERE id = ?", (category_id,)).fetchone()
-    if not category:
-        return jsonify({"error": "Category not found"}), 404
-
-    questions = db.execute("""
-        SELECT id FROM questions WHERE category_id = ?
-        ORDER BY RANDOM() LIMIT 10
-    """, (category_id,)).fetchall()
-    if not questions:
-        return jsonify({"error": "No questions available in this category"}), 404
-
-    quiz_id = str(uuid.uuid4())
-    question_ids = json.dumps([q["id"] for q in questions])
-    db.execute("""
-        INSERT INTO quiz_sessions (id, user_id, category_id, question_ids)
-        VALUES (?, ?, ?, ?)
-    """, (quiz_id, g.user_id, category_id, question_ids))
+    category = None
+    if category_id:
+        category = db.execute("SELECT * FROM categories WHERE id = ?", (category_id,)).fetchone()
+        if not category:
+            return jsonify({"error": "Category not found"}), 404
+
+    if mode == "review":
+        # Spaced repetition: most overdue first, straight off the (user_id, due_at) index
+        question_ids = due_question_ids(db, g.user_id, QUIZ_LENGTH, category_id)
+        if not question_ids:
+            return jsonify({"error": "No questions due for review",
+                            "next_due_at": next_due_at(db, g.user_id)}), 404
+    elif mode == "mistakes":
+        # Questions whose latest answer was wrong, from user_question_state
+        question_ids = mistake_question_ids(db, g.user_id, QUIZ_LENGTH, category_id)
+        if not question_ids:
+            return jsonify({"error": "No mistakes to review"}), 404
+    elif mode == "exam":
+        # Mock exam: "total_questions" (default 100) drawn across categories in
+        # proportion to "blueprint" ({category_id: weight}) or to the bank itself
+        total = data.get("total_questions", EXAM_LENGTH)
+        if isinstance(total, bool) or not isinstance(total, int) or not 0 < total <= MAX_EXAM_LENGTH:
+            return jsonify({"error": f"total_questions must be 1-{MAX_EXAM_LENGTH}"}), 400
+        blueprint = None
+        if data.get("blueprint") is not None:
+            try:
+                blueprint = parse_blueprint(data["blueprint"])
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            known = {r[0] for r in db.execute("SELECT id FROM categories")}
+            unknown = sorted(set(blueprint) - known)
+            if unknown:
+                return jsonify({"error": f"Category not found: {unknown[0]}"}), 404
+        question_ids = pick_exam_questions(db, blueprint, total)
+        if not question_ids:
+            return jsonify({"error": "No questions available for this blueprint"}), 404
+    elif mode == "adaptive":
+        # One question at a time, each pitched at the user's current ability
+        # estimate (adaptive.py); "total_questions" sets the length
+        total = data.get("total_questions", QUIZ_LENGTH)
+        if isinstance(total, bool) or not isinstance(total, int) or not 0 < total <= MAX_MIX_LENGTH:
+            return jsonify({"error": f"total_questions must be 1-{MAX_MIX_LENGTH}"}), 400
+        quiz_id = start_adaptive_quiz(db, g.user_id, category["id"], total)
+        if not quiz_id:
+            return jsonify({"error": "No questions available in this category"}), 404
+        db.commit()
+        return jsonify({
+            "quiz_id": quiz_id,
+            "mode": mode,
+            "category_name": category["name"],
+            "total_questions": question_count(get_quiz_session(db, quiz_id)),
+        }), 201
+    else:
+        # Optional difficulty control: a target level ("difficulty": 2 or "medium")
+        # or an explicit mix ("difficulty_mix": {"easy": 3, "medium": 5, "hard": 2})
+        target = mix = None
+        if data.get("difficulty") is not None:
+            target = parse_difficulty(data["difficulty"])
+            if target is None:
+                return jsonify({"error": "difficulty must be 1-3 or easy/medium/hard"}), 400
+        if data.get("difficulty_mix") is not None:
+            try:
+                mix = parse_difficulty_mix(data["difficulty_mix"])
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            if not 0 < sum(mix.values()) <= MAX_MIX_LENGTH:
+                return jsonify({"error": f"difficulty_mix must total 1-{MAX_MIX_LENGTH} questions"}), 400
+
+        question_ids = pick_category_questions(db, category["id"], target, mix)
+        if not question_ids:
+            return jsonify({"error": "No questions available in this category"}), 404
+
+    quiz_id = create_quiz_session(db, g.user_id, category_id, question_ids, mode)
     db.commit()
 
     return jsonify({
         "quiz_id": quiz_id,
-        "category_name": category["name"],
-        "total_questions": len(questions),
+        "mode": mode,
+        "category_name": category["name"] if category else MODE_LABELS[mode],
+        "total_questions": len(question_ids),
     }), 201
 
 
+@api_bp.route("/quiz/current")
+@jwt_required
+def api_quiz_current():
+    """Unfinished quiz to resume (possibly started in the web UI), or 404."""
+    db = get_db()
+    quiz = get_open_quiz(db, g.user_id)
+    if not quiz:
+        return jsonify({"error": "No quiz in progress"}), 404
+    return jsonify({
+        "quiz_id": quiz["id"],
+        "mode": quiz["mode"],
+        "category_name": quiz["category_name"],
+        "questions_answered": quiz["current_index"],
+        "total_questions": question_count(quiz),
+        "score": quiz["score"],
+    })
+
+
 @api_bp.route("/quiz/<quiz_id>")
 @jwt_required
 def api_quiz_question(quiz_id):
@@ -209,22 +340,23 @@ def api_quiz_question(quiz_id):
     if quiz["completed"]:
         return jsonify({"error": "Quiz already completed", "is_complete": True}), 410
 
-    question_ids = _parse_question_ids(quiz)
+    total = question_count(quiz)
     idx = quiz["current_index"]
-    if idx >= len(question_ids):
+    if idx >= total:
         return jsonify({"error": "Quiz already complete", "is_complete": True}), 410
 
-    question_id = question_ids[idx]
-    question = db.execute("SELECT * FROM questions WHERE id = ?", (question_id,)).fetchone()
-    answers = db.execute(
-        "SELECT id, answer_text FROM answers WHERE question_id = ? ORDER BY RANDOM()",
-        (question_id,)
-    ).fetchall()
+    question_id = question_id_at(quiz, idx)
+    # Pre-serialized in content.bank: only the per-session numbers are encoded here
+    body = question_bank.question_payload(question_id, quiz_id, idx + 1, total)
+    if body is not None:
+        return json_bytes_response(body)
+    question = question_bank.question(db, question_id)
+    answers = question_bank.answers(db, question_id, shuffle=True)
 
     return jsonify({
         "quiz_id": quiz_id,
         "question_number": idx + 1,
-        "total_questions": len(question_ids),
+        "total_questions": total,
         "question_id": question["id"],
         "question_text": question["question_text"],
         "answers": [{"id": a["id"], "answer_text": a["answer_text"]} for a in answers],
@@ -247,51 +379,41 @@ def api_quiz_answer(quiz_id):
     if not answer_id:
         return jsonify({"error": "answer_id is required"}), 400
 
-    question_ids = _parse_question_ids(quiz)
+    total = question_count(quiz)
     idx = quiz["current_index"]
-    if idx >= len(question_ids):
+    if idx >= total:
         return jsonify({"error": "Quiz already complete"}), 410
 
-    question_id = question_ids[idx]
-    answer = db.execute(
-        "SELECT * FROM answers WHERE id = ? AND question_id = ?", (answer_id, question_id)
-    ).fetchone()
+    question_id = question_id_at(quiz, idx)
+    answer = question_bank.answer(db, question_id, answer_id)
     if not answer:
         return jsonify({"error": "Invalid answer_id for this question"}), 400
 
-    correct_answer = db.execute(
-        "SELECT * FROM answers WHERE question_id = ? AND is_correct = 1", (question_id,)
-    ).fetchone()
-    question = db.execute("SELECT * FROM questions WHERE id = ?", (question_id,)).fetchone()
-
     is_correct = 1 if answer["is_correct"] else 0
-    new_score = quiz["score"] + is_correct
-    new_index = idx + 1
-    is_complete = new_index >= len(question_ids)
-
-    # Write to results table (shared with web, powers unified progress)
-    db.execute("""
-        INSERT INTO results (user_id, question_id, answer_id, is_correct)
-        VALUES (?, ?, ?, ?)
-    """, (g.user_id, question_id, answer_id, is_correct))
-
-    db.execute("""
-        UPDATE quiz_sessions
-        SET current_index = ?, score = ?, completed = ?
-        WHERE id = ?
-    """, (new_index, new_score, 1 if is_complete else 0, quiz_id))
+
+    # Advances quiz_sessions and writes to results (shared with web, powers unified progress)
+    advanced = advance_quiz(db, quiz, question_id, answer_id, is_correct)
+    if advanced is None:
+        return jsonify({"error": "Question already answered"}), 409
     db.commit()
+    new_index, new_score, is_complete = advanced
 
-    return jsonify({
+    session_fields = {
         "is_correct": bool(is_correct),
-        "correct_answer_id": correct_answer["id"],
-        "correct_answer_text": correct_answer["answer_text"],
-        "explanation": question["explanation"],
         "score": new_score,
         "questions_answered": new_index,
-        "total_questions": len(question_ids),
+        "total_questions": total,
         "is_complete": is_complete,
-    })
+    }
+    body = question_bank.feedback_payload(question_id, session_fields)
+    if body is not None:
+        return json_bytes_response(body)
+    correct_answer = question_bank.correct_answer(db, question_id)
+    question = question_bank.question(db, question_id)
+    return jsonify(dict(session_fields,
+                        correct_answer_id=correct_answer["id"],
+                        correct_answer_text=correct_answer["answer_text"],
+                        explanation=question["explanation"]))
 
 
 @api_bp.route("/quiz/<quiz_id>/results")
@@ -302,37 +424,12 @@ def api_quiz_results(quiz_id):
     if err:
         return err
 
-    question_ids = _parse_question_ids(quiz)
-    total = len(question_ids)
+    total = question_count(quiz)
     score = quiz["score"]
     percentage = round((score / total) * 100) if total > 0 else 0
 
     # Reconstruct review from results table (not cached session state)
-    review = []
-    for qid in question_ids:
-        result = db.execute("""
-            SELECT r.is_correct, r.answer_id,
-                   q.question_text, q.explanation, q.source,
-                   a.answer_text as user_answer_text
-            FROM results r
-            JOIN questions q ON q.id = r.question_id
-            JOIN answers a ON a.id = r.answer_id
-            WHERE r.user_id = ? AND r.question_id = ?
-            ORDER BY r.answered_at DESC
-            LIMIT 1
-        """, (g.user_id, qid)).fetchone()
-        correct = db.execute(
-            "SELECT answer_text FROM answers WHERE question_id = ? AND is_correct = 1", (qid,)
-        ).fetchone()
-        if result:
-            review.append({
-                "question_text": result["question_text"],
-                "user_answer": result["user_answer_text"],
-                "correct_answer": correct["answer_text"] if correct else None,
-                "explanation": result["explanation"],
-                "source": result["source"],
-                "is_correct": bool(result["is_correct"]),
-            })
+    review = quiz_review(db, quiz)
 
     return jsonify({
         "quiz_id": quiz_id,
@@ -351,23 +448,22 @@ def api_quiz_results(quiz_id):
 @jwt_required
 def api_progress():
     db = get_db()
+    # Reads the per-category aggregate maintained by record_result, not results
     overall = db.execute("""
-        SELECT COUNT(id) as total, SUM(is_correct) as correct
-        FROM results WHERE user_id = ?
+        SELECT SUM(total_answered) as total, SUM(total_correct) as correct
+        FROM user_category_progress WHERE user_id = ?
     """, (g.user_id,)).fetchone()
 
     by_category = db.execute("""
         SELECT
             c.id as category_id,
             c.name as category_name,
-            COUNT(r.id) as total_answered,
-            SUM(r.is_correct) as total_correct,
-            ROUND(AVG(r.is_correct) * 100) as accuracy
-        FROM results r
-        JOIN questions q ON q.id = r.question_id
-        JOIN categories c ON c.id = q.category_id
-        WHERE r.user_id = ?
-        GROUP BY c.id
+            p.total_answered,
+            p.total_correct,
+            ROUND(p.total_correct * 100.0 / p.total_answered) as accuracy
+        FROM user_category_progress p
+        JOIN categories c ON c.id = p.category_id
+        WHERE p.user_id = ? AND p.total_answered > 0
         ORDER BY c.name
     """, (g.user_id,)).fetchall()
 
@@ -379,5 +475,99 @@ def api_progress():
             "total_correct": correct,
             "accuracy": round((correct / total) * 100) if total > 0 else 0,
         },
-        "by_category": [dict(r) for r in by_category],
+        "by_category": by_category,
     })
+
+
+@api_bp.route("/progress/weak")
+@jwt_required
+def api_weak_questions():
+    """Questions the user currently gets wrong, most often missed first (?limit=, max 100)."""
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    db = get_db()
+    return jsonify({"questions": weak_questions(db, g.user_id, limit)})
+
+
+@api_bp.route("/me/results/export")
+@jwt_required
+def api_results_export():
+    """
+    The signed-in user's full answer history (training record), streamed.
+    ?format=csv|jsonl (default csv) [&since=2025-01-01] [&until=2025-03-31]
+    """
+    fmt = request.args.get("format", "csv")
+    if fmt not in RECORD_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(RECORD_FORMATS)}"}), 400
+    try:
+        since = parse_bound(request.args.get("since"))
+        until = parse_bound(request.args.get("until"), upper=True)
+    except ValueError:
+        return jsonify({"error": "since/until must be ISO dates, e.g. 2025-01-31"}), 400
+
+    user_id = g.user_id
+
+    def generate():
+        db = get_db()
+        try:
+            yield from export_records(iter_records(db, user_id, since, until), USER_COLUMNS, fmt)
+        finally:
+            db.close()
+
+    return Response(generate(), mimetype="text/csv" if fmt == "csv" else "application/x-ndjson", headers={
+        "Content-Disposition": f"attachment; filename=training-record-{user_id}.{fmt}"})
+
+
+# ─────────────────────────────────────────────
+# LEADERBOARD
+# ─────────────────────────────────────────────
+
+@api_bp.route("/leaderboard")
+@jwt_required
+def api_leaderboard():
+    """
+    A page of one leaderboard plus the caller's own rank.
+    ?metric=accuracy|correct|weekly (default accuracy) [&category_id=] [&limit=20, max 100] [&offset=0]
+    """
+    metric = request.args.get("metric", "accuracy")
+    if metric not in METRICS:
+        return jsonify({"error": f"metric must be one of: {', '.join(METRICS)}"}), 400
+    category_id = request.args.get("category_id", GLOBAL, type=int)
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    offset = min(max(request.args.get("offset", 0, type=int), 0), LEADERBOARD_CACHE_ROWS)
+
+    db = get_db()
+    if category_id != GLOBAL and not db.execute(
+            "SELECT 1 FROM categories WHERE id = ?", (category_id,)).fetchone():
+        return jsonify({"error": "Category not found"}), 404
+    return jsonify(leaderboard(db, metric, category_id, limit, offset, g.user_id))
+
+
+# ─────────────────────────────────────────────
+# ADMIN
+# ─────────────────────────────────────────────
+
+@api_bp.route("/admin/questions/<int:question_id>/stats")
+@api_admin_required
+def api_admin_question_stats(question_id):
+    """
+    Answer distribution for one question from the live counters (answer_counts.py),
+    plus the latest item analysis if item_analysis.py has been run. Reads
+    precomputed rows only. Uses the admin web session.
+    """
+    db = get_db()
+    distribution = answer_distribution(db, question_id)
+    if distribution is None:
+        return jsonify({"error": "Question not found"}), 404
+    analysis = stats_for_questions(db, [question_id]).get(question_id)
+    return jsonify(dict(distribution, item_analysis=analysis))
+
+
+@api_bp.route("/admin/rate-limits")
+@api_admin_required
+def api_admin_rate_limits():
+    """Configured rate limits and how many requests each has refused
+    (ratelimit.py). ?format=prometheus for scraping."""
+    metrics = rate_limit_metrics()
+    if request.args.get("format") == "prometheus":
+        return Response(prometheus_text(metrics), mimetype="text/plain; version=0.0.4")
+    return jsonify({"limits": metrics})
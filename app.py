@@ -1,13 +1,43 @@
+import csv
+import io
+import json
 import os
-from flask import Flask, flash, jsonify, redirect, render_template, request, session, url_for
+import sqlite3
+import tempfile
+from contextlib import nullcontext
+from flask import Flask, Response, flash, jsonify, redirect, render_template, request, session, url_for
 from flask_session import Session
 from flask_cors import CORS
 from werkzeug.security import check_password_hash, generate_password_hash
-from helpers import login_required, admin_required, get_db, ensure_quiz_sessions_table
+from helpers import (login_required, admin_required, get_db, ensure_quiz_sessions_table,
+                     ensure_progress_table, delete_user_data)
+from partitions import ensure_partition_catalog
+from quizzes import (QUIZ_LENGTH, EXAM_LENGTH, MAX_EXAM_LENGTH, create_quiz_session, get_quiz_session,
+                     get_open_quiz, question_count, question_id_at, pick_category_questions,
+                     pick_exam_questions, start_adaptive_quiz, advance_quiz, quiz_review)
+from question_index import question_index, parse_difficulty
+from question_bank import question_bank
+from spaced_repetition import ensure_schedule_table, due_question_ids, due_count
+from question_state import ensure_question_state_table, mistake_question_ids, mistake_count, weak_questions
+from content_db import ensure_content_database, edit_content
+from content_watch import content_watch
+from search import search_questions, parse_cursor, SEARCH_PAGE_SIZE
+from question_browser import browse_questions, parse_browse_cursor
+from stats import ensure_stats_tables, read_counters, hourly_activity, daily_activity
+from question_io import FORMATS, export_questions, import_questions, read_records, guess_format
+from training_records import (RECORD_FORMATS, ADMIN_COLUMNS, ensure_results_user_index, iter_records,
+                              export_records, parse_bound)
+from leaderboard import ensure_leaderboard_table
+from item_analysis import ensure_question_stats_table, stats_for_questions
+from adaptive import ensure_ratings_tables, difficulty_index
+from answer_counts import ensure_answer_counts_tables, distributions_for_questions
 from api import api_bp
+from json_provider import QuizJSONProvider, json_bytes_response
+from compression import init_compression
 
 # Configure application
 app = Flask(__name__)
+app.json = QuizJSONProvider(app)  # serializes sqlite3.Row directly, uses orjson if installed
 
 # Configure session to use filesystem
 app.config["SESSION_PERMANENT"] = False
@@ -24,14 +54,41 @@ Session(app)
 app.register_blueprint(api_bp)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
-# Create quiz_sessions table if it doesn't exist yet (safe on every startup)
+# gzip/Brotli for JSON + HTML, hashed/precompressed static assets (see build_static.py)
+init_compression(app)
+
+# Create runtime tables if they don't exist yet (safe on every startup). Under
+# gunicorn.conf.py (preload_app) this runs once in the master, and the caches
+# warmed here are inherited by every worker as shared, frozen pages.
 with app.app_context():
     _db = get_db()
+    ensure_content_database(_db)  # first: moves the question bank into content.db
     ensure_quiz_sessions_table(_db)
+    ensure_progress_table(_db)
+    ensure_partition_catalog(_db)
+    ensure_schedule_table(_db)
+    ensure_question_state_table(_db)
+    ensure_stats_tables(_db)
+    ensure_results_user_index(_db)
+    ensure_leaderboard_table(_db)
+    ensure_question_stats_table(_db)
+    ensure_ratings_tables(_db)
+    ensure_answer_counts_tables(_db)
+    content_watch.check()  # before warming, so the caches belong to the version seen here
+    question_index.buckets(_db)
+    difficulty_index.entries(_db)
+    question_bank.mapping()
     _db.close()
 
 print("APP STARTED OK")
 
+
+# Question caches in this worker are dropped once another process swaps content.db
+# (one stat per CONTENT_CHECK_INTERVAL; see content_watch.py)
+@app.before_request
+def check_content_version():
+    content_watch.check()
+
 # Admin password (env variable in production, hardcoded for dev)
 ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "admin123")
 
@@ -135,9 +192,7 @@ def account():
                 flash("Password changed successfully!", "success")
 
         elif action == "delete_account":
-            db.execute("DELETE FROM results WHERE user_id = ?", (session["user_id"],))
-            db.execute("DELETE FROM quiz_sessions WHERE user_id = ?", (session["user_id"],))
-            db.execute("DELETE FROM users WHERE id = ?", (session["user_id"],))
+            delete_user_data(db, session["user_id"])
             db.commit()
             session.clear()
             flash("Account deleted permanently.", "info")
@@ -162,8 +217,12 @@ def index():
         ORDER BY c.name
     """).fetchall()
     categories = [dict(c) for c in categories]
-    return render_template("index.html", categories=categories)
-    
+    open_quiz = get_open_quiz(db, session["user_id"])
+    return render_template("index.html", categories=categories, open_quiz=open_quiz,
+                           open_quiz_total=question_count(open_quiz) if open_quiz else 0,
+                           review_due=due_count(db, session["user_id"]),
+                           mistakes=mistake_count(db, session["user_id"]))
+
 
 @app.route("/quiz/<int:category_id>")
 @login_required
@@ -174,52 +233,121 @@ def quiz_start(category_id):
         flash("Category not found", "danger")
         return redirect("/")
 
-    questions = db.execute("""
-        SELECT id FROM questions WHERE category_id = ?
-        ORDER BY RANDOM() LIMIT 10
-    """, (category_id,)).fetchall()
+    # ?level=adaptive picks each question to match the user's ability estimate
+    if request.args.get("level") == "adaptive":
+        session["quiz_id"] = start_adaptive_quiz(db, session["user_id"], category_id)
+        if not session["quiz_id"]:
+            flash("No questions available in this category yet.", "warning")
+            return redirect("/")
+        db.commit()
+        return redirect("/quiz/question")
 
-    if not questions:
+    # ?level=1|2|3 centres the quiz on one difficulty; absent means any
+    question_ids = pick_category_questions(db, category_id, target=parse_difficulty(request.args.get("level")))
+
+    if not question_ids:
         flash("No questions available in this category yet.", "warning")
         return redirect("/")
 
-    session["quiz"] = {
-        "category_id": category_id,
-        "category_name": category["name"],
-        "question_ids": [q["id"] for q in questions],
-        "current_index": 0,
-        "score": 0,
-        "answers": []
-    }
+    # Quiz state lives in quiz_sessions (shared with the API); the session only holds its id
+    session["quiz_id"] = create_quiz_session(db, session["user_id"], category_id, question_ids)
+    db.commit()
 
     return redirect("/quiz/question")
 
 
+@app.route("/quiz/review")
+@login_required
+def quiz_review_start():
+    """Spaced-repetition quiz over the user's questions that are due, across categories."""
+    db = get_db()
+    question_ids = due_question_ids(db, session["user_id"], QUIZ_LENGTH)
+    if not question_ids:
+        flash("Nothing is due for review yet — keep taking quizzes!", "info")
+        return redirect("/")
+
+    session["quiz_id"] = create_quiz_session(db, session["user_id"], None, question_ids, mode="review")
+    db.commit()
+    return redirect("/quiz/question")
+
+
+@app.route("/quiz/mistakes")
+@login_required
+def quiz_mistakes_start():
+    """Quiz over the questions the user most recently got wrong, across categories."""
+    db = get_db()
+    question_ids = mistake_question_ids(db, session["user_id"], QUIZ_LENGTH)
+    if not question_ids:
+        flash("No mistakes to review — your latest answer to every question was right!", "info")
+        return redirect("/")
+
+    session["quiz_id"] = create_quiz_session(db, session["user_id"], None, question_ids, mode="mistakes")
+    db.commit()
+    return redirect("/quiz/question")
+
+
+@app.route("/quiz/exam")
+@login_required
+def quiz_exam_start():
+    """Mock exam across every category, weighted by the size of each category."""
+    db = get_db()
+    total = min(max(request.args.get("total", EXAM_LENGTH, type=int), 1), MAX_EXAM_LENGTH)
+    question_ids = pick_exam_questions(db, total=total)
+    if not question_ids:
+        flash("No questions available yet.", "warning")
+        return redirect("/")
+
+    session["quiz_id"] = create_quiz_session(db, session["user_id"], None, question_ids, mode="exam")
+    db.commit()
+    return redirect("/quiz/question")
+
+
+@app.route("/quiz/resume/<quiz_id>")
+@login_required
+def quiz_resume(quiz_id):
+    db = get_db()
+    quiz = get_quiz_session(db, quiz_id)
+    if not quiz or quiz["user_id"] != session["user_id"]:
+        flash("Quiz not found", "danger")
+        return redirect("/")
+    session["quiz_id"] = quiz_id
+    return redirect("/quiz/results" if quiz["completed"] else "/quiz/question")
+
+
+def _current_quiz(db):
+    """The signed-in user's active quiz_sessions row, or None."""
+    quiz_id = session.get("quiz_id")
+    if not quiz_id:
+        return None
+    quiz = get_quiz_session(db, quiz_id)
+    if not quiz or quiz["user_id"] != session["user_id"]:
+        session.pop("quiz_id", None)
+        return None
+    return quiz
+
+
 @app.route("/quiz/question")
 @login_required
 def quiz_question():
-    quiz = session.get("quiz")
+    db = get_db()
+    quiz = _current_quiz(db)
     if not quiz:
         return redirect("/")
 
+    total = question_count(quiz)
     idx = quiz["current_index"]
-    if idx >= len(quiz["question_ids"]):
+    if idx >= total:
         return redirect("/quiz/results")
 
-    question_id = quiz["question_ids"][idx]
-    db = get_db()
-
-    question = db.execute("SELECT * FROM questions WHERE id = ?", (question_id,)).fetchone()
-    answers = db.execute(
-        "SELECT * FROM answers WHERE question_id = ? ORDER BY RANDOM()",
-        (question_id,)
-    ).fetchall()
+    question_id = question_id_at(quiz, idx)
+    question = question_bank.question(db, question_id)
+    answers = question_bank.answers(db, question_id, shuffle=True)
 
     return render_template("quiz.html",
         question=question,
         answers=answers,
         current=idx + 1,
-        total=len(quiz["question_ids"]),
+        total=total,
         category_name=quiz["category_name"]
     )
 
@@ -227,7 +355,8 @@ def quiz_question():
 @app.route("/quiz/submit", methods=["POST"])
 @login_required
 def quiz_submit():
-    quiz = session.get("quiz")
+    db = get_db()
+    quiz = _current_quiz(db)
     if not quiz:
         return jsonify({"error": "No active quiz"}), 400
 
@@ -235,72 +364,50 @@ def quiz_submit():
     if not answer_id:
         return jsonify({"error": "No answer selected"}), 400
 
-    question_id = quiz["question_ids"][quiz["current_index"]]
-    db = get_db()
+    if quiz["current_index"] >= question_count(quiz):
+        return jsonify({"error": "Quiz already complete", "next_url": "/quiz/results"}), 409
 
-    answer = db.execute("SELECT * FROM answers WHERE id = ?", (answer_id,)).fetchone()
-    correct_answer = db.execute(
-        "SELECT * FROM answers WHERE question_id = ? AND is_correct = 1",
-        (question_id,)
-    ).fetchone()
-    question = db.execute("SELECT * FROM questions WHERE id = ?", (question_id,)).fetchone()
+    question_id = question_id_at(quiz, quiz["current_index"])
+    answer = question_bank.answer(db, question_id, answer_id)
+    if not answer:
+        return jsonify({"error": "Invalid answer for this question", "next_url": "/quiz/question"}), 400
 
-    is_correct = 1 if answer and answer["is_correct"] else 0
+    is_correct = 1 if answer["is_correct"] else 0
 
-    db.execute("""
-        INSERT INTO results (user_id, question_id, answer_id, is_correct)
-        VALUES (?, ?, ?, ?)
-    """, (session["user_id"], question_id, answer_id, is_correct))
+    advanced = advance_quiz(db, quiz, question_id, answer_id, is_correct)
+    if advanced is None:
+        # Already answered from another tab/device — reload the current step
+        return jsonify({"error": "This question was already answered", "next_url": "/quiz/question"}), 409
     db.commit()
+    _, _, is_complete = advanced
 
-    quiz["answers"].append({
-        "question_id": question_id,
-        "answer_id": answer_id,
-        "is_correct": is_correct,
-        "correct_answer_text": correct_answer["answer_text"],
-        "explanation": question["explanation"]
-    })
-    if is_correct:
-        quiz["score"] += 1
-    quiz["current_index"] += 1
-    session["quiz"] = quiz
-    session.modified = True
-
-    return jsonify({
-        "is_correct": is_correct,
-        "correct_answer_id": correct_answer["id"],
-        "correct_answer_text": correct_answer["answer_text"],
-        "explanation": question["explanation"],
-        "next_url": "/quiz/results" if quiz["current_index"] >= len(quiz["question_ids"]) else "/quiz/question"
-    })
+    session_fields = {"is_correct": is_correct, "next_url": "/quiz/results" if is_complete else "/quiz/question"}
+    body = question_bank.feedback_payload(question_id, session_fields)
+    if body is not None:
+        return json_bytes_response(body)
+    correct_answer = question_bank.correct_answer(db, question_id)
+    question = question_bank.question(db, question_id)
+    return jsonify(dict(session_fields,
+                        correct_answer_id=correct_answer["id"],
+                        correct_answer_text=correct_answer["answer_text"],
+                        explanation=question["explanation"]))
 
 
 @app.route("/quiz/results")
 @login_required
 def quiz_results():
-    quiz = session.get("quiz")
+    db = get_db()
+    quiz = _current_quiz(db)
     if not quiz:
         return redirect("/")
 
     score = quiz["score"]
-    total = len(quiz["question_ids"])
+    total = question_count(quiz)
     percentage = round((score / total) * 100) if total > 0 else 0
+    review = quiz_review(db, quiz)
 
-    db = get_db()
-    review = []
-    for entry in quiz["answers"]:
-        question = db.execute("SELECT * FROM questions WHERE id = ?", (entry["question_id"],)).fetchone()
-        user_answer = db.execute("SELECT * FROM answers WHERE id = ?", (entry["answer_id"],)).fetchone()
-        review.append({
-            "question_text": question["question_text"],
-            "user_answer": user_answer["answer_text"],
-            "correct_answer": entry["correct_answer_text"],
-            "explanation": entry["explanation"],
-            "is_correct": entry["is_correct"],
-            "source": question["source"]
-        })
-
-    session.pop("quiz", None)
+    if quiz["completed"]:
+        session.pop("quiz_id", None)
     return render_template("results.html",
         score=score,
         total=total,
@@ -314,26 +421,26 @@ def quiz_results():
 @login_required
 def progress():
     db = get_db()
+    # Pre-aggregated per category (see record_result), so this never scans results
     stats = db.execute("""
         SELECT
             c.name as category_name,
-            COUNT(r.id) as total_answered,
-            SUM(r.is_correct) as total_correct,
-            ROUND(AVG(r.is_correct) * 100) as accuracy
-        FROM results r
-        JOIN questions q ON q.id = r.question_id
-        JOIN categories c ON c.id = q.category_id
-        WHERE r.user_id = ?
-        GROUP BY c.id
+            p.total_answered,
+            p.total_correct,
+            ROUND(p.total_correct * 100.0 / p.total_answered) as accuracy
+        FROM user_category_progress p
+        JOIN categories c ON c.id = p.category_id
+        WHERE p.user_id = ? AND p.total_answered > 0
         ORDER BY c.name
     """, (session["user_id"],)).fetchall()
 
     overall = db.execute("""
-        SELECT COUNT(id) as total, SUM(is_correct) as correct
-        FROM results WHERE user_id = ?
+        SELECT SUM(total_answered) as total, SUM(total_correct) as correct
+        FROM user_category_progress WHERE user_id = ?
     """, (session["user_id"],)).fetchone()
 
-    return render_template("progress.html", stats=stats, overall=overall)
+    return render_template("progress.html", stats=stats, overall=overall,
+                           weak=weak_questions(db, session["user_id"], 10))
 
 
 # ─────────────────────────────────────────────
@@ -354,15 +461,16 @@ def admin_login():
 @admin_required
 def admin_dashboard():
     db = get_db()
-    question_count = db.execute("SELECT COUNT(*) as n FROM questions").fetchone()["n"]
-    user_count = db.execute("SELECT COUNT(*) as n FROM users").fetchone()["n"]
-    category_count = db.execute("SELECT COUNT(*) as n FROM categories").fetchone()["n"]
-    result_count = db.execute("SELECT COUNT(*) as n FROM results").fetchone()["n"]
+    # Trigger-maintained counters (stats.py): a few rows, no table scans
+    counters = read_counters(db)
     return render_template("admin/dashboard.html",
-        question_count=question_count,
-        user_count=user_count,
-        category_count=category_count,
-        result_count=result_count
+        question_count=counters["questions"],
+        user_count=counters["users"],
+        category_count=counters["categories"],
+        result_count=counters["answers"],
+        counters=counters,
+        hourly=hourly_activity(db, 24),
+        daily=daily_activity(db, 30)
     )
 
 
@@ -375,9 +483,9 @@ def admin_categories():
         description = request.form.get("description")
         icon = request.form.get("icon", "📚")
         if name:
-            db.execute("INSERT INTO categories (name, description, icon) VALUES (?, ?, ?)",
-                       (name, description, icon))
-            db.commit()
+            with edit_content(db):
+                db.execute("INSERT INTO categories (name, description, icon) VALUES (?, ?, ?)",
+                           (name, description, icon))
             flash(f"Category '{name}' added.", "success")
     categories = db.execute("SELECT * FROM categories ORDER BY name").fetchall()
     return render_template("admin/categories.html", categories=categories)
@@ -405,38 +513,168 @@ def admin_questions():
         if not all([category_id, question_text, all(answers), correct_index]):
             flash("All fields are required.", "danger")
         else:
-            cursor = db.execute("""
-                INSERT INTO questions (category_id, question_text, explanation, difficulty, source)
-                VALUES (?, ?, ?, ?, ?)
-            """, (category_id, question_text, explanation, difficulty, source))
-            question_id = cursor.lastrowid
-
-            for i, answer_text in enumerate(answers):
-                is_correct = 1 if (i + 1) == correct_index else 0
-                db.execute("""
-                    INSERT INTO answers (question_id, answer_text, is_correct)
-                    VALUES (?, ?, ?)
-                """, (question_id, answer_text, is_correct))
+            with edit_content(db):
+                cursor = db.execute("""
+                    INSERT INTO questions (category_id, question_text, explanation, difficulty, source)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (category_id, question_text, explanation, difficulty, source))
+                question_id = cursor.lastrowid
+
+                for i, answer_text in enumerate(answers):
+                    is_correct = 1 if (i + 1) == correct_index else 0
+                    db.execute("""
+                        INSERT INTO answers (question_id, answer_text, is_correct)
+                        VALUES (?, ?, ?)
+                    """, (question_id, answer_text, is_correct))
 
-            db.commit()
             flash("Question added successfully.", "success")
 
     categories = db.execute("SELECT * FROM categories ORDER BY name").fetchall()
-    questions = db.execute("""
-        SELECT q.*, c.name as category_name,
-               COUNT(a.id) as answer_count
-        FROM questions q
-        JOIN categories c ON c.id = q.category_id
-        LEFT JOIN answers a ON a.question_id = q.id
-        GROUP BY q.id
-        ORDER BY q.created_at DESC
-    """).fetchall()
+
+    # ?q= switches the list to ranked full-text matches, paged with ?after=<cursor>
+    search = request.args.get("q", "").strip()
+    if search:
+        try:
+            after = parse_cursor(request.args["after"]) if request.args.get("after") else None
+        except ValueError:
+            after = None
+        matches, next_cursor = search_questions(db, search, SEARCH_PAGE_SIZE, after)
+        return render_template("admin/questions.html",
+            categories=categories,
+            questions=matches,
+            item_stats=stats_for_questions(db, [q["id"] for q in matches]),
+            answer_counts=distributions_for_questions(db, [q["id"] for q in matches]),
+            search=search,
+            next_cursor=next_cursor
+        )
+
+    # Otherwise one keyset page (newest first), optionally filtered
+    filters = {
+        "category_id": request.args.get("category_id", type=int),
+        "difficulty": request.args.get("difficulty", type=int),
+        "source": request.args.get("source", "").strip() or None,
+    }
+    try:
+        after = parse_browse_cursor(request.args["after"]) if request.args.get("after") else None
+    except ValueError:
+        after = None
+    questions, next_cursor = browse_questions(db, **filters, after=after)
 
     return render_template("admin/questions.html",
         categories=categories,
-        questions=questions
+        questions=questions,
+        item_stats=stats_for_questions(db, [q["id"] for q in questions]),
+        answer_counts=distributions_for_questions(db, [q["id"] for q in questions]),
+        filters=filters,
+        next_cursor=next_cursor
     )
 
 
+@app.route("/admin/questions/export")
+@admin_required
+def admin_questions_export():
+    """Stream the whole bank as ?format=jsonl (default) or csv, one question at a time."""
+    fmt = request.args.get("format", "jsonl")
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(FORMATS)}"}), 400
+
+    def generate():
+        db = get_db()
+        try:
+            yield from export_questions(db, fmt)
+        finally:
+            db.close()
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(generate(), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=questions.{fmt}"})
+
+
+@app.route("/admin/questions/import", methods=["POST"])
+@admin_required
+def admin_questions_import():
+    """
+    Add questions from an uploaded JSONL or CSV file (see question_io.py for the
+    record format). Responds with NDJSON: a progress line per batch, then the
+    final summary with per-row errors. The new questions go live together
+    when the summary is sent. ?dry_run=1 validates only;
+    ?create_categories=1 creates categories named in the file.
+    """
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        return jsonify({"error": "file is required"}), 400
+    fmt = request.form.get("format") or guess_format(upload.filename)
+    if fmt not in FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(FORMATS)}"}), 400
+    dry_run = request.values.get("dry_run") in ("1", "true", "on")
+    create_categories = request.values.get("create_categories") in ("1", "true", "on")
+
+    # The upload is closed with the request, before the response streams; keep our own copy on disk
+    spool = tempfile.TemporaryFile()
+    upload.save(spool)
+    spool.seek(0)
+
+    def generate():
+        db = get_db()
+        db.execute("PRAGMA busy_timeout = 5000")
+        summary, error = None, None
+        try:
+            # A real import fills a copy of content.db, swapped in once the whole file is through
+            with (nullcontext(db) if dry_run else edit_content()) as target, \
+                    io.TextIOWrapper(spool, encoding="utf-8-sig", newline="") as text:
+                for summary in import_questions(target, read_records(text, fmt), dry_run=dry_run,
+                                                create_categories=create_categories):
+                    yield json.dumps({k: summary[k] for k in ("processed", "inserted", "failed")}) + "\n"
+        except UnicodeDecodeError:
+            error = "file is not valid UTF-8"
+        except csv.Error as e:
+            error = f"malformed CSV: {e}"
+        except sqlite3.Error as e:
+            error = f"database error: {e}"
+        except Exception as e:  # the client is owed a final line whatever went wrong
+            app.logger.exception("question import failed")
+            error = f"import failed: {e}"
+        finally:
+            db.close()
+        summary = dict(summary or {}, done=True)
+        if error:
+            # The copy of content.db was thrown away: a real import goes live whole or not at all
+            summary["error"] = error
+            if not dry_run:
+                summary["inserted"] = 0
+        yield json.dumps(summary, ensure_ascii=False) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+@app.route("/admin/results/export")
+@admin_required
+def admin_results_export():
+    """
+    Every user's answer history for audits, streamed from the database.
+    ?format=csv|jsonl [&user_id=] [&since=2025-01-01] [&until=2025-03-31]
+    """
+    fmt = request.args.get("format", "csv")
+    if fmt not in RECORD_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(RECORD_FORMATS)}"}), 400
+    try:
+        since = parse_bound(request.args.get("since"))
+        until = parse_bound(request.args.get("until"), upper=True)
+    except ValueError:
+        return jsonify({"error": "since/until must be ISO dates, e.g. 2025-01-31"}), 400
+    user_id = request.args.get("user_id", type=int)
+
+    def generate():
+        db = get_db()
+        try:
+            yield from export_records(iter_records(db, user_id, since, until), ADMIN_COLUMNS, fmt)
+        finally:
+            db.close()
+
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(generate(), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=training-records.{fmt}"})
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,54 @@
+"""
+bench_adaptive.py
+Times adaptive next-question selection (DifficultyIndex.nearest) and the
+in-place re-filing done after each graded answer (DifficultyIndex.move) on a
+synthetic bank held in an in-memory database.
+
+Usage: python benchmarks/bench_adaptive.py [--questions 1000000] [--categories 8] [--repeat 20000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from adaptive import DifficultyIndex  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=1_000_000)
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20_000)
+    args = parser.parse_args()
+
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE questions (id INTEGER PRIMARY KEY, category_id INTEGER, difficulty INTEGER)")
+    db.execute("CREATE TABLE question_ratings (question_id INTEGER PRIMARY KEY, difficulty REAL, answers INTEGER)")
+    db.executemany("INSERT INTO questions VALUES (?, ?, ?)",
+                   ((i, i % args.categories + 1, random.randint(1, 3)) for i in range(1, args.questions + 1)))
+    db.executemany("INSERT INTO question_ratings VALUES (?, ?, 1)",
+                   ((i, random.gauss(0, 1.2)) for i in range(1, args.questions + 1)))
+
+    index = DifficultyIndex()
+    started = time.perf_counter()
+    index.entries(db)
+    print(f"load   {time.perf_counter() - started:8.3f} s  ({args.questions} questions)")
+
+    exclude = set(random.sample(range(1, args.questions + 1), 9))
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        index.nearest(db, random.randint(1, args.categories), random.gauss(0, 1.5), exclude)
+    print(f"pick   {(time.perf_counter() - started) / args.repeat * 1e6:8.2f} µs")
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        index.move(random.randint(1, args.questions), random.gauss(0, 1.2))
+    print(f"move   {(time.perf_counter() - started) / args.repeat * 1e6:8.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+bench_compression.py
+Measures bytes on the wire for one full API quiz (start, every question and
+answer, results, progress) with no compression, gzip and Brotli, using the
+same threshold and levels as compression.py. Runs against a temporary copy of
+nuclear_quiz.db so the real database is untouched.
+
+Usage: python benchmarks/bench_compression.py [--category 1]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--category", type=int, default=1)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    shutil.copy(os.path.join(ROOT, "nuclear_quiz.db"), os.path.join(tmp, "nuclear_quiz.db"))
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "nuclear_quiz.db")
+    os.environ["SESSION_DIR"] = os.path.join(tmp, "flask_session")
+    os.environ.setdefault("SECRET_KEY", "bench-" + "x" * 58)
+
+    import compression
+    from app import app
+
+    client = app.test_client()
+    token = client.post("/api/auth/register",
+                        json={"username": "bench", "password": "bench-pass"}).get_json()["token"]
+    auth = {"Authorization": f"Bearer {token}"}
+
+    bodies = []
+
+    def call(method, path, **kwargs):
+        response = getattr(client, method)(path, headers=auth, **kwargs)
+        bodies.append((path, response.get_data()))
+        return response
+
+    quiz_id = call("post", "/api/quiz/start", json={"category_id": args.category}).get_json()["quiz_id"]
+    while True:
+        question = call("get", f"/api/quiz/{quiz_id}")
+        if question.status_code != 200:
+            break
+        answer_id = question.get_json()["answers"][0]["id"]
+        call("post", f"/api/quiz/{quiz_id}/answer", json={"answer_id": answer_id})
+    call("get", f"/api/quiz/{quiz_id}/results")
+    call("get", "/api/progress")
+
+    totals = {"identity": 0, "gzip": 0, "br": 0}
+    for _, body in bodies:
+        totals["identity"] += len(body)
+        for encoding in ("gzip", "br"):
+            if encoding == "br" and compression.brotli is None:
+                continue
+            small = len(body) < compression.COMPRESS_MIN_SIZE
+            totals[encoding] += len(body) if small else len(compression.compress(body, encoding))
+
+    results_body = bodies[-2][1]
+    print(f"One quiz: {len(bodies)} API responses, threshold {compression.COMPRESS_MIN_SIZE} B")
+    print(f"  results payload     {len(results_body):7d} B → gzip "
+          f"{len(compression.compress(results_body, 'gzip'))} B")
+    for encoding, size in totals.items():
+        if size:
+            saved = totals["identity"] - size
+            print(f"  {encoding:8s} total    {size:7d} B  (saved {saved} B, "
+                  f"{saved / totals['identity'] * 100:.0f}%)")
+
+    # Sanity-check the live middleware on the idempotent endpoints
+    for encoding in ("gzip", "br"):
+        response = client.get(f"/api/quiz/{quiz_id}/results",
+                              headers={**auth, "Accept-Encoding": encoding})
+        print(f"  live {encoding:4s} Content-Encoding: {response.headers.get('Content-Encoding')}"
+              f", {len(response.get_data())} B")
+
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+bench_json.py
+Compares the old API serialization path (dict(r) per row + Flask's default
+JSON provider) with QuizJSONProvider on /api/progress and
+/api/quiz/<id>/results shaped payloads.
+
+Usage: python benchmarks/bench_json.py [--categories 8] [--questions 10] [--repeat 2000]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import timeit
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from json_provider import QuizJSONProvider, orjson  # noqa: E402
+
+EXPLANATION = (
+    "The CANDU PHT system operates at approximately 10 MPa with coolant temperatures "
+    "of about 265°C at the inlet and 310°C at the reactor outlet headers. "
+) * 3
+
+
+def build_rows(n_categories, n_questions):
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    db.execute("CREATE TABLE p (category_id, category_name, total_answered, total_correct, accuracy)")
+    db.executemany("INSERT INTO p VALUES (?, ?, ?, ?, ?)", [
+        (i, f"Category {i} — CANDU Systems", 120 + i, 80 + i, round((80 + i) / (120 + i) * 100.0))
+        for i in range(n_categories)
+    ])
+    by_category = db.execute("SELECT * FROM p ORDER BY category_name").fetchall()
+    review = [{
+        "question_text": f"Question {i}: what is the role of the calandria in a CANDU reactor?",
+        "user_answer": "It is the low-pressure vessel containing the heavy water moderator",
+        "correct_answer": "It is the low-pressure vessel containing the heavy water moderator",
+        "explanation": EXPLANATION,
+        "source": "IAEA-TECDOC-1391",
+        "is_correct": bool(i % 2),
+    } for i in range(n_questions)]
+    return by_category, review
+
+
+def progress_payload(by_category, as_dicts):
+    return {
+        "overall": {"total_answered": 1000, "total_correct": 700, "accuracy": 70},
+        "by_category": [dict(r) for r in by_category] if as_dicts else by_category,
+    }
+
+
+def results_payload(review):
+    return {"quiz_id": "0f8fad5b-d9cb-469f-a165-70867728950e", "score": 5,
+            "total_questions": len(review), "percentage": 50, "review": review}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    baseline_app = Flask("baseline")
+    baseline_app.json = DefaultJSONProvider(baseline_app)
+    fast_app = Flask("fast")
+    fast_app.json = QuizJSONProvider(fast_app)
+
+    by_category, review = build_rows(args.categories, args.questions)
+
+    cases = {
+        "/api/progress": (
+            lambda: progress_payload(by_category, as_dicts=True),
+            lambda: progress_payload(by_category, as_dicts=False),
+        ),
+        "/api/quiz/<id>/results": (
+            lambda: results_payload(review),
+            lambda: results_payload(review),
+        ),
+    }
+
+    print(f"Encoder: {'orjson ' + orjson.__version__ if orjson else 'stdlib json'}")
+    for route, (old_payload, new_payload) in cases.items():
+        with baseline_app.app_context():
+            old_body = baseline_app.json.response(old_payload()).get_data()
+            old_time = timeit.timeit(lambda: baseline_app.json.response(old_payload()), number=args.repeat)
+        with fast_app.app_context():
+            new_body = fast_app.json.response(new_payload()).get_data()
+            new_time = timeit.timeit(lambda: fast_app.json.response(new_payload()), number=args.repeat)
+
+        assert json.loads(old_body) == json.loads(new_body), f"{route}: payload mismatch"
+        per_old = old_time / args.repeat * 1e6
+        per_new = new_time / args.repeat * 1e6
+        print(f"{route:26s} default {per_old:8.1f} µs  fast {per_new:8.1f} µs  "
+              f"({per_old / per_new:4.1f}x)  bytes {len(old_body)} → {len(new_body)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+bench_payloads.py
+Cost of building the /api/quiz/<id> question and answer-feedback responses
+three ways, on a synthetic bank:
+
+  rows      SQLite reads + jsonify (before content.bank)
+  bank      decoded content.bank lookups + jsonify
+  payload   pre-serialized fragments from content.bank joined as bytes
+
+Also times the encoding step alone (jsonify of a ready dict) to show what the
+fragments take off the request path. Uses QuizJSONProvider, as the app does.
+
+Usage: python benchmarks/bench_payloads.py [--questions 20000] [--repeat 20000]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bench_question_bank import build_content  # noqa: E402
+from json_provider import QuizJSONProvider, json_bytes_response, orjson  # noqa: E402
+from question_bank import QuestionBank, compile_question_bank  # noqa: E402
+
+QUIZ_ID = "0b6c1d2e-5f7a-4c3b-9d8e-1a2b3c4d5e6f"
+
+
+def question_rows(db, qid, number, total):
+    question = db.execute("SELECT * FROM questions WHERE id = ?", (qid,)).fetchone()
+    answers = db.execute("SELECT id, answer_text FROM answers WHERE question_id = ? ORDER BY RANDOM()",
+                         (qid,)).fetchall()
+    return {"quiz_id": QUIZ_ID, "question_number": number, "total_questions": total,
+            "question_id": question["id"], "question_text": question["question_text"],
+            "answers": [{"id": a["id"], "answer_text": a["answer_text"]} for a in answers]}
+
+
+def question_bank_dict(bank, qid, number, total):
+    question = bank.question(None, qid)
+    return {"quiz_id": QUIZ_ID, "question_number": number, "total_questions": total,
+            "question_id": qid, "question_text": question["question_text"],
+            "answers": [{"id": a["id"], "answer_text": a["answer_text"]}
+                        for a in bank.answers(None, qid, shuffle=True)]}
+
+
+def feedback_rows(db, qid):
+    correct = db.execute("SELECT * FROM answers WHERE question_id = ? AND is_correct = 1", (qid,)).fetchone()
+    question = db.execute("SELECT * FROM questions WHERE id = ?", (qid,)).fetchone()
+    return {"is_correct": True, "correct_answer_id": correct["id"], "correct_answer_text": correct["answer_text"],
+            "explanation": question["explanation"], "score": 4, "questions_answered": 5,
+            "total_questions": 10, "is_complete": False}
+
+
+def feedback_bank_dict(bank, qid):
+    correct, question = bank.correct_answer(None, qid), bank.question(None, qid)
+    return {"is_correct": True, "correct_answer_id": correct["id"], "correct_answer_text": correct["answer_text"],
+            "explanation": question["explanation"], "score": 4, "questions_answered": 5,
+            "total_questions": 10, "is_complete": False}
+
+
+SESSION_FIELDS = {"is_correct": True, "score": 4, "questions_answered": 5, "total_questions": 10, "is_complete": False}
+
+
+def per_call(fn, ids):
+    started = time.perf_counter()
+    for qid in ids:
+        fn(qid)
+    return (time.perf_counter() - started) / len(ids) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--questions", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=20_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    content, bank_path = os.path.join(directory, "content.db"), os.path.join(directory, "content.bank")
+    build_content(content, args.questions)
+    compile_question_bank(content, bank_path)
+    db = sqlite3.connect(content)
+    db.row_factory = sqlite3.Row
+    bank = QuestionBank(bank_path)
+
+    app = Flask(__name__)
+    app.json = QuizJSONProvider(app)
+    ids = [random.randint(1, args.questions) for _ in range(args.repeat)]
+    print(f"encoder: {'orjson' if orjson else 'stdlib json'}, {args.questions} questions, µs per response")
+    with app.app_context():
+        sample = question_bank_dict(bank, 1, 5, 10)
+        assert sorted(jsonify(sample).get_json()) == sorted(json_bytes_response(
+            bank.question_payload(1, QUIZ_ID, 5, 10)).get_json())
+        ready_question, ready_feedback = sample, feedback_bank_dict(bank, 1)
+
+        print("\nGET /api/quiz/<id>")
+        print(f"  rows      {per_call(lambda q: jsonify(question_rows(db, q, 5, 10)), ids):8.2f}")
+        print(f"  bank      {per_call(lambda q: jsonify(question_bank_dict(bank, q, 5, 10)), ids):8.2f}")
+        print(f"  payload   {per_call(lambda q: json_bytes_response(bank.question_payload(q, QUIZ_ID, 5, 10)), ids):8.2f}")
+        print(f"  (jsonify of a ready dict alone {per_call(lambda q: jsonify(ready_question), ids):.2f})")
+
+        print("\nPOST /api/quiz/<id>/answer (feedback)")
+        print(f"  rows      {per_call(lambda q: jsonify(feedback_rows(db, q)), ids):8.2f}")
+        print(f"  bank      {per_call(lambda q: jsonify(feedback_bank_dict(bank, q)), ids):8.2f}")
+        print(f"  payload   {per_call(lambda q: json_bytes_response(bank.feedback_payload(q, SESSION_FIELDS)), ids):8.2f}")
+        print(f"  (jsonify of a ready dict alone {per_call(lambda q: jsonify(ready_feedback), ids):.2f})")
+
+    db.close()
+    for path in (content, bank_path):
+        os.unlink(path)
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
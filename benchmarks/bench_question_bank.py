@@ -0,0 +1,167 @@
+"""
+bench_question_bank.py
+Memory per worker and lookup latency of the memory-mapped question bank
+(question_bank.py) against reading questions from SQLite and against a
+per-process dict cache of the whole bank.
+
+Builds a synthetic content database, compiles it, then forks --workers
+processes per strategy. Each one loads or touches every question and its
+answers, then the parent reads the worker's /proc/<pid>/smaps_rollup. PSS
+splits shared pages between the processes that map them, so the mmap'd file
+counts once across the workers. "private" is memory no other process shares.
+The numbers are per worker, minus a forked worker that did nothing. Linux only.
+
+Usage: python benchmarks/bench_question_bank.py [--questions 50000] [--workers 4] [--repeat 20000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from question_bank import QuestionBank, compile_question_bank  # noqa: E402
+
+WORDS = ("reactor coolant moderator neutron flux fuel channel pressure tube calandria shutdown "
+         "system safety licence regulatory dose limit shielding containment isotope decay").split()
+
+
+def sentence(n):
+    return " ".join(random.choice(WORDS) for _ in range(n)).capitalize()
+
+
+def build_content(path, questions):
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE categories (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE questions (id INTEGER PRIMARY KEY, category_id INTEGER, question_text TEXT,
+                                explanation TEXT, difficulty INTEGER, source TEXT);
+        CREATE TABLE answers (id INTEGER PRIMARY KEY, question_id INTEGER, answer_text TEXT, is_correct INTEGER);
+        CREATE INDEX idx_answers_question ON answers (question_id, is_correct);
+        CREATE TABLE content_info (name TEXT PRIMARY KEY, value) WITHOUT ROWID;
+        INSERT INTO content_info VALUES ('version', 1);
+    """)
+    db.executemany("INSERT INTO questions VALUES (?, ?, ?, ?, ?, ?)",
+                   ((i, i % 8 + 1, sentence(22) + "?", sentence(50) + ".", i % 3 + 1, "CNSC REGDOC-2.4.2")
+                    for i in range(1, questions + 1)))
+    db.executemany("INSERT INTO answers (question_id, answer_text, is_correct) VALUES (?, ?, ?)",
+                   ((i, sentence(9), int(k == 0)) for i in range(1, questions + 1) for k in range(4)))
+    db.commit()
+    db.close()
+
+
+# ─── Strategies: what one worker does to serve any question ───
+
+def sqlite_lookup(db, qid):
+    question = db.execute("SELECT * FROM questions WHERE id = ?", (qid,)).fetchone()
+    answers = db.execute("SELECT * FROM answers WHERE question_id = ? ORDER BY id", (qid,)).fetchall()
+    return question, answers
+
+
+def load_dict_cache(db):
+    cache = {row[0]: (row, []) for row in db.execute("SELECT * FROM questions")}
+    for row in db.execute("SELECT * FROM answers ORDER BY id"):
+        cache[row[1]][1].append(row)
+    return cache
+
+
+def worker(strategy, content, bank_path, ready, done):
+    keep = None
+    if strategy == "sqlite":
+        keep = sqlite3.connect(content)  # the connection and its page cache stay; the rows do not
+        for qid in range(1, keep.execute("SELECT MAX(id) FROM questions").fetchone()[0] + 1):
+            sqlite_lookup(keep, qid)
+    elif strategy == "dict":
+        keep = load_dict_cache(sqlite3.connect(content))
+    elif strategy == "bank":
+        keep = QuestionBank(bank_path)
+        m = keep.mapping()
+        for qid in m.question_id:
+            keep.question(None, qid)
+            keep.answers(None, qid)
+    ready.set()
+    done.wait()
+    del keep
+
+
+def memory(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values["Pss"], values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+
+
+def measure(strategy, workers, content, bank_path):
+    ctx = multiprocessing.get_context("fork")
+    done = ctx.Event()
+    procs = []
+    for _ in range(workers):
+        ready = ctx.Event()
+        p = ctx.Process(target=worker, args=(strategy, content, bank_path, ready, done))
+        p.start()
+        procs.append((p, ready))
+    for p, ready in procs:
+        ready.wait()
+    usage = [memory(p.pid) for p, _ in procs]
+    done.set()
+    for p, _ in procs:
+        p.join()
+    return statistics.mean(u[0] for u in usage), statistics.mean(u[1] for u in usage)
+
+
+def per_lookup(fn, ids):
+    started = time.perf_counter()
+    for qid in ids:
+        fn(qid)
+    return (time.perf_counter() - started) / len(ids) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--questions", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=20_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    content, bank_path = os.path.join(directory, "content.db"), os.path.join(directory, "content.bank")
+    build_content(content, args.questions)
+    started = time.perf_counter()
+    compile_question_bank(content, bank_path)
+    print(f"compile   {time.perf_counter() - started:7.2f} s   content.db {os.path.getsize(content) / 2**20:6.1f} MB"
+          f"   content.bank {os.path.getsize(bank_path) / 2**20:6.1f} MB")
+
+    ids = [random.randint(1, args.questions) for _ in range(args.repeat)]
+    db = sqlite3.connect(content)
+    db.row_factory = sqlite3.Row
+    bank = QuestionBank(bank_path)
+    cache = load_dict_cache(db)
+    print("\nlookup (question + answers), µs")
+    print(f"  sqlite, open connection   {per_lookup(lambda q: sqlite_lookup(db, q), ids):8.2f}")
+    print(f"  sqlite, new connection    {per_lookup(lambda q: sqlite_lookup(sqlite3.connect(content), q), ids[:2000]):8.2f}")
+    print(f"  dict cache                {per_lookup(lambda q: cache[q], ids):8.2f}")
+    print(f"  bank, decoded dicts       {per_lookup(lambda q: (bank.question(db, q), bank.answers(db, q)), ids):8.2f}")
+    print(f"  bank, raw question text   {per_lookup(lambda q: bank.raw(q, 'question_text'), ids):8.2f}")
+    del cache
+
+    baseline = measure("none", args.workers, content, bank_path)
+    print(f"\nmemory per worker after touching every question ({args.workers} workers), MB over an idle fork")
+    for strategy in ("sqlite", "dict", "bank"):
+        pss, private = measure(strategy, args.workers, content, bank_path)
+        print(f"  {strategy:7s} PSS {(pss - baseline[0]) / 1024:7.1f}   private {(private - baseline[1]) / 1024:7.1f}")
+
+    for path in (content, bank_path):
+        os.unlink(path)
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+bench_startup.py
+Cold start and memory per gunicorn worker: default settings, preload_app
+alone, and gunicorn.conf.py (preload_app + gc.freeze).
+
+Boots gunicorn on a scratch copy of the database (optionally padded with
+synthetic questions so the in-memory caches are a realistic size), waits until
+every worker has imported the app, sends some traffic, then reads each
+worker's /proc/<pid>/smaps_rollup. RSS counts pages shared with the master,
+so compare PSS (shared pages split between the processes mapping them) and
+private memory. Also times a plain `import app`. Linux only.
+
+Usage: python benchmarks/bench_startup.py [--workers 4] [--questions 50000] [--requests 200]
+"""
+
+import argparse
+import os
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BANNER = "APP STARTED OK"
+
+
+def scratch_database(directory, questions):
+    path = os.path.join(directory, "nuclear_quiz.db")
+    shutil.copy(os.path.join(ROOT, "nuclear_quiz.db"), path)
+    if questions:
+        db = sqlite3.connect(path)
+        categories = [r[0] for r in db.execute("SELECT id FROM categories")]
+        for i in range(questions):
+            qid = db.execute("INSERT INTO questions (category_id, question_text, explanation, difficulty) "
+                             "VALUES (?, ?, ?, ?)", (categories[i % len(categories)],
+                                                     f"Synthetic question {i} about reactor physics?",
+                                                     "Synthetic.", i % 3 + 1)).lastrowid
+            db.executemany("INSERT INTO answers (question_id, answer_text, is_correct) VALUES (?, ?, ?)",
+                           [(qid, f"Option {k} for {i}", int(k == 0)) for k in range(4)])
+        db.commit()
+        db.close()
+    return path
+
+
+def import_time(env, repeat=5):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import app"], cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _memory(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values["Rss"], values["Pss"], values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)
+
+
+def run_server(env, workers, requests, config):
+    """Boot gunicorn with the given config file; returns (seconds until ready,
+    memory of each worker, memory of the master)."""
+    port = _free_port()
+    cmd = [sys.executable, "-m", "gunicorn", "-c", config, "--bind", f"127.0.0.1:{port}", "--workers", str(workers)]
+    preload = "preload" in open(os.path.join(ROOT, config)).read()
+    log = tempfile.TemporaryFile(mode="w+")
+    started = time.perf_counter()
+    server = subprocess.Popen(cmd + ["app:app"], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        # Without preload every worker imports the app (one banner each); with it, only the master
+        banners = 1 if preload else workers
+        while True:
+            log.seek(0)
+            children = open(f"/proc/{server.pid}/task/{server.pid}/children").read().split()
+            if log.read().count(BANNER) >= banners and len(children) >= workers:
+                try:
+                    urllib.request.urlopen(f"http://127.0.0.1:{port}/login", timeout=1).read()
+                    break
+                except OSError:
+                    pass
+            if server.poll() is not None:
+                log.seek(0)
+                raise RuntimeError("gunicorn exited:\n" + log.read())
+            time.sleep(0.01)
+        ready = time.perf_counter() - started
+
+        for i in range(requests):
+            path = ("/login", "/api/categories", "/static/styles.css")[i % 3]
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=5).read()
+            except OSError:
+                pass
+        pids = [int(p) for p in open(f"/proc/{server.pid}/task/{server.pid}/children").read().split()]
+        return ready, [_memory(pid) for pid in pids], _memory(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--questions", type=int, default=50_000, help="synthetic questions added to the bank")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_PATH=scratch_database(directory, args.questions),
+               SESSION_DIR=os.path.join(directory, "sessions"), RATE_LIMIT_DB=os.path.join(directory, "rl.db"),
+               PYTHONUNBUFFERED="1")  # so worker banners reach the log as they print
+    print(f"import app   {import_time(env) * 1000:8.1f} ms")
+
+    # gunicorn reads ./gunicorn.conf.py by default, so the baseline needs an explicit empty config
+    plain = os.path.join(directory, "plain.conf.py")
+    open(plain, "w").close()
+    preload_only = os.path.join(directory, "preload.conf.py")
+    with open(preload_only, "w") as f:
+        f.write("preload_app = True\n")
+    for label, config in (("plain", plain), ("preload", preload_only), ("gunicorn.conf", "gunicorn.conf.py")):
+        ready, workers, master = run_server(env, args.workers, args.requests, config)
+        rss, pss, private = (statistics.mean(w[i] for w in workers) / 1024 for i in range(3))
+        total = (sum(w[1] for w in workers) + master[1]) / 1024
+        print(f"{label:13s} ready {ready * 1000:7.0f} ms   per worker: RSS {rss:6.1f} MB  PSS {pss:6.1f} MB  "
+              f"private {private:6.1f} MB   all processes PSS {total:6.1f} MB")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
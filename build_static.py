@@ -0,0 +1,66 @@
+"""
+build_static.py
+Fingerprints and precompresses the files in static/ for production.
+For every asset (e.g. styles.css) it writes static/dist/styles.<hash>.css plus
+.gz and .br siblings, and records the mapping in static/dist/manifest.json,
+which compression.py uses to serve them with immutable cache headers.
+
+Usage: python build_static.py
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+PRECOMPRESS_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt"}
+
+
+def build():
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    for name in sorted(os.listdir(STATIC_DIR)):
+        path = os.path.join(STATIC_DIR, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+
+        stem, ext = os.path.splitext(name)
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        hashed_name = f"{stem}.{digest}{ext}"
+        hashed_path = os.path.join(DIST_DIR, hashed_name)
+        with open(hashed_path, "wb") as f:
+            f.write(data)
+        manifest[name] = f"dist/{hashed_name}"
+
+        line = f"  {name:20s} → dist/{hashed_name}  {len(data)} B"
+        if ext in PRECOMPRESS_EXTENSIONS:
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            with open(hashed_path + ".gz", "wb") as f:
+                f.write(gz)
+            line += f", gzip {len(gz)} B"
+            if brotli is not None:
+                br = brotli.compress(data, quality=11)
+                with open(hashed_path + ".br", "wb") as f:
+                    f.write(br)
+                line += f", br {len(br)} B"
+        print(line)
+
+    with open(os.path.join(DIST_DIR, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f"Wrote {len(manifest)} assets to {DIST_DIR}")
+
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,111 @@
+"""
+compression.py
+Response compression and fingerprinted static assets for app.py.
+
+- JSON and HTML responses above COMPRESS_MIN_SIZE bytes are compressed with
+  Brotli (if the brotli package is installed) or gzip, whichever the client
+  prefers in Accept-Encoding.
+- Static files listed in static/dist/manifest.json (written by build_static.py)
+  are served from their content-hashed copies, using the precompressed .br/.gz
+  sibling when the client accepts it, with a one-year immutable Cache-Control.
+"""
+
+import gzip
+import json
+import os
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+COMPRESS_MIMETYPES = {"application/json", "text/html", "text/css", "application/javascript"}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # dynamic responses: favour speed, static assets use 11 at build time
+
+MANIFEST_PATH = os.path.join("dist", "manifest.json")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def _negotiate_encoding():
+    """Return 'br', 'gzip' or None based on the request's Accept-Encoding."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"] > 0 and accepted["br"] >= accepted["gzip"]:
+        return "br"
+    if accepted["gzip"] > 0:
+        return "gzip"
+    return None
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def load_manifest(static_folder):
+    """Map logical asset names to hashed paths, e.g. styles.css → dist/styles.3f2a….css."""
+    try:
+        with open(os.path.join(static_folder, MANIFEST_PATH)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_compression(app):
+    manifest = load_manifest(app.static_folder)
+    hashed_assets = set(manifest.values())
+
+    @app.context_processor
+    def inject_asset_url():
+        def asset_url(filename):
+            return url_for("static", filename=manifest.get(filename, filename))
+        return {"asset_url": asset_url}
+
+    @app.after_request
+    def compress_response(response):
+        if request.endpoint == "static":
+            return _static_response(app, response, hashed_assets)
+
+        response.vary.add("Accept-Encoding")
+        if (response.status_code != 200
+                or response.direct_passthrough
+                or response.is_streamed
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESS_MIMETYPES):
+            return response
+
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        encoding = _negotiate_encoding()
+        if encoding is None:
+            return response
+
+        response.set_data(compress(data, encoding))
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+
+def _static_response(app, response, hashed_assets):
+    filename = request.view_args.get("filename") if request.view_args else None
+    if filename not in hashed_assets or response.status_code != 200:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    encoding = _negotiate_encoding()
+    suffix = {"br": ".br", "gzip": ".gz"}.get(encoding)
+    if suffix is None or not os.path.exists(os.path.join(app.static_folder, filename + suffix)):
+        return response
+
+    response.close()
+    precompressed = send_from_directory(app.static_folder, filename + suffix,
+                                        mimetype=response.mimetype, max_age=31536000)
+    precompressed.headers["Content-Encoding"] = encoding
+    precompressed.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    precompressed.vary.add("Accept-Encoding")
+    return precompressed
@@ -0,0 +1,357 @@
+"""
+content_db.py
+The question bank in a database file of its own.
+
+categories, questions and answers live in content.db next to the user-data
+database, along with what hangs off them: the question_search full-text index
+and the answer counts and listing indexes from question_browser.py. get_db()
+attaches the file as schema "content", opened read-only with immutable=1 and
+memory-mapped. SQLite takes no locks on it and never checks it for changes, so
+question reads never wait behind result writes to nuclear_quiz.db. The
+user-data file has no tables with those names, so queries keep using them
+unqualified.
+
+The file is never modified in place. edit_content() copies it, hands out a
+writable connection to the copy (or attaches the copy to a user-data
+connection, so one transaction can touch both), then renames the copy over the
+original. The memory-mapped content.bank (question_bank.py) is compiled from
+the copy just before the rename, so it is never older than the live file.
+Connections opened before the rename keep reading the old file until they
+close, and new ones see the new file; content_watch.py tells every worker to
+drop its caches. Each swap increments the version in content_info, which also
+holds the question and category counts shown on the admin dashboard.
+
+ensure_content_database() moves the three tables out of nuclear_quiz.db the
+first time it runs. It also drops the foreign keys in results and
+quiz_sessions that pointed at them, because SQLite cannot enforce a foreign key
+across files.
+
+Usage: python content_db.py info
+       python content_db.py install NEW_CONTENT.db   # swap in a question bank built elsewhere
+"""
+
+import argparse
+import fcntl
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+from urllib.parse import quote
+
+from content_watch import content_watch
+from helpers import CONTENT_DATABASE, attach_content, get_db
+from partitions import ensure_partition_catalog
+from question_bank import compile_question_bank, ensure_question_bank
+from question_browser import ensure_question_browser
+from search import ensure_search_index
+
+CONTENT_TABLES = ("categories", "questions", "answers")
+
+# "REFERENCES questions(id)" and the like, in user-data tables created before the split
+_CONTENT_REFERENCE = re.compile(r"\s+REFERENCES\s+[\"']?(?:categories|questions|answers)[\"']?\s*\([^)]*\)", re.I)
+
+
+def _tables(db, schema="main"):
+    return {r[0] for r in db.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")}
+
+
+def content_attached(db):
+    return any(row[1] == "content" for row in db.execute("PRAGMA database_list"))
+
+
+def _detach(db):
+    if content_attached(db):
+        db.commit()
+        db.execute("DETACH DATABASE content")
+
+
+def content_info(db):
+    """{name: value} from content_info (version, built_at and the counts), or {}
+    while the question bank is still inside the user-data file."""
+    if not content_attached(db):
+        return {}
+    return dict(db.execute("SELECT name, value FROM content.content_info").fetchall())
+
+
+def _prepare(conn, version=None):
+    """Build the derived structures in a writable content file and stamp
+    content_info with a new version and the current counts."""
+    ensure_search_index(conn)
+    ensure_question_browser(conn)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS content_info (
+            name TEXT PRIMARY KEY,
+            value
+        ) WITHOUT ROWID
+    """)
+    current = conn.execute("SELECT value FROM content_info WHERE name = 'version'").fetchone()
+    version = max(version or 0, (current[0] if current else 0) + 1)
+    conn.executemany("INSERT OR REPLACE INTO content_info (name, value) VALUES (?, ?)", [
+        ("version", version),
+        ("questions", conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]),
+        ("categories", conn.execute("SELECT COUNT(*) FROM categories").fetchone()[0]),
+    ])
+    conn.execute("INSERT OR REPLACE INTO content_info (name, value) VALUES ('built_at', CURRENT_TIMESTAMP)")
+    conn.commit()
+    return version
+
+
+def _live_version():
+    """Version of the content.db in place, 0 if there is none. Versions only go up,
+    even when a file is replaced by one built elsewhere."""
+    if not os.path.exists(CONTENT_DATABASE):
+        return 0
+    live = sqlite3.connect(f"file:{quote(os.path.abspath(CONTENT_DATABASE))}?mode=ro", uri=True)
+    try:
+        row = live.execute("SELECT value FROM content_info WHERE name = 'version'").fetchone()
+    except sqlite3.OperationalError:  # no content_info
+        row = None
+    finally:
+        live.close()
+    return row[0] if row else 0
+
+
+def _working_copy(source=None):
+    """A path for a new content file in the same directory as CONTENT_DATABASE
+    (os.replace is only atomic within a filesystem), optionally a copy of `source`."""
+    fd, path = tempfile.mkstemp(prefix=".content-", suffix=".db", dir=os.path.dirname(os.path.abspath(CONTENT_DATABASE)))
+    os.close(fd)
+    if source:
+        shutil.copyfile(source, path)
+    else:
+        os.unlink(path)
+    return path
+
+
+def _swap(path):
+    """Put a finished content file in place: flushed to disk first, so a crash
+    leaves either the old file or the complete new one."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.close()
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.chmod(path, 0o644)
+    compile_question_bank(path)
+    os.replace(path, CONTENT_DATABASE)
+    fd = os.open(os.path.dirname(os.path.abspath(CONTENT_DATABASE)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    content_watch.refresh()
+
+
+@contextmanager
+def _content_lock():
+    """One content edit at a time, across processes. Readers never take it."""
+    with open(CONTENT_DATABASE + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+@contextmanager
+def edit_content(db=None):
+    """
+    Change the question bank. Without `db`, yields a writable connection to a
+    copy of content.db. With a user-data connection, attaches the copy to it as
+    "content" instead (committing anything pending first), so unqualified
+    writes to questions and friends go to the copy and can share a transaction
+    with user-data writes. When the block ends the connection is committed and
+    the copy swapped in, and `db` sees the new file. If it raises, the copy is
+    thrown away.
+    """
+    if not os.path.exists(CONTENT_DATABASE):
+        main = db or get_db()
+        ensure_content_database(main)
+        if db is None:
+            main.close()
+    with _content_lock():
+        working = _working_copy(CONTENT_DATABASE)
+        try:
+            if db is None:
+                conn = sqlite3.connect(working)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA foreign_keys = ON")
+            else:
+                _detach(db)
+                db.execute("ATTACH DATABASE ? AS content", (working,))
+                conn = db
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                if db is None:
+                    conn.close()
+                else:
+                    db.execute("DETACH DATABASE content")
+            finished = sqlite3.connect(working)
+            _prepare(finished)
+            finished.close()
+            _swap(working)
+        except BaseException:
+            if os.path.exists(working):
+                os.unlink(working)
+            raise
+        finally:
+            if db is not None and not content_attached(db):
+                attach_content(db)
+
+
+def install_content(path):
+    """Swap in a content file prepared elsewhere (for instance built from a
+    release's question bank). Returns the new version."""
+    check = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+    missing = set(CONTENT_TABLES) - _tables(check)
+    check.close()
+    if missing:
+        raise ValueError(f"{path} has no {', '.join(sorted(missing))} table")
+    with _content_lock():
+        working = _working_copy(path)
+        try:
+            conn = sqlite3.connect(working)
+            version = _prepare(conn, version=_live_version() + 1)
+            conn.close()
+            _swap(working)
+        except BaseException:
+            if os.path.exists(working):
+                os.unlink(working)
+            raise
+    return version
+
+
+def split_content(db):
+    """
+    Move categories, questions and answers out of the user-data file into a new
+    content.db, replacing any existing one, then drop them (with question_search
+    and the triggers on them) from the user-data file. results and quiz_sessions
+    are rebuilt once without their foreign keys to those tables.
+    """
+    db.commit()
+    _detach(db)
+    with _content_lock():
+        working = _working_copy()
+        try:
+            # The same DDL as the source, so AUTOINCREMENT, defaults and added columns carry over
+            new = sqlite3.connect(working)
+            for table in CONTENT_TABLES:
+                new.execute(db.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                       (table,)).fetchone()[0])
+            new.commit()
+            new.close()
+            db.execute("ATTACH DATABASE ? AS content_new", (working,))
+            db.execute("BEGIN IMMEDIATE")
+            for table in CONTENT_TABLES:
+                db.execute(f"INSERT INTO content_new.{table} SELECT * FROM main.{table}")
+            db.execute("DELETE FROM content_new.sqlite_sequence")
+            db.execute(f"""
+                INSERT INTO content_new.sqlite_sequence SELECT * FROM main.sqlite_sequence
+                WHERE name IN ({', '.join('?' * len(CONTENT_TABLES))})
+            """, CONTENT_TABLES)
+            db.commit()
+            db.execute("DETACH DATABASE content_new")
+            conn = sqlite3.connect(working)
+            _prepare(conn, version=_live_version() + 1)
+            conn.execute("VACUUM")
+            conn.close()
+            _swap(working)
+        except BaseException:
+            db.rollback()
+            if os.path.exists(working):
+                os.unlink(working)
+            raise
+    _drop_content_tables(db)
+
+
+def _drop_content_tables(db):
+    db.commit()
+    db.execute("PRAGMA foreign_keys = OFF")  # a no-op inside a transaction, so before BEGIN
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        # The view over the results partitions would block the renames below; recreated at the end
+        db.execute("DROP VIEW IF EXISTS results_all")
+        db.execute("DROP TABLE IF EXISTS question_search")
+        for table in reversed(CONTENT_TABLES):
+            db.execute(f"DROP TABLE IF EXISTS {table}")
+        for table, sql in db.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table'").fetchall():
+            if sql and _CONTENT_REFERENCE.search(sql):
+                _rebuild_without_references(db, table, sql)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.execute("PRAGMA foreign_keys = ON")
+    ensure_partition_catalog(db)
+
+
+def _rebuild_without_references(db, table, sql):
+    """Recreate `table` from its own DDL minus the content foreign keys, with its
+    indexes and triggers. Caller holds the transaction."""
+    dependents = [r[0] for r in db.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,))]
+    create = re.sub(rf"^CREATE TABLE\s+(IF NOT EXISTS\s+)?[\"']?{table}[\"']?", f"CREATE TABLE {table}_migrating",
+                    _CONTENT_REFERENCE.sub("", sql), count=1, flags=re.I)
+    db.execute(f"DROP TABLE IF EXISTS {table}_migrating")
+    db.execute(create)
+    db.execute(f"INSERT INTO {table}_migrating SELECT * FROM {table}")
+    db.execute(f"DROP TABLE {table}")
+    db.execute(f"ALTER TABLE {table}_migrating RENAME TO {table}")
+    for statement in dependents:
+        db.execute(statement)
+
+
+def ensure_content_database(db):
+    """Split the question bank out of the user-data file if it is still there
+    (a fresh seed database, or an old backup restored over the volume; the
+    user-data copy wins), then make sure `db` has it attached. Safe to call on
+    every startup."""
+    if "questions" in _tables(db):
+        split_content(db)
+    if not content_attached(db):
+        attach_content(db)
+    ensure_question_bank()
+
+
+# ─── CLI ──────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("info", help="show the live question bank's version and counts")
+    install = sub.add_parser("install", help="swap in a content file built elsewhere")
+    install.add_argument("path")
+    args = parser.parse_args()
+
+    db = get_db()
+    try:
+        ensure_content_database(db)
+        if args.command == "install":
+            try:
+                version = install_content(args.path)
+            except (ValueError, sqlite3.Error) as e:
+                print(f"Not installed: {e}", file=sys.stderr)
+                return 1
+            print(f"Installed {args.path} as {CONTENT_DATABASE} (version {version})")
+        else:
+            print(CONTENT_DATABASE)
+            for name, value in content_info(db).items():
+                print(f"  {name}: {value}")
+            print(f"  size: {os.path.getsize(CONTENT_DATABASE) / 1024:.0f} KB")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
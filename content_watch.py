@@ -0,0 +1,99 @@
+"""
+content_watch.py
+Tells every worker when the question bank has changed, so in-process caches
+built from it (question_index, difficulty_index, question_bank, …) drop their
+copies together instead of waiting out their own TTLs.
+
+Content is only ever changed by swapping a new content.db into place
+(content_db.py), and every swap stamps a higher version in content_info. Each
+worker remembers the file it last saw, as (inode, mtime, size). check() runs
+before every request, and at most once per CONTENT_CHECK_INTERVAL seconds it
+stats the file. Only when the file is a different one does it read the
+version. If the version has gone up, it calls every subscribed invalidate
+hook. The caches then reload lazily on their next use. The cost is one
+os.stat() per interval per worker: no broker, no restarts, and no query per
+request.
+
+PRAGMA data_version cannot do this job. content.db is attached immutable, and
+a file renamed over the old one is never the file a connection has open.
+
+Caches register with subscribe() next to their singleton. A worker that swaps
+the file itself calls refresh(), so its own caches are invalidated at once.
+"""
+
+import os
+import sqlite3
+import time
+from urllib.parse import quote
+
+CONTENT_CHECK_INTERVAL = float(os.environ.get("CONTENT_CHECK_INTERVAL", 2))
+
+
+def _content_database():
+    # Not imported at the top: helpers imports adaptive.py, which subscribes here
+    from helpers import CONTENT_DATABASE
+    return CONTENT_DATABASE
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def _version(path):
+    """content_info version of the file at `path`, 0 if it has none."""
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM content_info WHERE name = 'version'").fetchone()
+    except sqlite3.Error:  # no file or no content_info yet
+        row = None
+    finally:
+        conn.close()
+    return row[0] if row else 0
+
+
+class ContentWatch:
+    def __init__(self, path=None, interval=CONTENT_CHECK_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.version = None
+        self._stamp = None
+        self._checked_at = 0.0
+        self._hooks = []
+
+    def subscribe(self, invalidate):
+        """Call `invalidate()` whenever the content version changes. Returns it, so it
+        can decorate a function."""
+        self._hooks.append(invalidate)
+        return invalidate
+
+    def check(self):
+        """Invalidate subscribers if content.db was swapped since the last look; the
+        file is looked at no more than once per interval. Returns the version."""
+        now = time.monotonic()
+        if self._checked_at and now - self._checked_at < self.interval:
+            return self.version
+        self._checked_at = now
+        path = self.path or _content_database()
+        stamp = _stamp(path)
+        if stamp == self._stamp:
+            return self.version
+        self._stamp = stamp
+        version = _version(path) if stamp else 0
+        if version != self.version:
+            self.version = version
+            for invalidate in self._hooks:
+                invalidate()
+        return self.version
+
+    def refresh(self):
+        """Look at the file now (after this process swapped it)."""
+        self._checked_at = 0.0
+        return self.check()
+
+
+# One per process, primed before gunicorn forks (app.py); see subscribe() callers
+content_watch = ContentWatch()
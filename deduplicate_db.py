@@ -1,15 +1,33 @@
 """
 deduplicate_db.py
-Removes duplicate categories and questions from nuclear_quiz.db.
+Removes duplicate categories and questions from the question bank (content.db).
 Safe to run multiple times (idempotent).
+
+After the exact-match cleanup it looks for near-duplicates (reworded copies,
+possibly in other categories): each question's text and answers are cut into
+word shingles, summarised as a MinHash signature, and LSH banding buckets
+signatures so only questions sharing a band are ever compared — near-linear
+in the size of the bank instead of all pairs. Candidates are ranked by the
+exact Jaccard similarity of their shingle sets.
+
+With --merge-above, pairs at or above that similarity are merged into the
+lowest id: results (hot table and partition tables), review schedules,
+per-question state and open quiz sessions are repointed to the kept question
+and its matching answers, then the duplicate is deleted. Archived .csv.gz
+months keep the old ids.
+
+Usage: python deduplicate_db.py [--near-threshold 0.5] [--limit 50] [--merge-above 0.85] [--dry-run]
 """
-import sqlite3
-import os
+import argparse
+import re
+import zlib
+from collections import defaultdict
 
-DATABASE = os.environ.get(
-    "DATABASE_PATH",
-    os.path.join(os.path.dirname(os.path.abspath(__file__)), "nuclear_quiz.db")
-)
+import numpy as np
+
+from content_db import edit_content, ensure_content_database
+from helpers import CONTENT_DATABASE, DATABASE, get_db
+from quizzes import pack_question_ids, parse_question_ids
 
 def report(db, label):
     cats = db.execute("SELECT COUNT(*) FROM categories").fetchone()[0]
@@ -99,17 +117,215 @@ def deduplicate(db):
         db.commit()
 
 
+# ── Near duplicates (MinHash / LSH) ──────────────────────────────────────
+NUM_PERM = 128        # signature length
+BANDS, ROWS = 32, 4   # BANDS × ROWS == NUM_PERM; pairs above ~(1/BANDS)^(1/ROWS) ≈ 0.42 collide
+SHINGLE_WORDS = 2
+_PRIME = 4294967311   # > 2^32, so a·h + b stays below 2^64 in uint64
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_rng = np.random.default_rng(20240229)  # fixed: signatures are comparable across runs
+_PERM_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 2 ** 63, ROWS, dtype=np.uint64) | np.uint64(1)
+
+
+def shingles(text):
+    """Set of SHINGLE_WORDS-word shingles of lower-cased alphanumeric words, as 32-bit hashes."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + SHINGLE_WORDS]).encode())
+            for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(shingle_set):
+    """NUM_PERM minimum hash values under the permutations x → (a·x + b) mod p."""
+    h = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set))
+    return ((_PERM_A[:, None] * h[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+
+def question_documents(db):
+    """{question_id: shingle set} over question text plus every answer text."""
+    texts = defaultdict(list)
+    for qid, text in db.execute("SELECT id, question_text FROM questions"):
+        texts[qid].append(text or "")
+    for qid, text in db.execute("SELECT question_id, answer_text FROM answers"):
+        if qid in texts:
+            texts[qid].append(text or "")
+    return {qid: shingles(" ".join(parts)) for qid, parts in texts.items()}
+
+
+def near_duplicates(db, threshold=0.5):
+    """Candidate pairs from LSH buckets, verified and ranked by exact Jaccard:
+    [(similarity, keep_id, duplicate_id)], most similar first."""
+    docs = {qid: s for qid, s in question_documents(db).items() if s}
+    ids = np.array(sorted(docs), dtype=np.int64)
+    if len(ids) < 2:
+        return []
+    signatures = np.vstack([minhash(docs[qid]) for qid in ids])
+    # One (wrapping) uint64 per band; two questions share a bucket when a band's key matches
+    keys = (signatures.reshape(len(ids), BANDS, ROWS) * _BAND_MIX).sum(axis=2)
+
+    candidates = set()
+    for band in range(BANDS):
+        order = np.argsort(keys[:, band], kind="stable")
+        sorted_keys = keys[order, band]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        sizes = np.diff(np.r_[starts, len(order)])
+        for start, size in zip(starts[sizes > 1], sizes[sizes > 1]):
+            members = sorted(ids[order[start:start + size]].tolist())
+            candidates.update((a, b) for i, a in enumerate(members) for b in members[i + 1:])
+
+    pairs = []
+    for a, b in candidates:
+        similarity = len(docs[a] & docs[b]) / len(docs[a] | docs[b])
+        if similarity >= threshold:
+            pairs.append((similarity, a, b))
+    pairs.sort(key=lambda p: (-p[0], p[1], p[2]))
+    return pairs
+
+
+def print_near_duplicates(db, pairs, limit):
+    print(f"\nNear-duplicate questions: {len(pairs)} pairs")
+    info = {r[0]: r[1:] for r in db.execute(
+        "SELECT q.id, c.name, q.question_text FROM questions q LEFT JOIN categories c ON c.id = q.category_id")}
+    for similarity, a, b in pairs[:limit]:
+        print(f"  {similarity:.2f}  #{a} [{info[a][0]}] {info[a][1][:70]}")
+        print(f"        #{b} [{info[b][0]}] {info[b][1][:70]}")
+    if len(pairs) > limit:
+        print(f"  … {len(pairs) - limit} more (raise --limit to see them)")
+
+
+def merge_groups(pairs, merge_above):
+    """Union pairs at or above merge_above into groups; {duplicate_id: kept_id}
+    with the lowest id of each group kept."""
+    parent = {}
+
+    def find(x):
+        while parent.get(x, x) != x:
+            x = parent[x]
+        return x
+
+    for similarity, a, b in pairs:
+        if similarity >= merge_above:
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+    return {qid: find(qid) for qid in parent}
+
+
+def _answer_map(db, keep_id, drop_id):
+    """{duplicate answer id: kept answer id}: correct to correct, each
+    distractor to the kept distractor sharing the most words."""
+    keep = db.execute("SELECT id, answer_text, is_correct FROM answers WHERE question_id = ?", (keep_id,)).fetchall()
+    if not keep:
+        return {}
+    keep_correct = next((a[0] for a in keep if a[2]), keep[0][0])
+    distractors = [(a[0], set(_WORD_RE.findall((a[1] or "").lower()))) for a in keep if not a[2]]
+    mapping = {}
+    for answer_id, text, is_correct in db.execute(
+            "SELECT id, answer_text, is_correct FROM answers WHERE question_id = ?", (drop_id,)):
+        if is_correct or not distractors:
+            mapping[answer_id] = keep_correct
+            continue
+        words = set(_WORD_RE.findall((text or "").lower()))
+        mapping[answer_id] = max(distractors, key=lambda d: len(words & d[1]) / (len(words | d[1]) or 1))[0]
+    return mapping
+
+
+def _existing_tables(db):
+    return {r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def merge_duplicates(db, merged):
+    """Fold every duplicate into its kept question in one transaction."""
+    tables = _existing_tables(db)
+    results_tables = ["results"]
+    if "results_partitions" in tables:
+        results_tables += [r[0] for r in db.execute("SELECT name FROM results_partitions WHERE state = 'table'")]
+
+    db.execute("BEGIN IMMEDIATE")
+    for drop_id, keep_id in sorted(merged.items()):
+        mapping = _answer_map(db, keep_id, drop_id)
+        for table in results_tables:
+            db.executemany(f"UPDATE {table} SET question_id = ?, answer_id = ? WHERE question_id = ? AND answer_id = ?",
+                           [(keep_id, new, drop_id, old) for old, new in mapping.items()])
+            db.execute(f"UPDATE {table} SET question_id = ? WHERE question_id = ?", (keep_id, drop_id))
+        # One row per (user, question): a user who has both keeps the kept question's row
+        for table in ("user_question_schedule", "user_question_state"):
+            if table in tables:
+                db.execute(f"UPDATE OR IGNORE {table} SET question_id = ? WHERE question_id = ?", (keep_id, drop_id))
+                db.execute(f"DELETE FROM {table} WHERE question_id = ?", (drop_id,))
+        if "user_question_state" in tables:
+            db.executemany("UPDATE user_question_state SET last_answer_id = ? WHERE question_id = ? AND last_answer_id = ?",
+                           [(new, keep_id, old) for old, new in mapping.items()])
+        if "question_counters" in tables:
+            db.execute("""INSERT INTO question_counters (question_id, attempts, correct)
+                          SELECT ?, attempts, correct FROM question_counters WHERE question_id = ?
+                          ON CONFLICT (question_id) DO UPDATE SET
+                              attempts = attempts + excluded.attempts, correct = correct + excluded.correct""",
+                       (keep_id, drop_id))
+            db.executemany("""INSERT INTO answer_counters (answer_id, question_id, picks)
+                              SELECT ?, ?, picks FROM answer_counters WHERE answer_id = ?
+                              ON CONFLICT (answer_id) DO UPDATE SET picks = picks + excluded.picks""",
+                           [(new, keep_id, old) for old, new in mapping.items()])
+            db.execute("DELETE FROM answer_counters WHERE question_id = ?", (drop_id,))
+        for table in ("question_ratings", "question_stats", "answer_stats", "question_counters"):
+            if table in tables:
+                db.execute(f"DELETE FROM {table} WHERE question_id = ?", (drop_id,))
+        db.execute("DELETE FROM answers WHERE question_id = ?", (drop_id,))
+        db.execute("DELETE FROM questions WHERE id = ?", (drop_id,))
+
+    # Quizzes in progress serve questions by id; point them at the kept questions.
+    # Read under the lock, so a quiz started meanwhile is not missed.
+    if "quiz_sessions" in tables:
+        for session_id, stored in db.execute(
+                "SELECT id, question_ids FROM quiz_sessions WHERE completed = 0").fetchall():
+            ids = parse_question_ids({"question_ids": stored})  # packed or older JSON text
+            if any(i in merged for i in ids):
+                db.execute("UPDATE quiz_sessions SET question_ids = ? WHERE id = ?",
+                           (pack_question_ids([merged.get(i, i) for i in ids]), session_id))
+    db.commit()
+
+
 def main():
-    print(f"Database: {DATABASE}")
-    db = sqlite3.connect(DATABASE)
+    parser = argparse.ArgumentParser(description="Remove duplicate categories and questions")
+    parser.add_argument("--near-threshold", type=float, default=0.5,
+                        help="report near-duplicate pairs at or above this Jaccard similarity")
+    parser.add_argument("--limit", type=int, default=50, help="pairs to print")
+    parser.add_argument("--merge-above", type=float,
+                        help="merge near-duplicate pairs at or above this similarity into the lower id")
+    parser.add_argument("--dry-run", action="store_true", help="with --merge-above, only list the merges")
+    args = parser.parse_args()
+
+    print(f"Database: {DATABASE} (questions in {CONTENT_DATABASE})")
+    db = get_db()
+    db.row_factory = None
+    ensure_content_database(db)
     db.execute("PRAGMA foreign_keys = OFF")  # allow deletions without cascade issues
 
-    report(db, "Before")
-    deduplicate(db)
-    report(db, "After")
+    # Questions are deleted from a copy of content.db that replaces the live one at the end
+    with edit_content(db):
+        report(db, "Before")
+        deduplicate(db)
+
+        pairs = near_duplicates(db, args.near_threshold)
+        print_near_duplicates(db, pairs, args.limit)
+        if args.merge_above is not None:
+            merged = merge_groups(pairs, args.merge_above)
+            print(f"\nMerging {len(merged)} questions at similarity ≥ {args.merge_above}"
+                  + (" (dry run)" if args.dry_run else ""))
+            for drop_id, keep_id in sorted(merged.items()):
+                print(f"  #{drop_id} → #{keep_id}")
+            if merged and not args.dry_run:
+                merge_duplicates(db, merged)
+                print("Run `python maintenance.py rebuild-progress` and `rebuild-leaderboards` "
+                      "if any merge crossed categories.")
+        report(db, "After")
 
     print("\nCategories after cleanup:")
-    for row in db.execute("SELECT id, name, COUNT(q.id) as n FROM categories c LEFT JOIN questions q ON q.category_id = c.id GROUP BY c.id ORDER BY c.id").fetchall():
+    for row in db.execute("SELECT c.id, c.name, COUNT(q.id) as n FROM categories c LEFT JOIN questions q ON q.category_id = c.id GROUP BY c.id ORDER BY c.id").fetchall():
         print(f"  {row[0]:2d}. {row[1]} ({row[2]} questions)")
 
     db.close()
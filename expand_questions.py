@@ -8,10 +8,7 @@ Expands existing categories to 20 questions each, and adds three new categories:
 Usage: python expand_questions.py
 """
 
-import sqlite3
-import os
-
-DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nuclear_quiz.db")
+from content_db import edit_content
 
 
 def add_question(db, category_id, question_text, answers, correct_index, explanation, difficulty=1, source=""):
@@ -35,11 +32,7 @@ def add_category(db, name, description, icon):
     return cursor.lastrowid
 
 
-def main():
-    db = sqlite3.connect(DATABASE)
-    db.row_factory = sqlite3.Row
-    db.execute("PRAGMA foreign_keys = ON")
-
+def add_all(db):
     # ═══════════════════════════════════════════════════════════════════════
     # TOP UP EXISTING CATEGORIES TO 20 QUESTIONS EACH
     # ═══════════════════════════════════════════════════════════════════════
@@ -1582,8 +1575,11 @@ def main():
         source="INPO; CANDU Owners Group"
     )
 
-    db.commit()
-    db.close()
+
+def main():
+    # The question bank is content.db now; edit_content() swaps in the updated copy
+    with edit_content() as db:
+        add_all(db)
 
     print("Expansion complete!")
     print()
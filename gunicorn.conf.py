@@ -0,0 +1,49 @@
+"""
+gunicorn.conf.py
+Production server settings (used by the Dockerfile CMD).
+
+The app is imported once in the master (preload_app), so the schema checks
+and cache warm-up in app.py run once per deploy instead of once
+per worker. Workers are forked from that master and share its pages
+copy-on-write. Two things keep those pages shared:
+
+  * the collector stays off while the app loads and gc.freeze() runs before
+    each fork, moving every object loaded so far into the permanent
+    generation. Later collections in the workers then never write to the
+    inherited objects' GC headers, which would otherwise copy the page.
+  * workers switch the collector back on straight after the fork, and the
+    master does the same once the app is loaded and frozen (when_ready), so
+    its own garbage from reloads and signals is still collected.
+
+Usage: gunicorn -c gunicorn.conf.py app:app
+       (settings below can be overridden with GUNICORN_* environment variables)
+"""
+
+import gc
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+accesslog = "-"
+errorlog = "-"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") not in ("0", "false", "off")
+
+# No collections while the master imports the app: they would only leave
+# freed holes in pages the workers are about to share.
+gc.disable()
+
+
+def when_ready(server):
+    # Runs in the master after the preload, before the first worker is forked
+    gc.freeze()
+    gc.enable()
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
@@ -1,23 +1,139 @@
 import os
 import sqlite3
+import time
 from functools import wraps
+from urllib.parse import quote
 import jwt
 from flask import redirect, request, session, jsonify, g, current_app
 
+from spaced_repetition import update_schedule
+from question_state import update_question_state
+from leaderboard import update_leaderboards
+from adaptive import update_ratings
+from answer_counts import update_answer_counts
+
 import os
 DATABASE = os.environ.get(
     "DATABASE_PATH",
     os.path.join(os.path.dirname(os.path.abspath(__file__)), "nuclear_quiz.db")
 )
 
+# The question bank (categories, questions, answers) lives in a file of its own; see content_db.py
+CONTENT_DATABASE = os.environ.get(
+    "CONTENT_DATABASE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(DATABASE)), "content.db")
+)
+CONTENT_MMAP_SIZE = int(os.environ.get("CONTENT_MMAP_SIZE", 256 * 1024 * 1024))
+
+
+def _uri(path, **params):
+    query = "&".join(f"{k}={v}" for k, v in params.items())
+    return "file:" + quote(os.path.abspath(path)) + ("?" + query if query else "")
+
+
+def attach_content(db, path=None):
+    """Attach the question bank as schema "content": read-only and immutable, so
+    SQLite takes no locks on it and never checks it for changes, with its pages
+    memory-mapped. No-op until the content file exists."""
+    path = path or CONTENT_DATABASE
+    if not os.path.exists(path):
+        return False
+    db.execute("ATTACH DATABASE ? AS content", (_uri(path, mode="ro", immutable=1),))
+    db.execute(f"PRAGMA content.mmap_size = {CONTENT_MMAP_SIZE}")
+    return True
+
+
 def get_db():
     """Open a database connection, reuse within a request context."""
-    db = sqlite3.connect(DATABASE)
+    db = sqlite3.connect(_uri(DATABASE), uri=True)
     db.row_factory = sqlite3.Row  # lets you access columns by name
     db.execute("PRAGMA foreign_keys = ON")
+    attach_content(db)
     return db
 
 
+# Tables holding per-user rows, cleared when an account is deleted
+USER_DATA_TABLES = ("results", "quiz_sessions", "quiz_sessions_archive", "user_category_progress",
+                    "user_question_schedule", "user_question_state", "leaderboard_entries",
+                    "user_ability")
+
+
+def delete_user_data(db, user_id):
+    """Delete a user and everything they own. Caller commits.
+    Monthly results partitions still held as tables are cleared too; compacted
+    archive files are read-only training records and are left as they are."""
+    tables = list(USER_DATA_TABLES)
+    if _table_exists(db, "results_partitions"):
+        tables += [r[0] for r in db.execute("SELECT name FROM results_partitions WHERE state = 'table'")]
+    for table in tables:
+        db.execute(f"DELETE FROM {table} WHERE user_id = ?", (user_id,))
+    db.execute("DELETE FROM users WHERE id = ?", (user_id,))
+
+
+def _table_exists(db, name):
+    return db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def add_column_if_missing(db, table, column, declaration):
+    """ALTER TABLE … ADD COLUMN unless the column is already there. Returns True if added."""
+    if any(row[1] == column for row in db.execute(f"PRAGMA table_info({table})")):
+        return False
+    db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    return True
+
+
+def record_result(db, user_id, question_id, answer_id, is_correct, quiz_id=None):
+    """Log one graded answer and update the user's per-category progress totals,
+    review schedule, per-question state, leaderboard rows, ability/difficulty
+    ratings and answer-distribution counters. Shared by the web and API quiz flows; caller commits."""
+    db.execute("""
+        INSERT INTO results (user_id, question_id, answer_id, is_correct, quiz_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, (user_id, question_id, answer_id, is_correct, quiz_id))
+    db.execute("""
+        INSERT INTO user_category_progress (user_id, category_id, total_answered, total_correct)
+        SELECT ?, category_id, 1, ? FROM questions WHERE id = ?
+        ON CONFLICT (user_id, category_id) DO UPDATE SET
+            total_answered = total_answered + 1,
+            total_correct = total_correct + excluded.total_correct
+    """, (user_id, is_correct, question_id))
+    update_schedule(db, user_id, question_id, is_correct)
+    update_question_state(db, user_id, question_id, answer_id, is_correct)
+    update_leaderboards(db, user_id, question_id, is_correct)
+    update_ratings(db, user_id, question_id, is_correct)
+    update_answer_counts(db, question_id, answer_id, is_correct)
+
+
+def run_batched(db, select_sql, params, work, batch_size=500, pause=0.05, dry_run=False):
+    """
+    Repeatedly select up to batch_size ids with select_sql and hand them to
+    work(db, ids) inside one BEGIN IMMEDIATE … COMMIT. Sleeps `pause` seconds
+    between batches so other writers can take the lock.
+    Returns (rows_processed, batches).
+    """
+    if dry_run:
+        count = db.execute(f"SELECT COUNT(*) FROM ({select_sql})", params).fetchone()[0]
+        return count, 0
+
+    done = batches = 0
+    while True:
+        db.execute("BEGIN IMMEDIATE")
+        ids = [row[0] for row in db.execute(f"{select_sql} LIMIT ?", (*params, batch_size))]
+        if not ids:
+            db.rollback()
+            break
+        work(db, ids)
+        db.commit()
+        done += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+        time.sleep(pause)
+    return done, batches
+
+
 def login_required(f):
     """Redirect to login if user is not logged in. Same pattern as CS50 Finance."""
     @wraps(f)
@@ -38,6 +154,17 @@ def admin_required(f):
     return decorated_function
 
 
+def api_admin_required(f):
+    """admin_required for JSON endpoints: the same admin web session, but a 401
+    JSON error instead of a redirect to the login page."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get("is_admin"):
+            return jsonify({"error": "Admin login required"}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
 def jwt_required(f):
     """Check Bearer token and set g.user_id. Returns 401 JSON on failure."""
     @wraps(f)
@@ -57,18 +184,88 @@ def jwt_required(f):
     return decorated_function
 
 
+QUIZ_SESSIONS_SQL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id TEXT PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        category_id INTEGER,  -- NULL for cross-category modes; categories are in content.db
+        question_ids TEXT NOT NULL,  -- packed uint32 ids (quizzes.pack_question_ids); JSON in older rows
+        current_index INTEGER NOT NULL DEFAULT 0,
+        score INTEGER NOT NULL DEFAULT 0,
+        completed INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        mode TEXT NOT NULL DEFAULT 'category',
+        total_questions INTEGER
+    )
+"""
+
+
 def ensure_quiz_sessions_table(db):
     """Create quiz_sessions table if it does not exist. Safe to call on every startup."""
+    db.execute(QUIZ_SESSIONS_SQL.format(name="quiz_sessions"))
+    _migrate_quiz_sessions(db)
+    if add_column_if_missing(db, "quiz_sessions", "total_questions", "INTEGER"):
+        db.execute("UPDATE quiz_sessions SET total_questions = json_array_length(question_ids)")
+    # Lookups by owner (resume, account deletion) and sweeps by age (maintenance.py)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_quiz_sessions_user ON quiz_sessions (user_id, completed)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_quiz_sessions_age ON quiz_sessions (completed, created_at)")
+    # results.quiz_id ties each answer to its session, so a quiz review is one indexed lookup
+    add_column_if_missing(db, "results", "quiz_id", "TEXT")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_results_quiz ON results (quiz_id)")
+    # Compact record of completed sessions moved out by maintenance.py archive-sessions
     db.execute("""
-        CREATE TABLE IF NOT EXISTS quiz_sessions (
+        CREATE TABLE IF NOT EXISTS quiz_sessions_archive (
             id TEXT PRIMARY KEY,
-            user_id INTEGER NOT NULL REFERENCES users(id),
-            category_id INTEGER NOT NULL REFERENCES categories(id),
-            question_ids TEXT NOT NULL,
-            current_index INTEGER NOT NULL DEFAULT 0,
-            score INTEGER NOT NULL DEFAULT 0,
-            completed INTEGER NOT NULL DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
+            user_id INTEGER NOT NULL,
+            category_id INTEGER,
+            total_questions INTEGER NOT NULL,
+            score INTEGER NOT NULL,
+            created_at TIMESTAMP,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_quiz_sessions_archive_user ON quiz_sessions_archive (user_id)")
+    add_column_if_missing(db, "quiz_sessions_archive", "mode", "TEXT NOT NULL DEFAULT 'category'")
+    db.commit()
+
+
+def _migrate_quiz_sessions(db):
+    """Bring quiz_sessions tables created by older releases up to QUIZ_SESSIONS_SQL:
+    category_id used to be NOT NULL and there was no mode column. SQLite cannot
+    drop a NOT NULL constraint in place, so the table is rebuilt once."""
+    columns = {row[1]: row[3] for row in db.execute("PRAGMA table_info(quiz_sessions)")}  # name → notnull
+    if "mode" in columns and not columns["category_id"]:
+        return
+    keep = ", ".join(name for name in columns if name != "mode")
+    db.commit()
+    db.execute("BEGIN IMMEDIATE")
+    db.execute("DROP TABLE IF EXISTS quiz_sessions_migrating")
+    db.execute(QUIZ_SESSIONS_SQL.format(name="quiz_sessions_migrating"))
+    db.execute(f"INSERT INTO quiz_sessions_migrating ({keep}) SELECT {keep} FROM quiz_sessions")
+    db.execute("DROP TABLE quiz_sessions")
+    db.execute("ALTER TABLE quiz_sessions_migrating RENAME TO quiz_sessions")
+    db.commit()
+
+
+def ensure_progress_table(db):
+    """Create user_category_progress (per-user, per-category answer totals read by
+    the progress pages) and backfill it from results the first time."""
+    if _table_exists(db, "user_category_progress"):
+        return
+    db.execute("""
+        CREATE TABLE user_category_progress (
+            user_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            total_answered INTEGER NOT NULL DEFAULT 0,
+            total_correct INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category_id)
+        ) WITHOUT ROWID
+    """)
+    db.execute("""
+        INSERT INTO user_category_progress (user_id, category_id, total_answered, total_correct)
+        SELECT r.user_id, q.category_id, COUNT(*), SUM(r.is_correct)
+        FROM results r
+        JOIN questions q ON q.id = r.question_id
+        GROUP BY r.user_id, q.category_id
     """)
     db.commit()
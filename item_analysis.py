@@ -0,0 +1,236 @@
+"""
+item_analysis.py
+Classical item analysis of the question bank from answer history.
+
+Loads every answer in results_all (hot table and partition tables) into NumPy
+arrays and computes, without any per-row Python loop:
+
+    p-value         share of answers that were correct (item easiness)
+    point-biserial  correlation between getting the item right and the user's
+                    accuracy on all of their *other* answers (discrimination);
+                    the item's own answer is left out so it doesn't inflate r
+    pick rate       share of answers choosing each option, and each option's
+                    own point-biserial — a distractor with positive r is
+                    attracting the stronger candidates and needs a look
+
+Results replace the contents of question_stats / answer_stats, which the admin
+questions page shows next to each question. Questions with fewer than
+--min-responses answers get counts but no flags.
+
+NumPy is only needed to run the analysis; the web app just reads the tables.
+
+Usage: python item_analysis.py [--since 2025-01-01] [--min-responses 30]
+"""
+
+import argparse
+import time
+
+from helpers import get_db
+from partitions import ensure_partition_catalog
+
+MIN_RESPONSES = 30
+EASY_P = 0.90        # flag: nearly everyone gets it right
+HARD_P = 0.30        # flag: about chance level for four options
+LOW_R = 0.15         # flag: barely separates strong from weak candidates
+DISTRACTOR_MIN_RATE = 0.05  # ignore distractors hardly anyone picks
+
+
+def ensure_question_stats_table(db):
+    """Create question_stats / answer_stats. Safe to call on every startup."""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS question_stats (
+            question_id INTEGER PRIMARY KEY,
+            responses INTEGER NOT NULL,
+            p_value REAL,
+            point_biserial REAL,
+            flags TEXT,  -- comma-separated: easy, hard, low_discrimination, misleading_distractor
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS answer_stats (
+            answer_id INTEGER PRIMARY KEY,
+            question_id INTEGER NOT NULL,
+            picks INTEGER NOT NULL,
+            pick_rate REAL,
+            point_biserial REAL
+        )
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_answer_stats_question ON answer_stats (question_id)")
+    db.commit()
+
+
+# ─────────────────────────────────────────────
+# ANALYSIS
+# ─────────────────────────────────────────────
+
+def load_responses(db, since=None):
+    """
+    (user_ids, answer_ids) of every answer in results_all as two int64 arrays.
+    Question and correctness come from the answers table afterwards, so each row
+    crosses from SQLite as one packed integer — the load, not the maths, is
+    what dominates the run time.
+    """
+    import numpy as np
+    sql = "SELECT (user_id << 32) | answer_id FROM results_all WHERE answer_id IS NOT NULL"
+    cursor = db.cursor()
+    cursor.row_factory = None
+    cursor.execute(sql + " AND answered_at >= ?" if since else sql, (since,) if since else ())
+    packed = np.fromiter((row[0] for row in cursor), dtype=np.int64)
+    return packed >> 32, packed & 0xFFFFFFFF
+
+
+def _correlation(np, n, sum_x, sum_y, sum_yy, sum_xy):
+    """Pearson r of a 0/1 x against y from per-group sums (sum_xx == sum_x);
+    NaN where either side has no variance."""
+    num = n * sum_xy - sum_x * sum_y
+    den = (n * sum_x - sum_x ** 2) * (n * sum_yy - sum_y ** 2)
+    r = np.full(num.shape, np.nan)
+    ok = den > 0
+    r[ok] = num[ok] / np.sqrt(den[ok])
+    return r
+
+
+def compute_item_stats(responses, answers, min_responses=MIN_RESPONSES):
+    """
+    Item statistics from load_responses() output, scored against the current
+    answer key. `answers` is every row of the answers table as
+    (id, question_id, is_correct) tuples; answers to options that no longer
+    exist are skipped. Returns (question_rows, answer_rows) for write_item_stats().
+    """
+    import numpy as np
+    users, picked = responses
+    if not len(users) or not answers:
+        return [], []
+    answer_ids, aq, answer_correct = (np.array(col, dtype=np.int64) for col in zip(*answers))
+    a_size = int(max(picked.max(), answer_ids.max())) + 1
+    question_of = np.zeros(a_size, dtype=np.int64)
+    question_of[answer_ids] = aq
+    correct_of = np.zeros(a_size)
+    correct_of[answer_ids] = answer_correct
+    known = question_of[picked] > 0
+    users, picked = users[known], picked[known]
+    questions, correct = question_of[picked], correct_of[picked]
+
+    # Rest score: each user's accuracy over their other answers
+    user_n = np.bincount(users)
+    user_correct = np.bincount(users, weights=correct)
+    others = user_n[users] - 1
+    keep = others > 0
+    rest = np.zeros(len(users))
+    rest[keep] = (user_correct[users[keep]] - correct[keep]) / others[keep]
+
+    q_size = int(max(questions.max(), aq.max())) + 1
+    n = np.bincount(questions, minlength=q_size)
+    p_value = np.bincount(questions, weights=correct, minlength=q_size) / np.maximum(n, 1)
+
+    # Correlation sums, over answers whose user has other answers to compare with
+    qk, ck, rk = questions[keep], correct[keep], rest[keep]
+    m = np.bincount(qk, minlength=q_size).astype(np.float64)
+    sum_r = np.bincount(qk, weights=rk, minlength=q_size)
+    sum_rr = np.bincount(qk, weights=rk * rk, minlength=q_size)
+    point_biserial = _correlation(np, m, np.bincount(qk, weights=ck, minlength=q_size),
+                                  sum_r, sum_rr, np.bincount(qk, weights=ck * rk, minlength=q_size))
+
+    # Per option: pick rate and the option's own point-biserial within its question
+    picks = np.bincount(picked, minlength=a_size)[answer_ids]
+    pick_rate = picks / np.maximum(n[aq], 1)
+    ak = picked[keep]
+    option_r = _correlation(np, m[aq], np.bincount(ak, minlength=a_size)[answer_ids].astype(np.float64),
+                            sum_r[aq], sum_rr[aq], np.bincount(ak, weights=rk, minlength=a_size)[answer_ids])
+
+    # A distractor misleads when a fair share pick it and those who do are the
+    # stronger candidates: r above the ~95% noise bound of 2/sqrt(n)
+    misleading = ((answer_correct == 0) & (pick_rate >= DISTRACTOR_MIN_RATE)
+                  & (option_r > 2 / np.sqrt(np.maximum(m[aq], 1))))
+    misleading_q = np.bincount(aq[misleading], minlength=q_size) > 0
+
+    question_rows = []
+    for qid in np.flatnonzero(n):
+        p, r = float(p_value[qid]), _float(point_biserial[qid])
+        flags = []
+        if n[qid] >= min_responses:
+            flags += ["easy"] if p >= EASY_P else ["hard"] if p <= HARD_P else []
+            flags += ["low_discrimination"] if r is not None and r < LOW_R else []
+            flags += ["misleading_distractor"] if misleading_q[qid] else []
+        question_rows.append((int(qid), int(n[qid]), round(p, 4), r, ",".join(flags) or None))
+    answer_rows = [(int(aid), int(qid), int(k), round(float(rate), 4) if nq else None, _float(r))
+                   for aid, qid, k, rate, nq, r in zip(answer_ids, aq, picks, pick_rate, n[aq], option_r)]
+    return question_rows, answer_rows
+
+
+def _float(value):
+    return None if value != value else round(float(value), 4)  # NaN → NULL
+
+
+def write_item_stats(db, question_rows, answer_rows):
+    """Replace question_stats / answer_stats in one transaction."""
+    db.execute("BEGIN IMMEDIATE")
+    db.execute("DELETE FROM question_stats")
+    db.execute("DELETE FROM answer_stats")
+    db.executemany("""
+        INSERT INTO question_stats (question_id, responses, p_value, point_biserial, flags)
+        VALUES (?, ?, ?, ?, ?)
+    """, question_rows)
+    db.executemany("""
+        INSERT INTO answer_stats (answer_id, question_id, picks, pick_rate, point_biserial)
+        VALUES (?, ?, ?, ?, ?)
+    """, answer_rows)
+    db.commit()
+
+
+def stats_for_questions(db, question_ids):
+    """{question_id: question_stats row as a dict, with "answers": its options'
+    stats in id order} for the given questions; ones never analysed are absent."""
+    if not question_ids:
+        return {}
+    marks = ",".join("?" * len(question_ids))
+    stats = {r["question_id"]: dict(r, answers=[]) for r in db.execute(
+        f"SELECT * FROM question_stats WHERE question_id IN ({marks})", question_ids)}
+    for r in db.execute(f"""
+            SELECT s.*, a.is_correct FROM answer_stats s JOIN answers a ON a.id = s.answer_id
+            WHERE s.question_id IN ({marks}) ORDER BY s.answer_id""", question_ids):
+        if r["question_id"] in stats:
+            stats[r["question_id"]]["answers"].append(dict(r))
+    return stats
+
+
+# ─────────────────────────────────────────────
+# CLI
+# ─────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute item statistics for every question")
+    parser.add_argument("--since", help="only answers on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--min-responses", type=int, default=MIN_RESPONSES,
+                        help="answers a question needs before it is flagged")
+    args = parser.parse_args()
+
+    db = get_db()
+    db.execute("PRAGMA busy_timeout = 5000")
+    ensure_partition_catalog(db)
+    ensure_question_stats_table(db)
+
+    started = time.monotonic()
+    responses = load_responses(db, args.since)
+    answers = db.execute("SELECT id, question_id, is_correct FROM answers").fetchall()
+    loaded = time.monotonic()
+    question_rows, answer_rows = compute_item_stats(responses, answers, args.min_responses)
+    computed = time.monotonic()
+    write_item_stats(db, question_rows, answer_rows)
+    db.close()
+
+    flagged = {}
+    for row in question_rows:
+        for flag in (row[4] or "").split(","):
+            if flag:
+                flagged[flag] = flagged.get(flag, 0) + 1
+    print(f"Analysed {len(responses[0])} answers to {len(question_rows)} questions "
+          f"(load {loaded - started:.2f}s, compute {computed - loaded:.2f}s, "
+          f"write {time.monotonic() - computed:.2f}s)")
+    for flag, count in sorted(flagged.items()):
+        print(f"  {flag}: {count}")
+
+
+if __name__ == "__main__":
+    main()
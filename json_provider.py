@@ -0,0 +1,68 @@
+"""
+json_provider.py
+Flask JSON provider used by app.py for every jsonify() call.
+
+Routes can hand sqlite3.Row objects (or lists of them) straight to jsonify
+instead of copying each row into a dict first. When orjson is installed it is
+used as the encoder; otherwise the standard library json module is used.
+Both paths emit the same bytes: sorted keys, compact separators, UTF-8 text.
+json_bytes_response() serves bytes already encoded that way (the
+pre-serialized quiz payloads in question_bank.py).
+"""
+
+import json
+import sqlite3
+
+from flask import current_app, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, stdlib json is the fallback
+    orjson = None
+
+
+def _row_default(o):
+    """Encode sqlite3.Row as a JSON object, defer everything else to Flask."""
+    if isinstance(o, sqlite3.Row):
+        return dict(zip(o.keys(), o))
+    return DefaultJSONProvider.default(o)
+
+
+class QuizJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider that understands sqlite3.Row and prefers orjson."""
+
+    default = staticmethod(_row_default)
+    ensure_ascii = False  # emit UTF-8 directly (°C, CO₂ …) so both encoders agree
+
+    if orjson is not None:
+        _ORJSON_OPTIONS = (
+            orjson.OPT_SORT_KEYS
+            | orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME   # keep Flask's HTTP-date format
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+            | orjson.OPT_APPEND_NEWLINE
+        )
+
+    def response(self, *args, **kwargs):
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        if orjson is None or pretty:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = orjson.dumps(obj, default=self.default, option=self._ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits — let the stdlib handle the odd case
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def json_bytes_response(body):
+    """Response for JSON that is already encoded like QuizJSONProvider output
+    (compact, sorted keys, trailing newline). When jsonify would pretty-print
+    (debug), the body is decoded and re-encoded so responses look the same."""
+    provider = current_app.json
+    if (provider.compact is None and current_app.debug) or provider.compact is False:
+        return jsonify(json.loads(body))
+    return current_app.response_class(body, mimetype=provider.mimetype)
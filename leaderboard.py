@@ -0,0 +1,220 @@
+"""
+leaderboard.py
+Global and per-category leaderboards, maintained as answers come in.
+
+leaderboard_entries keeps running (answered, correct) totals per board —
+category_id 0 is the global board — and period: 'all' for all-time, or an
+ISO week ('2025-W07') for the weekly board. record_result() upserts four rows
+per answer (global/category × all-time/this week) in the grading transaction,
+and indexes on (category_id, period, score) keep every board in rank order.
+
+Reads go through a per-process snapshot of each board's sorted score keys,
+refreshed every LEADERBOARD_CACHE_TTL seconds: a user's rank is a bisect of
+their current score into that list (O(log n)), and the first
+LEADERBOARD_CACHE_ROWS rows are kept ready to serve as top-N pages.
+
+Metrics:
+    accuracy – correct / answered, all-time, only users with at least
+               LEADERBOARD_MIN_ATTEMPTS answers; ties broken by correct count
+    correct  – total correct answers, all-time
+    weekly   – correct answers in the current ISO week (UTC)
+"""
+
+import os
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+LEADERBOARD_MIN_ATTEMPTS = int(os.environ.get("LEADERBOARD_MIN_ATTEMPTS", 20))
+LEADERBOARD_CACHE_TTL = float(os.environ.get("LEADERBOARD_CACHE_TTL", 30))
+LEADERBOARD_CACHE_ROWS = 1000
+METRICS = ("accuracy", "correct", "weekly")
+GLOBAL = 0  # category_id of the global board
+
+
+def current_week(now=None):
+    year, week, _ = (now or datetime.now(timezone.utc)).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def ensure_leaderboard_table(db):
+    """Create leaderboard_entries and fill it the first time. Safe to call on
+    every startup; needs user_category_progress (helpers.py)."""
+    exists = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leaderboard_entries'"
+    ).fetchone()
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS leaderboard_entries (
+            category_id INTEGER NOT NULL,  -- 0 = global
+            period TEXT NOT NULL,          -- 'all' or ISO week 'YYYY-Www'
+            user_id INTEGER NOT NULL,
+            answered INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            accuracy REAL GENERATED ALWAYS AS (CAST(correct AS REAL) / answered) VIRTUAL,
+            PRIMARY KEY (category_id, period, user_id)
+        ) WITHOUT ROWID
+    """)
+    db.execute("""CREATE INDEX IF NOT EXISTS idx_leaderboard_correct
+                  ON leaderboard_entries (category_id, period, correct DESC)""")
+    db.execute("""CREATE INDEX IF NOT EXISTS idx_leaderboard_accuracy
+                  ON leaderboard_entries (category_id, period, accuracy DESC, correct DESC)""")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_leaderboard_user ON leaderboard_entries (user_id)")
+    db.commit()
+    if not exists:
+        rebuild_leaderboards(db)
+
+
+def update_leaderboards(db, user_id, question_id, is_correct):
+    """Count one answer on the global and category boards, all-time and weekly. Caller commits."""
+    week = current_week()
+    db.execute("""
+        INSERT INTO leaderboard_entries (category_id, period, user_id, answered, correct)
+        SELECT board, period, ?, 1, ?
+        FROM (SELECT 0 AS board UNION ALL SELECT category_id FROM questions WHERE id = ?),
+             (SELECT 'all' AS period UNION ALL SELECT ?)
+        WHERE true
+        ON CONFLICT (category_id, period, user_id) DO UPDATE SET
+            answered = answered + 1,
+            correct = correct + excluded.correct
+    """, (user_id, is_correct, question_id, week))
+
+
+def rebuild_leaderboards(db):
+    """Recompute every board. All-time totals come from user_category_progress
+    (which already counts archived months); weekly totals from the hot results
+    table, which covers far more weeks than anyone looks at. Both are written
+    by INSERT … SELECT under the write lock, so answers graded meanwhile are
+    not lost."""
+    db.execute("BEGIN IMMEDIATE")
+    db.execute("DELETE FROM leaderboard_entries")
+    db.execute("""
+        INSERT INTO leaderboard_entries (category_id, period, user_id, answered, correct)
+        SELECT category_id, 'all', user_id, total_answered, total_correct
+        FROM user_category_progress WHERE total_answered > 0
+        UNION ALL
+        SELECT 0, 'all', user_id, SUM(total_answered), SUM(total_correct)
+        FROM user_category_progress WHERE total_answered > 0 GROUP BY user_id
+    """)
+    db.execute("""
+        INSERT INTO leaderboard_entries (category_id, period, user_id, answered, correct)
+        WITH answers AS (
+            SELECT r.user_id, q.category_id, r.is_correct,
+                   -- ISO week: the year and week number of the Thursday in the same Mon–Sun week
+                   strftime('%Y', r.answered_at, '-3 days', 'weekday 4') || '-W' ||
+                   printf('%02d', (strftime('%j', r.answered_at, '-3 days', 'weekday 4') - 1) / 7 + 1) AS week
+            FROM results r JOIN questions q ON q.id = r.question_id
+            WHERE r.answered_at IS NOT NULL
+        )
+        SELECT category_id, week, user_id, COUNT(*), SUM(is_correct) FROM answers GROUP BY category_id, week, user_id
+        UNION ALL
+        SELECT 0, week, user_id, COUNT(*), SUM(is_correct) FROM answers GROUP BY week, user_id
+    """)
+    rows = db.execute("SELECT COUNT(*) FROM leaderboard_entries").fetchone()[0]
+    db.commit()
+    leaderboard_cache.clear()
+    return rows
+
+
+def prune_weeks(db, keep_weeks=8):
+    """Delete weekly rows older than the last keep_weeks ISO weeks."""
+    cutoff = db.execute("SELECT date('now', ?)", (f"-{keep_weeks * 7} days",)).fetchone()[0]
+    cutoff_week = current_week(datetime.fromisoformat(cutoff))
+    cursor = db.execute("DELETE FROM leaderboard_entries WHERE period != 'all' AND period < ?", (cutoff_week,))
+    db.commit()
+    return cursor.rowcount
+
+
+def _board_query(metric):
+    """(period, SQL, key) for a metric; the SQL yields rows in rank order and
+    key(row) gives an ascending sort key so better scores sort first."""
+    if metric == "accuracy":
+        return "all", """
+            SELECT user_id, answered, correct FROM leaderboard_entries
+            WHERE category_id = ? AND period = ? AND answered >= ?
+            ORDER BY accuracy DESC, correct DESC, user_id
+        """, lambda answered, correct: (-correct / answered, -correct)
+    period = current_week() if metric == "weekly" else "all"
+    return period, """
+        SELECT user_id, answered, correct FROM leaderboard_entries
+        WHERE category_id = ? AND period = ? AND answered >= ?
+        ORDER BY correct DESC, user_id
+    """, lambda answered, correct: (-correct,)
+
+
+class LeaderboardCache:
+    """Per-process snapshots of each board: sorted keys for ranking and the
+    first LEADERBOARD_CACHE_ROWS rows for top-N pages."""
+
+    def __init__(self, ttl=LEADERBOARD_CACHE_TTL):
+        self.ttl = ttl
+        self._boards = {}
+
+    def clear(self):
+        self._boards.clear()
+
+    def board(self, db, metric, category_id):
+        period, sql, key = _board_query(metric)
+        cache_key = (metric, category_id, period)
+        cached = self._boards.get(cache_key)
+        if cached is None or time.monotonic() - cached["loaded_at"] > self.ttl:
+            min_attempts = LEADERBOARD_MIN_ATTEMPTS if metric == "accuracy" else 1
+            keys, top = [], []
+            for user_id, answered, correct in db.execute(sql, (category_id, period, min_attempts)):
+                keys.append(key(answered, correct))
+                if len(top) < LEADERBOARD_CACHE_ROWS:
+                    top.append((user_id, answered, correct))
+            names = _usernames(db, [row[0] for row in top])
+            cached = {
+                "loaded_at": time.monotonic(), "period": period, "key": key,
+                "min_attempts": min_attempts, "keys": keys,
+                "top": [_entry(keys, key, names.get(u), a, c) for u, a, c in top],
+            }
+            self._boards[cache_key] = cached
+        return cached
+
+
+def _usernames(db, user_ids):
+    names = {}
+    for start in range(0, len(user_ids), 500):
+        chunk = user_ids[start:start + 500]
+        names.update(db.execute(
+            f"SELECT id, username FROM users WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+    return names
+
+
+def _entry(keys, key, username, answered, correct):
+    return {
+        "rank": bisect_left(keys, key(answered, correct)) + 1,  # ties share a rank
+        "username": (username or "").split("@", 1)[0],  # many usernames are email addresses
+        "answered": answered,
+        "correct": correct,
+        "accuracy": round(correct * 100 / answered, 1) if answered else 0,
+    }
+
+
+def leaderboard(db, metric, category_id=GLOBAL, limit=20, offset=0, user_id=None):
+    """A page of one board plus, with user_id, that user's own standing."""
+    board = leaderboard_cache.board(db, metric, category_id)
+    page = {
+        "metric": metric,
+        "category_id": category_id or None,
+        "period": board["period"],
+        "min_attempts": board["min_attempts"],
+        "total_ranked": len(board["keys"]),
+        "entries": board["top"][offset:offset + limit],
+    }
+    if user_id is not None:
+        row = db.execute("""
+            SELECT answered, correct FROM leaderboard_entries
+            WHERE category_id = ? AND period = ? AND user_id = ?
+        """, (category_id, board["period"], user_id)).fetchone()
+        me = None
+        if row and row[0] >= board["min_attempts"]:
+            username = db.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
+            me = _entry(board["keys"], board["key"], username[0] if username else None, row[0], row[1])
+        page["me"] = me
+    return page
+
+
+# One per process; rebuild_leaderboards() clears it
+leaderboard_cache = LeaderboardCache()
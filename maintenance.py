@@ -0,0 +1,224 @@
+"""
+maintenance.py
+Housekeeping jobs for nuclear_quiz.db, meant to run from cron (or by hand).
+Every job works in short batched transactions so gunicorn workers are never
+locked out for long, and prints a summary of what it did.
+
+Usage:
+    python maintenance.py expire-sessions [--ttl-hours 24]
+    python maintenance.py archive-sessions [--days 30]
+    python maintenance.py sessions            # expire, then archive
+    python maintenance.py rollover-results [--hot-months 3]
+    python maintenance.py compact-results [--keep-months 24] [--archive-dir DIR]
+    python maintenance.py rebuild-progress
+    python maintenance.py backfill-schedule   # one-off: spaced-repetition state from past results
+    python maintenance.py backfill-question-state
+    python maintenance.py rebuild-stats       # recompute the admin dashboard counters
+    python maintenance.py rebuild-leaderboards
+    python maintenance.py backfill-ratings    # replay results into ability/difficulty ratings
+    python maintenance.py rebuild-answer-counts  # per-question attempts and per-answer picks
+    python maintenance.py prune-leaderboards [--keep-weeks 8]
+Common options: --batch-size 500 --pause 0.05 --dry-run
+"""
+
+import argparse
+import os
+import time
+
+import adaptive
+import answer_counts
+import content_db
+import leaderboard
+import partitions
+import question_state
+import spaced_repetition
+import stats
+from helpers import get_db, ensure_quiz_sessions_table, ensure_progress_table, run_batched
+from quizzes import question_count
+
+SESSION_TTL_HOURS = int(os.environ.get("QUIZ_SESSION_TTL_HOURS", 24))
+SESSION_ARCHIVE_DAYS = int(os.environ.get("QUIZ_SESSION_ARCHIVE_DAYS", 30))
+
+
+def _placeholders(values):
+    return ",".join("?" * len(values))
+
+
+# ─────────────────────────────────────────────
+# QUIZ SESSIONS
+# ─────────────────────────────────────────────
+
+def expire_sessions(db, ttl_hours=SESSION_TTL_HOURS, **batch_opts):
+    """Delete incomplete quiz sessions started more than ttl_hours ago."""
+    def work(db, ids):
+        db.execute(f"DELETE FROM quiz_sessions WHERE id IN ({_placeholders(ids)})", ids)
+
+    return run_batched(db, """
+        SELECT id FROM quiz_sessions
+        WHERE completed = 0 AND created_at < datetime('now', ?)
+    """, (f"-{ttl_hours} hours",), work, **batch_opts)
+
+
+def archive_sessions(db, days=SESSION_ARCHIVE_DAYS, **batch_opts):
+    """Move completed quiz sessions older than `days` into quiz_sessions_archive."""
+    def work(db, ids):
+        marks = _placeholders(ids)
+        rows = db.execute(f"""
+            SELECT id, user_id, category_id, question_ids, total_questions, score, created_at, mode
+            FROM quiz_sessions WHERE id IN ({marks})
+        """, ids).fetchall()
+        db.executemany("""
+            INSERT OR REPLACE INTO quiz_sessions_archive
+                (id, user_id, category_id, total_questions, score, created_at, mode)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(r["id"], r["user_id"], r["category_id"], question_count(r),
+               r["score"], r["created_at"], r["mode"]) for r in rows])
+        db.execute(f"DELETE FROM quiz_sessions WHERE id IN ({marks})", ids)
+
+    return run_batched(db, """
+        SELECT id FROM quiz_sessions
+        WHERE completed = 1 AND created_at < datetime('now', ?)
+    """, (f"-{days} days",), work, **batch_opts)
+
+
+def sessions_summary(db):
+    row = db.execute("""
+        SELECT COUNT(*) AS total, COALESCE(SUM(completed = 0), 0) AS open
+        FROM quiz_sessions
+    """).fetchone()
+    archived = db.execute("SELECT COUNT(*) FROM quiz_sessions_archive").fetchone()[0]
+    return f"quiz_sessions: {row['total']} ({row['open']} in progress), archived: {archived}"
+
+
+# ─────────────────────────────────────────────
+# CLI
+# ─────────────────────────────────────────────
+
+def _report(label, result, started, dry_run):
+    count, batches = result
+    if dry_run:
+        print(f"{label}: {count} rows would be affected (dry run)")
+    else:
+        print(f"{label}: {count} rows in {batches} batches ({time.monotonic() - started:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nuclear Quiz database maintenance")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between batches")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would change")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("expire-sessions", help="delete abandoned (incomplete) quiz sessions")
+    p.add_argument("--ttl-hours", type=int, default=SESSION_TTL_HOURS)
+    p = sub.add_parser("archive-sessions", help="move old completed quiz sessions to the archive")
+    p.add_argument("--days", type=int, default=SESSION_ARCHIVE_DAYS)
+    p = sub.add_parser("sessions", help="expire-sessions followed by archive-sessions")
+    p.add_argument("--ttl-hours", type=int, default=SESSION_TTL_HOURS)
+    p.add_argument("--days", type=int, default=SESSION_ARCHIVE_DAYS)
+
+    p = sub.add_parser("rollover-results", help="move results older than the hot window to monthly tables")
+    p.add_argument("--hot-months", type=int, default=partitions.RESULTS_HOT_MONTHS)
+    p = sub.add_parser("compact-results", help="archive old monthly tables to read-only .csv.gz files")
+    p.add_argument("--keep-months", type=int, default=partitions.RESULTS_ARCHIVE_MONTHS)
+    p.add_argument("--archive-dir", default=partitions.RESULTS_ARCHIVE_DIR)
+    sub.add_parser("rebuild-progress", help="recompute progress totals from results and archives")
+    sub.add_parser("backfill-schedule", help="rebuild spaced-repetition schedules by replaying results "
+                   "(holds the write lock throughout: answers wait, so run it off-peak)")
+    sub.add_parser("backfill-question-state", help="rebuild per-question last answer/streak state from results "
+                   "(holds the write lock throughout: answers wait, so run it off-peak)")
+    sub.add_parser("rebuild-stats", help="recompute dashboard counters and hourly activity from the tables")
+    sub.add_parser("rebuild-leaderboards", help="recompute leaderboards from progress totals and results")
+    sub.add_parser("backfill-ratings", help="rebuild ability/difficulty ratings by replaying results "
+                   "(holds the write lock throughout: answers wait, so run it off-peak)")
+    sub.add_parser("rebuild-answer-counts", help="recompute per-question attempts and per-answer picks from results")
+    p = sub.add_parser("prune-leaderboards", help="drop weekly leaderboard rows for past weeks")
+    p.add_argument("--keep-weeks", type=int, default=8)
+
+    args = parser.parse_args()
+    batch_opts = {"batch_size": args.batch_size, "pause": args.pause, "dry_run": args.dry_run}
+
+    db = get_db()
+    db.execute("PRAGMA busy_timeout = 5000")
+    content_db.ensure_content_database(db)
+    ensure_quiz_sessions_table(db)
+    ensure_progress_table(db)
+    partitions.ensure_partition_catalog(db)
+    spaced_repetition.ensure_schedule_table(db)
+    question_state.ensure_question_state_table(db)
+    stats.ensure_stats_tables(db)
+    leaderboard.ensure_leaderboard_table(db)
+    adaptive.ensure_ratings_tables(db)
+    answer_counts.ensure_answer_counts_tables(db)
+
+    if args.command in ("expire-sessions", "archive-sessions", "sessions"):
+        print(f"Before: {sessions_summary(db)}")
+        if args.command in ("expire-sessions", "sessions"):
+            started = time.monotonic()
+            _report(f"Expired sessions older than {args.ttl_hours}h",
+                    expire_sessions(db, args.ttl_hours, **batch_opts), started, args.dry_run)
+        if args.command in ("archive-sessions", "sessions"):
+            started = time.monotonic()
+            _report(f"Archived completed sessions older than {args.days}d",
+                    archive_sessions(db, args.days, **batch_opts), started, args.dry_run)
+        print(f"After:  {sessions_summary(db)}")
+
+    elif args.command == "rollover-results":
+        print(f"Before: {partitions.partitions_summary(db)}")
+        started = time.monotonic()
+        _report(f"Moved results before {partitions.month_cutoff(args.hot_months)} to monthly tables",
+                partitions.rollover(db, args.hot_months, **batch_opts), started, args.dry_run)
+        print(f"After:  {partitions.partitions_summary(db)}")
+
+    elif args.command == "compact-results":
+        print(f"Before: {partitions.partitions_summary(db)}")
+        compacted = partitions.compact(db, args.keep_months, args.archive_dir, dry_run=args.dry_run)
+        for name, rows, path in compacted:
+            print(f"  {name}: {rows} rows" + (f" → {path} ({os.path.getsize(path)} B)" if path else " (dry run)"))
+        print(f"After:  {partitions.partitions_summary(db)}")
+
+    elif args.command == "rebuild-progress":
+        started = time.monotonic()
+        rows = partitions.rebuild_progress(db)
+        print(f"Rebuilt user_category_progress: {rows} rows ({time.monotonic() - started:.2f}s)")
+
+    elif args.command == "backfill-schedule":
+        started = time.monotonic()
+        rows = spaced_repetition.backfill_schedules(db)
+        print(f"Rebuilt user_question_schedule: {rows} rows ({time.monotonic() - started:.2f}s)")
+
+    elif args.command == "backfill-question-state":
+        started = time.monotonic()
+        rows = question_state.backfill_question_state(db)
+        print(f"Rebuilt user_question_state: {rows} rows ({time.monotonic() - started:.2f}s)")
+
+    elif args.command == "rebuild-stats":
+        started = time.monotonic()
+        values = stats.rebuild_stats(db)
+        print("Rebuilt stats_counters: " + ", ".join(f"{k}={v}" for k, v in values.items())
+              + f" ({time.monotonic() - started:.2f}s)")
+
+    elif args.command == "rebuild-leaderboards":
+        started = time.monotonic()
+        rows = leaderboard.rebuild_leaderboards(db)
+        print(f"Rebuilt leaderboard_entries: {rows} rows ({time.monotonic() - started:.2f}s)")
+
+    elif args.command == "backfill-ratings":
+        started = time.monotonic()
+        rows = adaptive.backfill_ratings(db)
+        print(f"Rebuilt user_ability and question_ratings: {rows} rows ({time.monotonic() - started:.2f}s)")
+
+    elif args.command == "rebuild-answer-counts":
+        started = time.monotonic()
+        rows = answer_counts.rebuild_answer_counts(db)
+        print(f"Rebuilt question_counters and answer_counters: {rows} rows ({time.monotonic() - started:.2f}s)")
+
+    elif args.command == "prune-leaderboards":
+        rows = leaderboard.prune_weeks(db, args.keep_weeks)
+        print(f"Deleted {rows} weekly leaderboard rows older than {args.keep_weeks} weeks")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
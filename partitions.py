@@ -0,0 +1,269 @@
+"""
+partitions.py
+Monthly partitioning of the results table.
+
+`results` stays the hot table that the app writes to and reads quiz reviews
+from. Rollover moves whole months older than RESULTS_HOT_MONTHS into
+per-month tables (results_2025_01, …), registered in results_partitions and
+stitched back together by the results_all view for full-history reads.
+Compaction turns old partition tables into read-only gzip'd CSV files in
+RESULTS_ARCHIVE_DIR and drops the table. Progress pages read the
+user_category_progress aggregate, which rebuild_progress() can regenerate
+from results, the partition tables and the archive files. Other rebuilds
+that need the whole history in order read it through replay_results().
+
+Driven by maintenance.py (rollover-results, compact-results, rebuild-progress).
+"""
+
+import csv
+import gzip
+import os
+import re
+from collections import defaultdict
+from datetime import date
+
+from helpers import DATABASE, add_column_if_missing, run_batched
+
+RESULTS_HOT_MONTHS = int(os.environ.get("RESULTS_HOT_MONTHS", 3))
+RESULTS_ARCHIVE_MONTHS = int(os.environ.get("RESULTS_ARCHIVE_MONTHS", 24))
+RESULTS_ARCHIVE_DIR = os.environ.get(
+    "RESULTS_ARCHIVE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(DATABASE)), "results_archive")
+)
+
+RESULT_COLUMNS = ("id", "user_id", "question_id", "answer_id", "is_correct", "answered_at", "quiz_id")
+_COLS = ", ".join(RESULT_COLUMNS)
+_MARKS = ", ".join("?" * len(RESULT_COLUMNS))
+_MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
+
+
+def ensure_partition_catalog(db):
+    """Create the partition catalog and the results_all view, and add columns the
+    hot table gained later (quiz_id) to partition tables made before them. Safe on
+    every startup."""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS results_partitions (
+            name TEXT PRIMARY KEY,         -- results_YYYY_MM
+            month TEXT NOT NULL UNIQUE,    -- YYYY-MM
+            state TEXT NOT NULL DEFAULT 'table',  -- 'table' or 'archived'
+            row_count INTEGER NOT NULL DEFAULT 0,
+            archive_path TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    add_column_if_missing(db, "results", "quiz_id", "TEXT")
+    view_columns = [r[1] for r in db.execute("PRAGMA table_info(results_all)")]
+    if view_columns != list(RESULT_COLUMNS):
+        _rebuild_view(db)
+    db.commit()
+
+
+def _rebuild_view(db):
+    tables = [r[0] for r in db.execute(
+        "SELECT name FROM results_partitions WHERE state = 'table' ORDER BY month")]
+    for table in tables:
+        _upgrade_partition(db, table)
+    selects = [f"SELECT {_COLS} FROM {t}" for t in ["results"] + tables]
+    db.execute("DROP VIEW IF EXISTS results_all")
+    db.execute("CREATE VIEW results_all AS " + "\nUNION ALL ".join(selects))
+
+
+def partition_name(month):
+    return "results_" + month.replace("-", "_")
+
+
+def month_cutoff(months_to_keep, today=None):
+    """First day (YYYY-MM-01) of the oldest month that stays, keeping the current month plus months_to_keep - 1."""
+    today = today or date.today()
+    index = today.year * 12 + (today.month - 1) - (max(months_to_keep, 1) - 1)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}-01"
+
+
+def _ensure_partition(db, month):
+    name = partition_name(month)
+    db.execute(f"""
+        CREATE TABLE IF NOT EXISTS {name} (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            answer_id INTEGER NOT NULL,
+            is_correct INTEGER NOT NULL,
+            answered_at TIMESTAMP,
+            quiz_id TEXT
+        )
+    """)
+    db.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_user ON {name} (user_id, answered_at)")
+    _upgrade_partition(db, name)
+    db.execute("INSERT OR IGNORE INTO results_partitions (name, month) VALUES (?, ?)", (name, month))
+    return name
+
+
+def _upgrade_partition(db, name):
+    """Partitions rolled over before results.quiz_id existed get the column (NULL
+    for their rows) and the index quiz reviews use."""
+    add_column_if_missing(db, name, "quiz_id", "TEXT")
+    db.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_quiz ON {name} (quiz_id)")
+
+
+# ─────────────────────────────────────────────
+# ROLLOVER: results → results_YYYY_MM
+# ─────────────────────────────────────────────
+
+def rollover(db, hot_months=RESULTS_HOT_MONTHS, **batch_opts):
+    """Move results older than the hot window into monthly partition tables."""
+    cutoff = month_cutoff(hot_months)
+
+    def work(db, ids):
+        marks = ",".join("?" * len(ids))
+        by_month = defaultdict(list)
+        for row in db.execute(f"SELECT {_COLS} FROM results WHERE id IN ({marks})", ids):
+            month = (row["answered_at"] or "")[:7]
+            by_month[month if _MONTH_RE.match(month) else "0000-00"].append(tuple(row))
+        for month, rows in by_month.items():
+            name = _ensure_partition(db, month)
+            db.executemany(f"INSERT OR REPLACE INTO {name} ({_COLS}) VALUES ({_MARKS})", rows)
+            db.execute("""
+                UPDATE results_partitions
+                SET row_count = row_count + ?, updated_at = CURRENT_TIMESTAMP
+                WHERE name = ?
+            """, (len(rows), name))
+        db.execute(f"DELETE FROM results WHERE id IN ({marks})", ids)
+
+    moved = run_batched(db, "SELECT id FROM results WHERE answered_at < ? ORDER BY id",
+                        (cutoff,), work, **batch_opts)
+    if not batch_opts.get("dry_run"):
+        _rebuild_view(db)
+        db.commit()
+    return moved
+
+
+# ─────────────────────────────────────────────
+# COMPACTION: results_YYYY_MM → results_archive/results_YYYY_MM.csv.gz
+# ─────────────────────────────────────────────
+
+def compact(db, keep_months=RESULTS_ARCHIVE_MONTHS, archive_dir=RESULTS_ARCHIVE_DIR, dry_run=False):
+    """Write partitions older than keep_months to read-only gzip'd CSV files and drop
+    their tables. Returns [(name, rows, path)]."""
+    cutoff = month_cutoff(keep_months)[:7]
+    partitions = db.execute("""
+        SELECT name, month FROM results_partitions
+        WHERE state = 'table' AND month < ? ORDER BY month
+    """, (cutoff,)).fetchall()
+    if dry_run:
+        return [(p["name"], db.execute(f"SELECT COUNT(*) FROM {p['name']}").fetchone()[0], None)
+                for p in partitions]
+
+    os.makedirs(archive_dir, exist_ok=True)
+    compacted = []
+    for p in partitions:
+        name = p["name"]
+        path = os.path.join(archive_dir, f"{name}.csv.gz")
+        tmp_path = path + ".tmp"
+        rows = 0
+        with gzip.open(tmp_path, "wt", newline="", compresslevel=9) as f:
+            writer = csv.writer(f)
+            writer.writerow(RESULT_COLUMNS)
+            cursor = db.execute(f"SELECT {_COLS} FROM {name} ORDER BY id")
+            while True:
+                chunk = cursor.fetchmany(5000)
+                if not chunk:
+                    break
+                writer.writerows(chunk)
+                rows += len(chunk)
+        os.replace(tmp_path, path)
+        os.chmod(path, 0o444)
+
+        db.execute("BEGIN IMMEDIATE")
+        db.execute("""
+            UPDATE results_partitions
+            SET state = 'archived', row_count = ?, archive_path = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE name = ?
+        """, (rows, path, name))
+        db.execute(f"DROP TABLE {name}")
+        _rebuild_view(db)
+        db.commit()
+        compacted.append((name, rows, path))
+    return compacted
+
+
+def iter_archive(path):
+    """Yield archived result rows as dicts with int fields, streaming from the .csv.gz.
+    quiz_id is None for rows without one, including files written before the column."""
+    with gzip.open(path, "rt", newline="") as f:
+        for row in csv.DictReader(f):
+            for key in ("id", "user_id", "question_id", "answer_id", "is_correct"):
+                row[key] = int(row[key])
+            row["quiz_id"] = row.get("quiz_id") or None
+            yield row
+
+
+def replay_results(db, columns):
+    """
+    Every result ever recorded, oldest first, as tuples of `columns`: each
+    archive file in month order, then results_all by (answered_at, id). For
+    rebuilds that replay history rather than sum it. Archived months are always
+    older than the tables, and one month at a time is sorted in memory.
+    """
+    for archive in db.execute(
+            "SELECT archive_path FROM results_partitions WHERE state = 'archived' ORDER BY month").fetchall():
+        for row in sorted(iter_archive(archive["archive_path"]), key=lambda r: (r["answered_at"], r["id"])):
+            row["answered_at"] = row["answered_at"] or None
+            yield tuple(row[column] for column in columns)
+    yield from db.execute(f"SELECT {', '.join(columns)} FROM results_all ORDER BY answered_at, id")
+
+
+# ─────────────────────────────────────────────
+# PROGRESS AGGREGATES
+# ─────────────────────────────────────────────
+
+def rebuild_progress(db):
+    """Recompute user_category_progress from results_all plus every archive file.
+    The archives never change, so they are summed before the write lock is
+    taken. results_all is summed under it, in the same transaction as the
+    swap, so answers graded meanwhile (record_result bumps these totals) are
+    neither lost nor counted twice."""
+    archived = defaultdict(lambda: [0, 0])
+    archives = db.execute(
+        "SELECT archive_path FROM results_partitions WHERE state = 'archived' ORDER BY month").fetchall()
+    if archives:
+        category_of = dict(db.execute("SELECT id, category_id FROM questions").fetchall())
+        for archive in archives:
+            for row in iter_archive(archive["archive_path"]):
+                category_id = category_of.get(row["question_id"])
+                if category_id is None:
+                    continue
+                entry = archived[(row["user_id"], category_id)]
+                entry[0] += 1
+                entry[1] += row["is_correct"]
+
+    db.execute("BEGIN IMMEDIATE")
+    db.execute("DELETE FROM user_category_progress")
+    db.execute("""
+        INSERT INTO user_category_progress (user_id, category_id, total_answered, total_correct)
+        SELECT r.user_id, q.category_id, COUNT(*), SUM(r.is_correct)
+        FROM results_all r
+        JOIN questions q ON q.id = r.question_id
+        GROUP BY r.user_id, q.category_id
+    """)
+    # Archive files keep rows of deleted accounts; only users that still exist get them
+    users = {r[0] for r in db.execute("SELECT id FROM users")} if archived else set()
+    db.executemany("""
+        INSERT INTO user_category_progress (user_id, category_id, total_answered, total_correct)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (user_id, category_id) DO UPDATE SET
+            total_answered = total_answered + excluded.total_answered,
+            total_correct = total_correct + excluded.total_correct
+    """, [(user_id, category_id, answered, correct)
+          for (user_id, category_id), (answered, correct) in archived.items() if user_id in users])
+    rows = db.execute("SELECT COUNT(*) FROM user_category_progress").fetchone()[0]
+    db.commit()
+    return rows
+
+
+def partitions_summary(db):
+    hot = db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    row = db.execute("""
+        SELECT COALESCE(SUM(state = 'table'), 0) AS tables, COALESCE(SUM(state = 'archived'), 0) AS archived
+        FROM results_partitions
+    """).fetchone()
+    return f"results (hot): {hot} rows, partition tables: {row['tables']}, archived months: {row['archived']}"
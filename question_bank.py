@@ -0,0 +1,365 @@
+"""
+question_bank.py
+The question bank compiled into one read-only file that every worker
+memory-maps, so the text of questions and answers sits once in the page cache
+instead of once per process.
+
+The file (content.bank next to content.db) is generated from the questions and
+answers tables whenever content.db is swapped (content_db.py). It holds a
+header, a set of uint32 offset tables and the UTF-8 text:
+
+    header          magic, content_info version, counts
+    question_slot   question id → record number + 1 (0: no such question)
+    question_id, category_id, difficulty, flags      one entry per record
+    answer_start    record → first answer record (n + 1 entries)
+    question_text, explanation, source               record → text offset (n + 1)
+    answer_id, answer_correct                        one entry per answer record
+    answer_text     answer record → text offset (m + 1)
+    question_json, feedback_json, answer_json        pre-serialized API fragments
+    text            every string back to back; string i ends where i + 1 starts
+
+Looking up a question is an index into question_slot and a memoryview slice
+of the mapping per field, with no copies until the text is decoded. Tables
+are in native byte order; the file is always built on the machine that reads
+it. Readers notice a replaced file within QUESTION_BANK_TTL seconds, or at once
+after invalidate() (content_watch calls it when content.db is swapped; the bank
+is written before the swap), and fall back to SQL for ids the file does not have.
+
+The JSON fragments are the parts of the quiz API responses that only depend on
+the question (its text, each answer option, the correct answer and
+explanation), encoded the way json_provider.py would encode them. Responses
+are then assembled by joining bytes around the per-session fields, with no
+serialization of the long strings on the request path.
+
+Usage: python question_bank.py [--rebuild]   # show (or rebuild) the compiled bank
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import sqlite3
+import struct
+import tempfile
+import time
+from array import array
+from urllib.parse import quote
+
+from content_watch import content_watch
+from helpers import CONTENT_DATABASE
+
+QUESTION_BANK_PATH = os.environ.get("QUESTION_BANK_PATH", os.path.splitext(CONTENT_DATABASE)[0] + ".bank")
+QUESTION_BANK_TTL = float(os.environ.get("QUESTION_BANK_TTL", 5))
+
+MAGIC = b"NQBANK02"
+_HEADER = struct.Struct("=8sIIII")  # magic, content version, question_slot entries, questions, answers
+_EXPLANATION_NULL, _SOURCE_NULL = 1, 2
+_TEXT_FIELDS = ("question_text", "explanation", "source")
+
+
+def _layout(slots, questions, answers):
+    """Table name → (byte offset, entries), and the offset of the text."""
+    sizes = (("question_slot", slots), ("question_id", questions), ("category_id", questions),
+             ("difficulty", questions), ("flags", questions), ("answer_start", questions + 1),
+             ("question_text", questions + 1), ("explanation", questions + 1), ("source", questions + 1),
+             ("answer_id", answers), ("answer_correct", answers), ("answer_text", answers + 1),
+             ("question_json", questions + 1), ("feedback_json", questions + 1), ("answer_json", answers + 1))
+    layout, offset = {}, _HEADER.size
+    for name, entries in sizes:
+        layout[name] = (offset, entries)
+        offset += 4 * entries
+    return layout, offset
+
+
+def _json(value):
+    """Encoded like QuizJSONProvider output: compact, sorted keys, UTF-8 text."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+def _feedback_fragment(question, answers):
+    """The correct_answer_id … explanation members of the answer feedback, without
+    braces; empty when the question has no correct answer."""
+    correct = next((a for a in answers if a[3]), None)
+    if correct is None:
+        return ""
+    return _json({"correct_answer_id": correct[0], "correct_answer_text": correct[2],
+                  "explanation": question[4]})[1:-1]
+
+
+def _open_readonly(path):
+    return sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+
+
+def content_version(source=None):
+    conn = _open_readonly(source or CONTENT_DATABASE)
+    try:
+        row = conn.execute("SELECT value FROM content_info WHERE name = 'version'").fetchone()
+    except sqlite3.OperationalError:  # no content_info yet
+        row = None
+    finally:
+        conn.close()
+    return row[0] if row else 0
+
+
+def bank_version(path=None):
+    """The content version a bank file was compiled from, or None if there is no valid file."""
+    try:
+        with open(path or QUESTION_BANK_PATH, "rb") as f:
+            magic, version, *_ = _HEADER.unpack(f.read(_HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return version if magic == MAGIC else None
+
+
+def compile_question_bank(source=None, path=None):
+    """Write the bank for the content.db at `source` to `path`, replacing the
+    old file atomically. Returns (questions, answers)."""
+    source, path = source or CONTENT_DATABASE, path or QUESTION_BANK_PATH
+    version = content_version(source)
+    conn = _open_readonly(source)
+    try:
+        questions = conn.execute("""
+            SELECT id, category_id, difficulty, question_text, explanation, source
+            FROM questions ORDER BY id
+        """).fetchall()
+        answers = conn.execute(
+            "SELECT id, question_id, answer_text, is_correct FROM answers ORDER BY question_id, id").fetchall()
+    finally:
+        conn.close()
+
+    # answers are sorted by question id, like the records, so each question's answers are one run;
+    # answers of missing questions are dropped
+    runs, position = [], 0
+    for qid, *_ in questions:
+        while position < len(answers) and answers[position][1] < qid:
+            position += 1
+        first = position
+        while position < len(answers) and answers[position][1] == qid:
+            position += 1
+        runs.append(answers[first:position])
+    kept = [answer for run in runs for answer in run]
+
+    tables = {name: array("I") for name in _layout(0, 0, 0)[0]}
+    assert tables["question_id"].itemsize == 4
+    tables["question_slot"].extend([0] * ((questions[-1][0] if questions else 0) + 1))
+    chunks, size = [], 0
+
+    def add_texts(table, values):
+        """Append one text table; each table's strings are contiguous, so string i ends where i + 1 starts."""
+        nonlocal size
+        for value in values:
+            encoded = (value or "").encode("utf-8")
+            tables[table].append(size)
+            chunks.append(encoded)
+            size += len(encoded)
+        tables[table].append(size)
+
+    for record, (qid, category_id, difficulty, _, explanation, source_text) in enumerate(questions):
+        tables["question_slot"][qid] = record + 1
+        tables["question_id"].append(qid)
+        tables["category_id"].append(category_id or 0)
+        tables["difficulty"].append(difficulty or 0)
+        tables["flags"].append((_EXPLANATION_NULL if explanation is None else 0)
+                               | (_SOURCE_NULL if source_text is None else 0))
+        tables["answer_start"].append(len(tables["answer_id"]))
+        for aid, _, _, is_correct in runs[record]:
+            tables["answer_id"].append(aid)
+            tables["answer_correct"].append(1 if is_correct else 0)
+    tables["answer_start"].append(len(tables["answer_id"]))
+    for field, column in zip(_TEXT_FIELDS, (3, 4, 5)):
+        add_texts(field, (row[column] for row in questions))
+    add_texts("answer_text", (text for _, _, text, _ in kept))
+    add_texts("question_json", (_json(row[3]) for row in questions))
+    add_texts("answer_json", (_json({"answer_text": text, "id": aid}) for aid, _, text, _ in kept))
+    add_texts("feedback_json", (_feedback_fragment(row, run) for row, run in zip(questions, runs)))
+
+    fd, working = tempfile.mkstemp(prefix=".bank-", dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, version, len(tables["question_slot"]), len(questions),
+                                 len(tables["answer_id"])))
+            for name in _layout(0, 0, 0)[0]:
+                tables[name].tofile(f)
+            f.writelines(chunks)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(working, 0o644)
+        os.replace(working, path)
+    except BaseException:
+        if os.path.exists(working):
+            os.unlink(working)
+        raise
+    return len(questions), len(tables["answer_id"])
+
+
+def ensure_question_bank(source=None):
+    """Compile the bank if it is missing or older than content.db. Safe to call on every startup."""
+    source = source or CONTENT_DATABASE
+    if os.path.exists(source) and bank_version() != content_version(source):
+        compile_question_bank(source)
+
+
+class _Mapping:
+    """One mapped bank file: the tables as uint32 memoryviews over the mmap."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.mm)
+        magic, self.version, slots, questions, answers = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a question bank file")
+        layout, text_offset = _layout(slots, questions, answers)
+        for name, (offset, entries) in layout.items():
+            setattr(self, name, view[offset:offset + 4 * entries].cast("I"))
+        self.text = view[text_offset:]
+
+    def record(self, question_id):
+        if 0 < question_id < len(self.question_slot):
+            slot = self.question_slot[question_id]
+            return slot - 1 if slot else None
+        return None
+
+    def raw(self, table, i):
+        """The UTF-8 bytes of string i of a text table, as a slice of the mapping."""
+        offsets = getattr(self, table)
+        return self.text[offsets[i]:offsets[i + 1]]
+
+    def string(self, table, i):
+        return str(self.raw(table, i), "utf-8")
+
+
+class QuestionBank:
+    def __init__(self, path=None, ttl=QUESTION_BANK_TTL):
+        self.path = path or QUESTION_BANK_PATH
+        self.ttl = ttl
+        self._mapping = None
+        self._stamp = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        self._checked_at = 0.0
+
+    def mapping(self):
+        """The current file's mapping, remapped if the file was replaced; None without a file."""
+        now = time.monotonic()
+        if self._checked_at and now - self._checked_at < self.ttl:
+            return self._mapping
+        self._checked_at = now
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self._mapping = self._stamp = None
+            return None
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp != self._stamp:
+            # The old mapping stays valid for anyone still holding it and is unmapped once dropped
+            self._mapping, self._stamp = _Mapping(self.path), stamp
+        return self._mapping
+
+    def raw(self, question_id, field):
+        """question_text, explanation or source as a memoryview of the mapping, or None."""
+        m = self.mapping()
+        record = m.record(question_id) if m else None
+        return None if record is None else m.raw(field, record)
+
+    def question(self, db, question_id):
+        """The question as {id, category_id, difficulty, question_text, explanation, source},
+        from the file, or the questions row when the file does not have it."""
+        m = self.mapping()
+        record = m.record(question_id) if m else None
+        if record is None:
+            return db.execute("SELECT * FROM questions WHERE id = ?", (question_id,)).fetchone()
+        flags = m.flags[record]
+        return {
+            "id": question_id,
+            "category_id": m.category_id[record] or None,
+            "difficulty": m.difficulty[record] or None,
+            "question_text": m.string("question_text", record),
+            "explanation": None if flags & _EXPLANATION_NULL else m.string("explanation", record),
+            "source": None if flags & _SOURCE_NULL else m.string("source", record),
+        }
+
+    def answers(self, db, question_id, shuffle=False):
+        """The question's answers as [{id, question_id, answer_text, is_correct}], in id order
+        or shuffled."""
+        m = self.mapping()
+        record = m.record(question_id) if m else None
+        if record is None:
+            answers = db.execute("SELECT * FROM answers WHERE question_id = ? ORDER BY id", (question_id,)).fetchall()
+        else:
+            answers = [{"id": m.answer_id[i], "question_id": question_id, "answer_text": m.string("answer_text", i),
+                        "is_correct": m.answer_correct[i]}
+                       for i in range(m.answer_start[record], m.answer_start[record + 1])]
+        if shuffle:
+            random.shuffle(answers)
+        return answers
+
+    def answer(self, db, question_id, answer_id):
+        """One of the question's answers by id, or None (also for ids that are not integers)."""
+        try:
+            answer_id = int(answer_id)
+        except (TypeError, ValueError):
+            return None
+        return next((a for a in self.answers(db, question_id) if a["id"] == answer_id), None)
+
+    def correct_answer(self, db, question_id):
+        return next((a for a in self.answers(db, question_id) if a["is_correct"]), None)
+
+    # ─── Pre-serialized API payloads ───
+
+    def question_payload(self, question_id, quiz_id, number, total):
+        """The /api/quiz/<id> body for this question, answers shuffled, as bytes;
+        None when the file does not have the question (use jsonify then)."""
+        m = self.mapping()
+        record = m.record(question_id) if m else None
+        if record is None:
+            return None
+        answers = [m.raw("answer_json", i) for i in range(m.answer_start[record], m.answer_start[record + 1])]
+        random.shuffle(answers)
+        return b"".join((
+            b'{"answers":[', b",".join(answers),
+            b'],"question_id":%d,"question_number":%d,"question_text":' % (question_id, number),
+            m.raw("question_json", record),
+            b',"quiz_id":', _json(quiz_id).encode(), b',"total_questions":%d}\n' % total,
+        ))
+
+    def feedback_payload(self, question_id, fields):
+        """Answer feedback as bytes: the stored correct_answer_id, correct_answer_text
+        and explanation plus `fields`, whose keys must all sort after "explanation".
+        None when the file does not have the question."""
+        m = self.mapping()
+        record = m.record(question_id) if m else None
+        if record is None:
+            return None
+        fragment = m.raw("feedback_json", record)
+        if not fragment:
+            return None
+        return b"".join((b"{", fragment, b",", _json(fields)[1:].encode(), b"\n"))
+
+
+# One per process; the mapping itself is shared by every process that opens the file
+question_bank = QuestionBank()
+content_watch.subscribe(question_bank.invalidate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[1])
+    parser.add_argument("--rebuild", action="store_true", help="recompile from content.db even if up to date")
+    args = parser.parse_args()
+    if args.rebuild:
+        questions, answers = compile_question_bank()
+        print(f"Compiled {questions} questions and {answers} answers into {QUESTION_BANK_PATH}")
+    else:
+        ensure_question_bank()
+    m = QuestionBank(ttl=0).mapping()
+    if m is None:
+        print(f"No question bank at {QUESTION_BANK_PATH}")
+        return
+    print(f"{QUESTION_BANK_PATH}: version {m.version}, {len(m.question_id)} questions, "
+          f"{len(m.answer_id)} answers, {len(m.mm) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
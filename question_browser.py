@@ -0,0 +1,96 @@
+"""
+question_browser.py
+Paged listing of the question bank for the admin questions page.
+
+Pages are keyset-paginated on (created_at, id), newest first, with optional
+category, difficulty and source filters, each backed by an index that ends in
+(created_at, id) so a page is one index range scan whatever its position.
+questions.answer_count is kept by triggers on answers, so the listing never
+joins and groups the answers table.
+"""
+
+from helpers import add_column_if_missing
+
+QUESTION_PAGE_SIZE = 50
+
+ANSWER_COUNT_TRIGGERS = {
+    "answers_count_ai": """
+        CREATE TRIGGER answers_count_ai AFTER INSERT ON answers BEGIN
+            UPDATE questions SET answer_count = answer_count + 1 WHERE id = new.question_id;
+        END""",
+    "answers_count_ad": """
+        CREATE TRIGGER answers_count_ad AFTER DELETE ON answers BEGIN
+            UPDATE questions SET answer_count = answer_count - 1 WHERE id = old.question_id;
+        END""",
+    "answers_count_au": """
+        CREATE TRIGGER answers_count_au AFTER UPDATE OF question_id ON answers
+        WHEN old.question_id IS NOT new.question_id BEGIN
+            UPDATE questions SET answer_count = answer_count - 1 WHERE id = old.question_id;
+            UPDATE questions SET answer_count = answer_count + 1 WHERE id = new.question_id;
+        END""",
+}
+
+
+def ensure_question_browser(db):
+    """Add questions.answer_count (filled once from answers), its triggers and the
+    listing indexes. Safe to call on every startup."""
+    if add_column_if_missing(db, "questions", "answer_count", "INTEGER NOT NULL DEFAULT 0"):
+        db.execute("""
+            UPDATE questions SET answer_count =
+                (SELECT COUNT(*) FROM answers WHERE answers.question_id = questions.id)
+        """)
+    existing = {r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    for name, sql in ANSWER_COUNT_TRIGGERS.items():
+        if name not in existing:
+            db.execute(sql)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_questions_created ON questions (created_at, id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_questions_category_created ON questions (category_id, created_at, id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_questions_difficulty_created ON questions (difficulty, created_at, id)")
+    db.execute("CREATE INDEX IF NOT EXISTS idx_questions_source_created ON questions (source, created_at, id)")
+    db.commit()
+
+
+def parse_browse_cursor(cursor):
+    """'<created_at>|<id>' from a previous page → (created_at, id). Raises ValueError."""
+    created_at, sep, last_id = (cursor or "").rpartition("|")
+    if not sep:
+        raise ValueError("invalid cursor")
+    return created_at, int(last_id)
+
+
+def browse_questions(db, category_id=None, difficulty=None, source=None, after=None,
+                     limit=QUESTION_PAGE_SIZE):
+    """
+    One page of questions, newest first. `after` is the (created_at, id) of the
+    last row on the previous page. Returns (rows, next_cursor); next_cursor is
+    None on the last page.
+    """
+    where, params = [], []
+    if category_id is not None:
+        where.append("q.category_id = ?")
+        params.append(category_id)
+    if difficulty is not None:
+        where.append("q.difficulty = ?")
+        params.append(difficulty)
+    if source:
+        where.append("q.source = ?")
+        params.append(source)
+    if after is not None:
+        where.append("(q.created_at, q.id) < (?, ?)")
+        params += list(after)
+
+    rows = db.execute(f"""
+        SELECT q.id, q.category_id, q.question_text, q.difficulty, q.source, q.created_at,
+               q.answer_count, c.name AS category_name
+        FROM questions q
+        JOIN categories c ON c.id = q.category_id
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY q.created_at DESC, q.id DESC
+        LIMIT ?
+    """, (*params, limit + 1)).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['created_at']}|{rows[-1]['id']}"
+    return rows, next_cursor
@@ -0,0 +1,192 @@
+"""
+question_index.py
+In-memory index of question ids per (category_id, difficulty), used to compose
+quizzes without ORDER BY RANDOM() scans. Sampling k questions is O(k).
+
+The index loads lazily on first use and is rebuilt after invalidate(), which
+content_watch calls in every worker once content.db has been swapped, or once it
+is older than QUESTION_INDEX_TTL seconds.
+"""
+
+import os
+import random
+import time
+from collections import defaultdict
+
+from content_watch import content_watch
+
+QUESTION_INDEX_TTL = float(os.environ.get("QUESTION_INDEX_TTL", 300))
+
+DIFFICULTY_LEVELS = (1, 2, 3)
+DIFFICULTY_NAMES = {
+    "easy": 1, "basic": 1,
+    "medium": 2, "intermediate": 2,
+    "hard": 3, "advanced": 3,
+}
+
+
+def parse_difficulty(value):
+    """1/2/3 or a name (easy, medium, hard, …) → level, or None if unrecognised."""
+    if isinstance(value, str):
+        value = DIFFICULTY_NAMES.get(value.strip().lower(), value)
+    try:
+        level = int(value)
+    except (TypeError, ValueError):
+        return None
+    return level if level in DIFFICULTY_LEVELS else None
+
+
+def parse_difficulty_mix(mix):
+    """{"easy": 3, "medium": 5, "hard": 2} (or keyed 1/2/3) → {1: 3, 2: 5, 3: 2}.
+    Raises ValueError on unknown levels or negative counts."""
+    if not isinstance(mix, dict) or not mix:
+        raise ValueError("difficulty_mix must be an object such as {\"easy\": 3, \"medium\": 5, \"hard\": 2}")
+    counts = {}
+    for key, count in mix.items():
+        level = parse_difficulty(key)
+        if level is None:
+            raise ValueError(f"unknown difficulty: {key}")
+        if not isinstance(count, int) or count < 0:
+            raise ValueError(f"count for {key} must be a non-negative integer")
+        counts[level] = counts.get(level, 0) + count
+    return counts
+
+
+def mix_for_target(level, total):
+    """Centre a quiz on one level: ~60% at the target, the rest split over its neighbours."""
+    neighbours = [n for n in (level - 1, level + 1) if n in DIFFICULTY_LEVELS]
+    at_level = total - (total * 2 // 5)
+    counts = {level: at_level}
+    for i, n in enumerate(neighbours):
+        share = (total - at_level) // len(neighbours) + (1 if i < (total - at_level) % len(neighbours) else 0)
+        counts[n] = share
+    return counts
+
+
+class AliasSampler:
+    """Vose's alias method: O(n) setup, O(1) weighted draws of a key."""
+
+    def __init__(self, weights):
+        self.keys = list(weights)
+        n = len(self.keys)
+        total = float(sum(weights.values()))
+        scaled = [weights[k] * n / total for k in self.keys]
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def draw(self):
+        i = random.randrange(len(self.keys))
+        return self.keys[i] if random.random() < self.prob[i] else self.keys[self.alias[i]]
+
+
+class QuestionIndex:
+    def __init__(self, ttl=QUESTION_INDEX_TTL):
+        self.ttl = ttl
+        self._buckets = None
+        self._loaded_at = 0.0
+
+    def invalidate(self):
+        self._buckets = None
+
+    def buckets(self, db):
+        """{(category_id, difficulty): [question ids]} — loaded on demand."""
+        if self._buckets is None or time.monotonic() - self._loaded_at > self.ttl:
+            buckets = defaultdict(list)
+            for qid, category_id, difficulty in db.execute(
+                    "SELECT id, category_id, difficulty FROM questions ORDER BY id"):
+                buckets[(category_id, difficulty if difficulty in DIFFICULTY_LEVELS else 1)].append(qid)
+            self._buckets = dict(buckets)
+            self._loaded_at = time.monotonic()
+        return self._buckets
+
+    def category_size(self, db, category_id):
+        buckets = self.buckets(db)
+        return sum(len(buckets.get((category_id, level), ())) for level in DIFFICULTY_LEVELS)
+
+    def sample(self, db, category_id, total, counts=None):
+        """
+        Draw question ids for one category. With counts ({level: n}), take n from
+        each level and top up any shortfall from the nearest other levels; without,
+        sample uniformly across the whole category. Returns a shuffled list.
+        """
+        buckets = self.buckets(db)
+        pools = {level: buckets.get((category_id, level), []) for level in DIFFICULTY_LEVELS}
+
+        if not counts:
+            sizes = [len(pools[level]) for level in DIFFICULTY_LEVELS]
+            picks = random.sample(range(sum(sizes)), min(total, sum(sizes)))
+            chosen = []
+            for i in picks:
+                for level, size in zip(DIFFICULTY_LEVELS, sizes):
+                    if i < size:
+                        chosen.append(pools[level][i])
+                        break
+                    i -= size
+            return chosen
+
+        chosen = []
+        shortfall = 0
+        for level, n in counts.items():
+            take = min(n, len(pools[level]))
+            chosen += random.sample(pools[level], take)
+            shortfall += n - take
+
+        if shortfall:
+            taken = set(chosen)
+            centre = sum(level * n for level, n in counts.items()) / max(sum(counts.values()), 1)
+            for level in sorted(DIFFICULTY_LEVELS, key=lambda lvl: abs(lvl - centre)):
+                spare = [qid for qid in pools[level] if qid not in taken]
+                extra = random.sample(spare, min(shortfall, len(spare)))
+                chosen += extra
+                shortfall -= len(extra)
+                if not shortfall:
+                    break
+
+        random.shuffle(chosen)
+        return chosen
+
+    def sample_blueprint(self, db, weights, total):
+        """
+        Cross-category draw for exam mode: each slot picks a category with
+        probability proportional to its blueprint weight (alias method), then
+        each category contributes that many distinct questions. Slots that land
+        on an exhausted category are redrawn among the categories that still
+        have questions. Returns a shuffled list of up to `total` ids.
+        """
+        remaining = {cat: weight for cat, weight in weights.items()
+                     if weight > 0 and self.category_size(db, cat) > 0}
+        wanted = dict.fromkeys(remaining, 0)
+        slots = total
+        while slots and remaining:
+            sampler = AliasSampler(remaining)
+            for _ in range(slots):
+                wanted[sampler.draw()] += 1
+            slots = 0
+            for cat in list(remaining):
+                size = self.category_size(db, cat)
+                if wanted[cat] >= size:
+                    slots += wanted[cat] - size
+                    wanted[cat] = size
+                    del remaining[cat]
+
+        chosen = []
+        for cat, n in wanted.items():
+            if n:
+                chosen += self.sample(db, cat, n)
+        random.shuffle(chosen)
+        return chosen
+
+
+# One per process, dropped whenever the question bank changes
+question_index = QuestionIndex()
+content_watch.subscribe(question_index.invalidate)
@@ -0,0 +1,338 @@
+"""
+question_io.py
+Bulk export and import of the question bank as JSONL or CSV.
+
+Export streams one question at a time straight off a cursor, so memory stays
+flat however big the bank is. Import reads the input incrementally, validates
+each record and inserts valid ones in batched BEGIN IMMEDIATE transactions;
+invalid records are reported by row number and skipped. The FTS index and
+answer counts follow along through their triggers. A real import writes to a
+copy of content.db (content_db.edit_content), swapped in once the input is
+through.
+
+JSONL record:
+    {"category": "CANDU Reactor Systems", "question_text": "...", "explanation": "...",
+     "difficulty": 2, "source": "CNSC REGDOC-2.4.2",
+     "answers": [{"text": "...", "correct": true}, {"text": "...", "correct": false}, ...]}
+("category_id" may be given instead of "category"; export also writes "id".)
+
+CSV columns: id, category_id, category, difficulty, source, question_text,
+explanation, answer_1 … answer_N, correct_answer (1-based).
+
+Usage:
+    python question_io.py export [--format jsonl|csv] [--output FILE]
+    python question_io.py import FILE [--format jsonl|csv] [--batch-size 500] [--dry-run] [--create-categories]
+Also exposed to admins as /admin/questions/export and /admin/questions/import.
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import sys
+import time
+from contextlib import nullcontext
+
+from content_db import edit_content
+from helpers import get_db
+
+FORMATS = ("jsonl", "csv")
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000  # per import; the error count keeps going past this
+MIN_ANSWERS = 2
+
+
+def guess_format(filename, default="jsonl"):
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return default
+
+
+# ─────────────────────────────────────────────
+# EXPORT
+# ─────────────────────────────────────────────
+
+def iter_questions(db, chunk_size=1000):
+    """Yield every question as a dict with its answers, in id order, from one cursor."""
+    cursor = db.execute("""
+        SELECT q.id, q.category_id, c.name AS category, q.difficulty, q.source,
+               q.question_text, q.explanation,
+               a.answer_text, a.is_correct
+        FROM questions q
+        JOIN categories c ON c.id = q.category_id
+        LEFT JOIN answers a ON a.question_id = q.id
+        ORDER BY q.id, a.id
+    """)
+    rows = itertools.chain.from_iterable(iter(lambda: cursor.fetchmany(chunk_size), []))
+    for _, group in itertools.groupby(rows, key=lambda r: r[0]):
+        group = list(group)
+        first = group[0]
+        yield {
+            "id": first[0],
+            "category_id": first[1],
+            "category": first[2],
+            "difficulty": first[3],
+            "source": first[4],
+            "question_text": first[5],
+            "explanation": first[6],
+            "answers": [{"text": r[7], "correct": bool(r[8])} for r in group if r[7] is not None],
+        }
+
+
+def export_jsonl(db):
+    """Generator of JSONL lines (str), one question each."""
+    for question in iter_questions(db):
+        yield json.dumps(question, ensure_ascii=False) + "\n"
+
+
+def export_csv(db):
+    """Generator of CSV text chunks: the header, then one row per question."""
+    width = max(db.execute(
+        "SELECT MAX(n) FROM (SELECT COUNT(*) AS n FROM answers GROUP BY question_id)").fetchone()[0] or 0, 4)
+    header = ["id", "category_id", "category", "difficulty", "source", "question_text", "explanation"]
+    header += [f"answer_{i}" for i in range(1, width + 1)] + ["correct_answer"]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for question in iter_questions(db):
+        answers = [a["text"] for a in question["answers"]]
+        correct = next((i for i, a in enumerate(question["answers"], 1) if a["correct"]), "")
+        writer.writerow([question[k] for k in header[:7]]
+                        + answers + [""] * (width - len(answers)) + [correct])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_questions(db, fmt):
+    return export_csv(db) if fmt == "csv" else export_jsonl(db)
+
+
+# ─────────────────────────────────────────────
+# IMPORT
+# ─────────────────────────────────────────────
+
+def read_records(text_stream, fmt):
+    """Yield (row_number, record_or_error) from a text stream, one record at a time.
+    Unparseable input yields a str error in place of the record."""
+    if fmt == "csv":
+        reader = csv.DictReader(text_stream)
+        for row_number, row in enumerate(reader, start=2):  # row 1 is the header
+            yield row_number, _record_from_csv(row)
+        return
+    for row_number, line in enumerate(text_stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, f"invalid JSON: {e}"
+            continue
+        yield row_number, record if isinstance(record, dict) else "expected a JSON object"
+
+
+def _record_from_csv(row):
+    numbered = sorted(((int(k.split("_", 1)[1]), v) for k, v in row.items()
+                       if k and k.startswith("answer_") and k.split("_", 1)[1].isdigit()), key=lambda kv: kv[0])
+    answers = [v for _, v in numbered if v and v.strip()]
+    try:
+        correct = int(row.get("correct_answer") or 0)
+    except ValueError:
+        correct = 0
+    return {
+        "category_id": row.get("category_id") or None,
+        "category": row.get("category") or None,
+        "difficulty": row.get("difficulty") or None,
+        "source": row.get("source"),
+        "question_text": row.get("question_text"),
+        "explanation": row.get("explanation"),
+        "answers": [{"text": text, "correct": i == correct} for i, text in enumerate(answers, 1)],
+    }
+
+
+def _text_field(record, name):
+    """A text field stripped, "" when missing or null; ValueError for any other JSON type."""
+    value = record.get(name)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{name} must be a string")
+    return value.strip()
+
+
+def validate_record(record, categories):
+    """
+    Check one record and normalise it to the columns to insert. `categories`
+    maps both id and lower-cased name to a category id. Returns
+    (question_tuple, answers) or raises ValueError with a message for the report.
+    """
+    category_id = None
+    if record.get("category_id") not in (None, ""):
+        try:
+            category_id = categories.get(int(record["category_id"]))
+        except (TypeError, ValueError):
+            pass
+        if category_id is None:
+            raise ValueError(f"unknown category_id: {record['category_id']}")
+    elif record.get("category"):
+        category_id = categories.get(str(record["category"]).strip().lower())
+        if category_id is None:
+            raise ValueError(f"unknown category: {record['category']}")
+    else:
+        raise ValueError("category or category_id is required")
+
+    question_text = _text_field(record, "question_text")
+    if not question_text:
+        raise ValueError("question_text is required")
+
+    difficulty = record.get("difficulty") or 1
+    try:
+        difficulty = int(difficulty)
+    except (TypeError, ValueError):
+        difficulty = 0
+    if difficulty not in (1, 2, 3):
+        raise ValueError("difficulty must be 1, 2 or 3")
+
+    answers = record.get("answers")
+    if not isinstance(answers, list):
+        raise ValueError("answers must be a list")
+    cleaned = []
+    for answer in answers:
+        text = answer.get("text") if isinstance(answer, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError("every answer needs a non-empty text")
+        cleaned.append((text.strip(), 1 if answer.get("correct") else 0))
+    if len(cleaned) < MIN_ANSWERS:
+        raise ValueError(f"at least {MIN_ANSWERS} answers are required")
+    if sum(correct for _, correct in cleaned) != 1:
+        raise ValueError("exactly one answer must be marked correct")
+
+    question = (category_id, question_text, _text_field(record, "explanation") or None,
+                difficulty, _text_field(record, "source") or None)
+    return question, cleaned
+
+
+def _category_lookup(db):
+    lookup = {}
+    for category_id, name in db.execute("SELECT id, name FROM categories"):
+        lookup[category_id] = category_id
+        lookup[name.strip().lower()] = category_id
+    return lookup
+
+
+def import_questions(db, records, batch_size=IMPORT_BATCH_SIZE, dry_run=False, create_categories=False):
+    """
+    Validate and insert (row_number, record) pairs from read_records(), committing
+    every batch_size valid questions. A generator: yields the running summary
+    after each batch, the last one being final — processed, inserted, failed
+    and errors ([{"row": n, "error": msg}], capped at MAX_REPORTED_ERRORS).
+    """
+    categories = _category_lookup(db)
+    summary = {"processed": 0, "inserted": 0, "failed": 0, "errors": [], "dry_run": dry_run}
+    batch = []
+
+    def flush():
+        if batch and not dry_run:
+            db.execute("BEGIN IMMEDIATE")
+            for question, answers in batch:
+                question_id = db.execute("""
+                    INSERT INTO questions (category_id, question_text, explanation, difficulty, source)
+                    VALUES (?, ?, ?, ?, ?)
+                """, question).lastrowid
+                db.executemany("INSERT INTO answers (question_id, answer_text, is_correct) VALUES (?, ?, ?)",
+                               [(question_id, text, correct) for text, correct in answers])
+            db.commit()
+        summary["inserted"] += len(batch)
+        batch.clear()
+
+    for row_number, record in records:
+        summary["processed"] += 1
+        try:
+            if isinstance(record, str):
+                raise ValueError(record)
+            if create_categories and record.get("category") and not record.get("category_id"):
+                _ensure_category(db, categories, str(record["category"]).strip(), dry_run)
+            batch.append(validate_record(record, categories))
+        except ValueError as e:
+            summary["failed"] += 1
+            if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+                summary["errors"].append({"row": row_number, "error": str(e)})
+        if len(batch) >= batch_size:
+            flush()
+            yield summary
+    flush()
+    yield summary
+
+
+def _ensure_category(db, categories, name, dry_run):
+    if name.lower() in categories:
+        return
+    if dry_run:
+        category_id = -len(categories) - 1  # placeholder so later rows validate the same way
+    else:
+        category_id = db.execute("INSERT INTO categories (name, icon) VALUES (?, ?)", (name, "📚")).lastrowid
+        db.commit()
+    categories[category_id] = category_id
+    categories[name.lower()] = category_id
+
+
+# ─────────────────────────────────────────────
+# CLI
+# ─────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk question import/export")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="write the whole question bank")
+    p.add_argument("--format", choices=FORMATS, default="jsonl")
+    p.add_argument("--output", help="file to write (default: stdout)")
+
+    p = sub.add_parser("import", help="add questions from a JSONL or CSV file")
+    p.add_argument("file", help="input file, or - for stdin")
+    p.add_argument("--format", choices=FORMATS, help="default: from the file extension, else jsonl")
+    p.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    p.add_argument("--dry-run", action="store_true", help="validate only, insert nothing")
+    p.add_argument("--create-categories", action="store_true", help="create categories named in the input")
+
+    args = parser.parse_args()
+    db = get_db()
+    db.execute("PRAGMA busy_timeout = 5000")
+
+    if args.command == "export":
+        out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+        try:
+            for chunk in export_questions(db, args.format):
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
+
+    elif args.command == "import":
+        fmt = args.format or guess_format(args.file)
+        source = sys.stdin if args.file == "-" else open(args.file, encoding="utf-8-sig", newline="")
+        started = time.monotonic()
+        # Batches are committed to a copy of content.db that replaces the live one at the end
+        with source, (nullcontext(db) if args.dry_run else edit_content()) as target:
+            for summary in import_questions(target, read_records(source, fmt), args.batch_size,
+                                            args.dry_run, args.create_categories):
+                print(f"  {summary['processed']} rows read, {summary['inserted']} "
+                      f"{'valid' if args.dry_run else 'inserted'}, {summary['failed']} failed", file=sys.stderr)
+        for error in summary["errors"]:
+            print(f"row {error['row']}: {error['error']}", file=sys.stderr)
+        print(f"{'Validated' if args.dry_run else 'Imported'} {summary['inserted']} of "
+              f"{summary['processed']} questions, {summary['failed']} failed "
+              f"({time.monotonic() - started:.2f}s)")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
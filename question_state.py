@@ -0,0 +1,124 @@
+"""
+question_state.py
+Latest outcome per (user, question), behind the "mistakes" quiz mode and the
+weak-question list.
+
+user_question_state holds one row per question a user has answered: the last
+answer given, whether it was right, how many attempts and correct answers so
+far and the current run of correct answers. record_result() upserts it in the
+same transaction as the answer, so "questions I last got wrong" is a range
+scan on (user_id, last_correct, last_answered_at) instead of a group-by over
+the user's whole results history.
+"""
+
+STATE_COLUMNS = ("user_id", "question_id", "last_answer_id", "last_correct",
+                 "attempts", "correct_count", "streak", "last_answered_at")
+
+
+def ensure_question_state_table(db):
+    """Create user_question_state and backfill it from results the first time.
+    Safe to call on every startup; needs the partition catalog (partitions.py)."""
+    exists = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_question_state'"
+    ).fetchone()
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS user_question_state (
+            user_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            last_answer_id INTEGER,
+            last_correct INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            correct_count INTEGER NOT NULL DEFAULT 0,
+            streak INTEGER NOT NULL DEFAULT 0,   -- consecutive correct answers, 0 after a miss
+            last_answered_at TIMESTAMP,
+            PRIMARY KEY (user_id, question_id)
+        ) WITHOUT ROWID
+    """)
+    db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_question_state_last
+        ON user_question_state (user_id, last_correct, last_answered_at)
+    """)
+    db.commit()
+    if not exists:
+        backfill_question_state(db)
+
+
+def update_question_state(db, user_id, question_id, answer_id, is_correct):
+    """Apply one answer to the user's state for this question. Caller commits."""
+    db.execute("""
+        INSERT INTO user_question_state
+            (user_id, question_id, last_answer_id, last_correct, attempts, correct_count, streak, last_answered_at)
+        VALUES (?, ?, ?, ?, 1, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id, question_id) DO UPDATE SET
+            last_answer_id = excluded.last_answer_id,
+            last_correct = excluded.last_correct,
+            attempts = attempts + 1,
+            correct_count = correct_count + excluded.correct_count,
+            streak = CASE WHEN excluded.last_correct THEN streak + 1 ELSE 0 END,
+            last_answered_at = excluded.last_answered_at
+    """, (user_id, question_id, answer_id, is_correct, is_correct, is_correct))
+
+
+def mistake_question_ids(db, user_id, limit=10, category_id=None):
+    """Questions whose latest answer was wrong, most recent miss first."""
+    if category_id is None:
+        rows = db.execute("""
+            SELECT question_id FROM user_question_state
+            WHERE user_id = ? AND last_correct = 0
+            ORDER BY last_answered_at DESC
+            LIMIT ?
+        """, (user_id, limit))
+    else:
+        rows = db.execute("""
+            SELECT s.question_id FROM user_question_state s
+            JOIN questions q ON q.id = s.question_id
+            WHERE s.user_id = ? AND s.last_correct = 0 AND q.category_id = ?
+            ORDER BY s.last_answered_at DESC
+            LIMIT ?
+        """, (user_id, category_id, limit))
+    return [r[0] for r in rows]
+
+
+def mistake_count(db, user_id):
+    return db.execute(
+        "SELECT COUNT(*) FROM user_question_state WHERE user_id = ? AND last_correct = 0", (user_id,)
+    ).fetchone()[0]
+
+
+def weak_questions(db, user_id, limit=20):
+    """Questions the user currently gets wrong, the most often missed first."""
+    return db.execute("""
+        SELECT s.question_id, q.question_text, c.name AS category_name,
+               s.attempts, s.correct_count, s.attempts - s.correct_count AS misses,
+               s.last_answered_at
+        FROM user_question_state s
+        JOIN questions q ON q.id = s.question_id
+        JOIN categories c ON c.id = q.category_id
+        WHERE s.user_id = ? AND s.last_correct = 0
+        ORDER BY misses DESC, s.last_answered_at DESC
+        LIMIT ?
+    """, (user_id, limit)).fetchall()
+
+
+def backfill_question_state(db):
+    """Rebuild user_question_state by replaying every result in order, archived
+    months included. The replay and the swap share one IMMEDIATE transaction,
+    so live update_question_state writes wait rather than being overwritten."""
+    from partitions import replay_results  # partitions imports helpers, which imports this module
+
+    db.execute("BEGIN IMMEDIATE")
+    state = {}
+    for user_id, question_id, answer_id, is_correct, answered_at in replay_results(
+            db, ("user_id", "question_id", "answer_id", "is_correct", "answered_at")):
+        _, _, attempts, correct_count, streak, _ = state.get((user_id, question_id), (None, 0, 0, 0, 0, None))
+        state[(user_id, question_id)] = (
+            answer_id, is_correct, attempts + 1, correct_count + is_correct,
+            streak + 1 if is_correct else 0, answered_at)
+
+    db.execute("DELETE FROM user_question_state")
+    db.executemany(f"""
+        INSERT INTO user_question_state ({", ".join(STATE_COLUMNS)})
+        VALUES ({", ".join("?" * len(STATE_COLUMNS))})
+    """, [(u, q, *values) for (u, q), values in state.items()])
+    db.commit()
+    return len(state)
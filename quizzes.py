@@ -0,0 +1,239 @@
+"""
+quizzes.py
+Quiz session state shared by the web UI (app.py) and the API (api.py).
+
+Every quiz in progress is a row in quiz_sessions. The web UI keeps only the
+quiz id in the Flask session, so a quiz started on one device (or worker, or
+in the mobile app) can be resumed anywhere the same user signs in.
+
+question_ids is stored packed (little-endian uint32 per id) with the length
+in total_questions, so serving step i of a 200-question exam reads 4 bytes
+instead of decoding the whole list. Sessions from older releases hold a
+JSON array and are still understood.
+
+Adaptive quizzes (adaptive.py) start with one question and append the next
+to question_ids as each answer is graded; total_questions is the planned
+length from the start.
+"""
+
+import json
+import struct
+import uuid
+
+from helpers import record_result
+from question_index import question_index, mix_for_target
+from adaptive import pick_adaptive_question
+
+QUIZ_LENGTH = 10
+MAX_MIX_LENGTH = 50  # upper bound on a custom difficulty_mix
+EXAM_LENGTH = 100
+MAX_EXAM_LENGTH = 200
+
+# quiz_sessions.mode values; labels stand in for the category name when a quiz spans categories
+QUIZ_MODES = ("category", "review", "mistakes", "exam", "adaptive")
+MODE_LABELS = {"review": "Spaced Review", "mistakes": "My Mistakes", "exam": "Mock Exam"}
+
+_QUESTION_ID = struct.Struct("<I")
+
+
+def pack_question_ids(question_ids):
+    return struct.pack(f"<{len(question_ids)}I", *question_ids)
+
+
+def parse_question_ids(quiz):
+    """Every question id of the session, in quiz order."""
+    stored = quiz["question_ids"]
+    if isinstance(stored, bytes):
+        return list(struct.unpack(f"<{len(stored) // 4}I", stored))
+    return json.loads(stored)
+
+
+def question_count(quiz):
+    if quiz["total_questions"] is not None:
+        return quiz["total_questions"]
+    return len(parse_question_ids(quiz))
+
+
+def question_id_at(quiz, idx):
+    """Id of question idx (0-based) without decoding the rest of the list."""
+    stored = quiz["question_ids"]
+    if isinstance(stored, bytes):
+        return _QUESTION_ID.unpack_from(stored, idx * _QUESTION_ID.size)[0]
+    return json.loads(stored)[idx]
+
+
+def create_quiz_session(db, user_id, category_id, question_ids, mode="category", total=None):
+    """Insert a new quiz session and return its id. `total` defaults to
+    len(question_ids); adaptive quizzes pass their planned length. Caller commits."""
+    quiz_id = str(uuid.uuid4())
+    db.execute("""
+        INSERT INTO quiz_sessions (id, user_id, category_id, question_ids, total_questions, mode)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (quiz_id, user_id, category_id, pack_question_ids(question_ids), total or len(question_ids), mode))
+    return quiz_id
+
+
+def start_adaptive_quiz(db, user_id, category_id, total=QUIZ_LENGTH):
+    """Create an adaptive quiz with its first question chosen; None if the
+    category is empty. Caller commits."""
+    first = pick_adaptive_question(db, user_id, category_id)
+    if first is None:
+        return None
+    total = min(total, question_index.category_size(db, category_id))
+    return create_quiz_session(db, user_id, category_id, [first], mode="adaptive", total=total)
+
+
+def pick_category_questions(db, category_id, target=None, mix=None):
+    """
+    Question ids for a category quiz, drawn from the in-memory difficulty buckets.
+    `mix` is {level: count} (its total sets the quiz length); `target` centres a
+    QUIZ_LENGTH quiz on one level; with neither, any difficulty is fair game.
+    """
+    if mix:
+        return question_index.sample(db, category_id, sum(mix.values()), mix)
+    if target:
+        return question_index.sample(db, category_id, QUIZ_LENGTH, mix_for_target(target, QUIZ_LENGTH))
+    return question_index.sample(db, category_id, QUIZ_LENGTH)
+
+
+def parse_blueprint(blueprint):
+    """{"3": 40, "5": 60} (category id → relative weight) → {3: 40.0, 5: 60.0}.
+    Weights need not sum to 100. Raises ValueError on bad ids or weights."""
+    if not isinstance(blueprint, dict) or not blueprint:
+        raise ValueError("blueprint must be an object of category_id → weight, e.g. {\"1\": 30, \"2\": 70}")
+    weights = {}
+    for key, weight in blueprint.items():
+        try:
+            category_id = int(key)
+        except (TypeError, ValueError):
+            raise ValueError(f"unknown category: {key}")
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight < 0:
+            raise ValueError(f"weight for {key} must be a non-negative number")
+        weights[category_id] = float(weight)
+    if not any(weights.values()):
+        raise ValueError("blueprint needs at least one positive weight")
+    return weights
+
+
+def pick_exam_questions(db, blueprint=None, total=EXAM_LENGTH):
+    """
+    Question ids for a cross-category mock exam. Categories are weighted by the
+    blueprint ({category_id: weight}); without one, by how many questions each
+    holds, so the exam mirrors the bank.
+    """
+    if not blueprint:
+        blueprint = dict(db.execute("SELECT category_id, COUNT(*) FROM questions GROUP BY category_id"))
+    return question_index.sample_blueprint(db, blueprint, total)
+
+
+def _with_label(row):
+    if row is None:
+        return None
+    quiz = dict(row)
+    if not quiz["category_name"]:
+        quiz["category_name"] = MODE_LABELS.get(quiz["mode"], "Quiz")
+    return quiz
+
+
+def get_quiz_session(db, quiz_id):
+    return _with_label(db.execute("""
+        SELECT qs.*, c.name AS category_name
+        FROM quiz_sessions qs
+        LEFT JOIN categories c ON c.id = qs.category_id
+        WHERE qs.id = ?
+    """, (quiz_id,)).fetchone())
+
+
+def get_open_quiz(db, user_id):
+    """Most recent unfinished quiz for the user, or None."""
+    return _with_label(db.execute("""
+        SELECT qs.*, c.name AS category_name
+        FROM quiz_sessions qs
+        LEFT JOIN categories c ON c.id = qs.category_id
+        WHERE qs.user_id = ? AND qs.completed = 0
+        ORDER BY qs.created_at DESC
+        LIMIT 1
+    """, (user_id,)).fetchone())
+
+
+def advance_quiz(db, quiz, question_id, answer_id, is_correct):
+    """
+    Record the answer to the current question and move the session on by one.
+    The UPDATE only applies if nobody else answered this step first (double
+    submit, second device), in which case nothing is written and None is
+    returned. Otherwise returns (new_index, new_score, is_complete).
+    Caller commits.
+    """
+    total = question_count(quiz)
+    new_index = quiz["current_index"] + 1
+    new_score = quiz["score"] + is_correct
+    is_complete = new_index >= total
+
+    cursor = db.execute("""
+        UPDATE quiz_sessions
+        SET current_index = ?, score = ?, completed = ?
+        WHERE id = ? AND current_index = ?
+    """, (new_index, new_score, 1 if is_complete else 0, quiz["id"], quiz["current_index"]))
+    if cursor.rowcount == 0:
+        return None
+
+    record_result(db, quiz["user_id"], question_id, answer_id, is_correct, quiz_id=quiz["id"])
+
+    if quiz["mode"] == "adaptive" and not is_complete:
+        # Choose the next question now that the ability estimate has moved
+        next_id = pick_adaptive_question(db, quiz["user_id"], quiz["category_id"], parse_question_ids(quiz))
+        if next_id is None:
+            db.execute("UPDATE quiz_sessions SET total_questions = ?, completed = 1 WHERE id = ?",
+                       (new_index, quiz["id"]))
+            is_complete = True
+        else:
+            db.execute("UPDATE quiz_sessions SET question_ids = ? WHERE id = ?",
+                       (quiz["question_ids"] + pack_question_ids([next_id]), quiz["id"]))
+    return new_index, new_score, is_complete
+
+
+def quiz_review(db, quiz):
+    """Per-question review (question, user's answer, correct answer, explanation)
+    in the order the questions were answered."""
+    rows = db.execute("""
+        SELECT r.is_correct, q.question_text, q.explanation, q.source,
+               ua.answer_text AS user_answer, ca.answer_text AS correct_answer
+        FROM results_all r
+        JOIN questions q ON q.id = r.question_id
+        JOIN answers ua ON ua.id = r.answer_id
+        LEFT JOIN answers ca ON ca.question_id = r.question_id AND ca.is_correct = 1
+        WHERE r.quiz_id = ?
+        ORDER BY r.id
+    """, (quiz["id"],)).fetchall()
+    if rows or quiz["current_index"] == 0:
+        return [_review_item(r) for r in rows]
+
+    # Sessions answered before results.quiz_id existed: latest answer per question
+    review = []
+    for qid in parse_question_ids(quiz)[:quiz["current_index"]]:
+        row = db.execute("""
+            SELECT r.is_correct, q.question_text, q.explanation, q.source,
+                   ua.answer_text AS user_answer,
+                   (SELECT answer_text FROM answers
+                    WHERE question_id = r.question_id AND is_correct = 1) AS correct_answer
+            FROM results_all r
+            JOIN questions q ON q.id = r.question_id
+            JOIN answers ua ON ua.id = r.answer_id
+            WHERE r.user_id = ? AND r.question_id = ?
+            ORDER BY r.answered_at DESC
+            LIMIT 1
+        """, (quiz["user_id"], qid)).fetchone()
+        if row:
+            review.append(_review_item(row))
+    return review
+
+
+def _review_item(row):
+    return {
+        "question_text": row["question_text"],
+        "user_answer": row["user_answer"],
+        "correct_answer": row["correct_answer"],
+        "explanation": row["explanation"],
+        "source": row["source"],
+        "is_correct": bool(row["is_correct"]),
+    }
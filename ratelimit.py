@@ -0,0 +1,203 @@
+"""
+ratelimit.py
+Token-bucket throttling for the expensive API endpoints: logins, registrations
+and password resets (each hashes a password) and quiz starts (each inserts a
+quiz_sessions row).
+
+Every limit is a bucket of `capacity` tokens that refills over `per_seconds`,
+kept per (route, scope, identity) — scope "ip" keys on the client address,
+"user" on the signed-in user or, for the auth routes, the username in the
+request body. Buckets live in a small SQLite file of their own
+(RATE_LIMIT_DB, on /dev/shm when it exists), so every gunicorn worker sees the
+same counts without touching the main database. A check is a single UPSERT …
+RETURNING that refills and takes a token atomically, so concurrent workers
+cannot both spend the last one.
+
+Requests over a limit get 429 with Retry-After. Each refusal is counted per
+(route, scope) in rate_limit_hits, served by /api/admin/rate-limits as JSON or
+Prometheus text. The store is disposable: deleting the file resets every
+bucket. If it is unavailable, requests are let through rather than failed.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") not in ("0", "false", "off")
+RATE_LIMIT_DB = os.environ.get(
+    "RATE_LIMIT_DB",
+    "/dev/shm/nuclear_quiz_ratelimit.db" if os.path.isdir("/dev/shm")
+    else os.path.join(os.path.dirname(os.path.abspath(__file__)), "ratelimit.db")
+)
+# Reverse proxies in front of the app that append to X-Forwarded-For (1 behind nginx, 0 when exposed directly)
+TRUSTED_PROXY_HOPS = int(os.environ.get("TRUSTED_PROXY_HOPS", 0))
+
+# route → ((scope, capacity, per_seconds), …); every bucket must have a token for the request to pass
+LIMITS = {
+    "login": (("ip", 20, 60), ("user", 5, 60)),
+    "register": (("ip", 5, 3600),),
+    "reset-password": (("ip", 5, 3600), ("user", 3, 3600)),
+    "quiz-start": (("user", 30, 60), ("ip", 120, 60)),
+}
+PRUNE_INTERVAL = 600  # seconds between sweeps of full (idle) buckets
+
+_local = threading.local()
+_last_prune = 0.0
+_warned_forwarded = False
+
+
+def _store():
+    """This thread's connection to the bucket store, reopened after a fork."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.pid != os.getpid():
+        conn = sqlite3.connect(RATE_LIMIT_DB, isolation_level=None, timeout=0.5)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = OFF")  # throttling state, nothing to lose
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_limit_hits (
+                route TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                last_hit REAL,
+                PRIMARY KEY (route, scope)
+            ) WITHOUT ROWID
+        """)
+        _local.conn, _local.pid = conn, os.getpid()
+    return conn
+
+
+def take(key, capacity, per_seconds, now=None):
+    """Take one token from the bucket. Returns 0 if allowed, otherwise the
+    seconds until a token will be available."""
+    now = time.time() if now is None else now
+    rate = capacity / per_seconds
+    db = _store()
+    # The DO UPDATE only applies when the refilled bucket holds a whole token;
+    # no row back means the request is over the limit.
+    row = db.execute("""
+        INSERT INTO rate_buckets (key, tokens, updated) VALUES (?1, ?2 - 1, ?3)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = MIN(?2, tokens + (excluded.updated - updated) * ?4) - 1,
+            updated = excluded.updated
+        WHERE MIN(?2, tokens + (excluded.updated - updated) * ?4) >= 1
+        RETURNING tokens
+    """, (key, capacity, now, rate)).fetchone()
+    if row is not None:
+        return 0
+    tokens, updated = db.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+    return max((1 - min(capacity, tokens + (now - updated) * rate)) / rate, 0.001)
+
+
+def _record_hit(route, scope):
+    _store().execute("""
+        INSERT INTO rate_limit_hits (route, scope, hits, last_hit) VALUES (?, ?, 1, ?)
+        ON CONFLICT (route, scope) DO UPDATE SET hits = hits + 1, last_hit = excluded.last_hit
+    """, (route, scope, time.time()))
+
+
+def _prune():
+    """Drop buckets that have been idle long enough to be full again; a missing
+    bucket and a full one behave the same."""
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < PRUNE_INTERVAL:
+        return
+    _last_prune = now
+    longest = max(per for limits in LIMITS.values() for _, _, per in limits)
+    _store().execute("DELETE FROM rate_buckets WHERE updated < ?", (now - longest,))
+
+
+def client_ip():
+    global _warned_forwarded
+    route = request.access_route
+    forwarded = request.headers.get("X-Forwarded-For")
+    if TRUSTED_PROXY_HOPS and len(route) >= TRUSTED_PROXY_HOPS and forwarded:
+        return route[-TRUSTED_PROXY_HOPS]
+    if forwarded and not TRUSTED_PROXY_HOPS and not _warned_forwarded:
+        # Behind a proxy every client would share the proxy's buckets
+        _warned_forwarded = True
+        current_app.logger.warning("X-Forwarded-For received but TRUSTED_PROXY_HOPS=0: rate limits key on the "
+                                   "proxy address %s; set TRUSTED_PROXY_HOPS=1 behind nginx", request.remote_addr)
+    return request.remote_addr or "unknown"
+
+
+def _identity(scope):
+    if scope == "ip":
+        return client_ip()
+    user_id = g.get("user_id")
+    if user_id is not None:
+        return str(user_id)
+    data = request.get_json(silent=True) or {}
+    username = data.get("username") if isinstance(data, dict) else None
+    return username.strip().lower() if isinstance(username, str) and username.strip() else None
+
+
+def check(route):
+    """(scope, retry_after) of the first limit the current request exceeds, or None."""
+    _prune()
+    for scope, capacity, per_seconds in LIMITS[route]:
+        identity = _identity(scope)
+        if identity is None:
+            continue
+        wait = take(f"{route}:{scope}:{identity}", capacity, per_seconds)
+        if wait:
+            _record_hit(route, scope)
+            return scope, wait
+    return None
+
+
+def rate_limited(route):
+    """Throttle an API view with the LIMITS entry for `route`; the refusal is a
+    JSON 429. Only POSTs are counted. Put it below @jwt_required so the "user"
+    scope sees g.user_id."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if RATE_LIMIT_ENABLED and request.method == "POST":
+                try:
+                    limited = check(route)
+                except sqlite3.Error as e:
+                    current_app.logger.warning("rate limit store unavailable, not throttling: %s", e)
+                    limited = None
+                if limited:
+                    scope, wait = limited
+                    retry_after = max(int(wait + 0.999), 1)
+                    response = jsonify({"error": "Too many requests, try again later",
+                                        "retry_after": retry_after})
+                    response.status_code = 429
+                    response.headers["Retry-After"] = str(retry_after)
+                    return response
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def rate_limit_metrics():
+    """Configured limits and how often each one has refused a request."""
+    hits = {(r, s): (n, last) for r, s, n, last in _store().execute(
+        "SELECT route, scope, hits, last_hit FROM rate_limit_hits")}
+    return [
+        {"route": route, "scope": scope, "capacity": capacity, "per_seconds": per_seconds,
+         "hits": hits.get((route, scope), (0, None))[0], "last_hit": hits.get((route, scope), (0, None))[1]}
+        for route, limits in LIMITS.items()
+        for scope, capacity, per_seconds in limits
+    ]
+
+
+def prometheus_text(metrics):
+    lines = ["# HELP quiz_rate_limit_hits_total Requests refused with 429 by a rate limit.",
+             "# TYPE quiz_rate_limit_hits_total counter"]
+    lines += [f'quiz_rate_limit_hits_total{{route="{m["route"]}",scope="{m["scope"]}"}} {m["hits"]}'
+              for m in metrics]
+    return "\n".join(lines) + "\n"
@@ -6,6 +6,10 @@ CREATE TABLE users (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Question bank: categories, questions and answers (with question_search and the browser
+-- indexes below) move to their own file, content.db, the first time the app starts
+-- (content_db.ensure_content_database); nothing in the user-data tables references them.
+
 -- Categories (CANDU Systems, IAEA Safety Standards, Radiation Protection, etc.)
 CREATE TABLE categories (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -22,8 +26,15 @@ CREATE TABLE questions (
     explanation TEXT,
     difficulty INTEGER DEFAULT 1,
     source TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    answer_count INTEGER NOT NULL DEFAULT 0  -- kept by the answers_count_* triggers below
 );
+-- Admin question browser: keyset pages on (created_at, id) per filter
+-- (created at runtime by question_browser.ensure_question_browser)
+CREATE INDEX IF NOT EXISTS idx_questions_created ON questions (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_questions_category_created ON questions (category_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_questions_difficulty_created ON questions (difficulty, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_questions_source_created ON questions (source, created_at, id);
 
 -- Answer options (4 per question)
 CREATE TABLE answers (
@@ -32,25 +43,277 @@ CREATE TABLE answers (
     answer_text TEXT NOT NULL,
     is_correct INTEGER NOT NULL DEFAULT 0
 );
+-- Answers by question (quiz pages, search/answer_count triggers); created at runtime by search.ensure_search_index
+CREATE INDEX IF NOT EXISTS idx_answers_question ON answers (question_id, is_correct);
+CREATE TRIGGER IF NOT EXISTS answers_count_ai AFTER INSERT ON answers BEGIN
+    UPDATE questions SET answer_count = answer_count + 1 WHERE id = new.question_id;
+END;
+CREATE TRIGGER IF NOT EXISTS answers_count_ad AFTER DELETE ON answers BEGIN
+    UPDATE questions SET answer_count = answer_count - 1 WHERE id = old.question_id;
+END;
+CREATE TRIGGER IF NOT EXISTS answers_count_au AFTER UPDATE OF question_id ON answers
+WHEN old.question_id IS NOT new.question_id BEGIN
+    UPDATE questions SET answer_count = answer_count - 1 WHERE id = old.question_id;
+    UPDATE questions SET answer_count = answer_count + 1 WHERE id = new.question_id;
+END;
 
 -- User quiz results (needed for progress tracking later)
 CREATE TABLE results (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     user_id INTEGER REFERENCES users(id),
-    question_id INTEGER REFERENCES questions(id),
-    answer_id INTEGER REFERENCES answers(id),
+    question_id INTEGER,  -- questions/answers are in content.db
+    answer_id INTEGER,
     is_correct INTEGER NOT NULL,
-    answered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    answered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    quiz_id TEXT  -- quiz_sessions.id the answer was given in (added at runtime by ensure_quiz_sessions_table)
 );
+CREATE INDEX IF NOT EXISTS idx_results_quiz ON results (quiz_id);
+-- Per-user history in time order (training record export; created at runtime by
+-- training_records.ensure_results_user_index, matching the monthly partition tables)
+CREATE INDEX IF NOT EXISTS idx_results_user_time ON results (user_id, answered_at);
 
 -- API quiz sessions (stateless quiz state for mobile clients; created at runtime by ensure_quiz_sessions_table)
 CREATE TABLE IF NOT EXISTS quiz_sessions (
     id TEXT PRIMARY KEY,
     user_id INTEGER NOT NULL REFERENCES users(id),
-    category_id INTEGER NOT NULL REFERENCES categories(id),
-    question_ids TEXT NOT NULL,        -- JSON array of question IDs
+    category_id INTEGER,  -- NULL for cross-category modes; categories are in content.db
+    question_ids TEXT NOT NULL,        -- packed little-endian uint32 question IDs (JSON array in older rows)
     current_index INTEGER NOT NULL DEFAULT 0,
     score INTEGER NOT NULL DEFAULT 0,
     completed INTEGER NOT NULL DEFAULT 0,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    mode TEXT NOT NULL DEFAULT 'category',  -- 'category', 'review' (spaced repetition) or 'exam'
+    total_questions INTEGER            -- length of question_ids
 );
+
+CREATE INDEX IF NOT EXISTS idx_quiz_sessions_user ON quiz_sessions (user_id, completed);
+CREATE INDEX IF NOT EXISTS idx_quiz_sessions_age ON quiz_sessions (completed, created_at);
+
+-- Completed quiz sessions moved out of quiz_sessions by maintenance.py archive-sessions
+CREATE TABLE IF NOT EXISTS quiz_sessions_archive (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    category_id INTEGER,
+    total_questions INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    created_at TIMESTAMP,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    mode TEXT NOT NULL DEFAULT 'category'
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_quiz_sessions_archive_user ON quiz_sessions_archive (user_id);
+
+-- Per-user, per-category answer totals read by the progress pages
+-- (maintained by helpers.record_result; created at runtime by ensure_progress_table)
+CREATE TABLE IF NOT EXISTS user_category_progress (
+    user_id INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    total_answered INTEGER NOT NULL DEFAULT 0,
+    total_correct INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, category_id)
+) WITHOUT ROWID;
+
+-- Monthly results partitions (results_YYYY_MM tables or archived .csv.gz files;
+-- see partitions.py, created at runtime by ensure_partition_catalog along with the results_all view)
+CREATE TABLE IF NOT EXISTS results_partitions (
+    name TEXT PRIMARY KEY,
+    month TEXT NOT NULL UNIQUE,
+    state TEXT NOT NULL DEFAULT 'table',
+    row_count INTEGER NOT NULL DEFAULT 0,
+    archive_path TEXT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Spaced-repetition (SM-2) schedule, one row per user and question seen
+-- (maintained by helpers.record_result; created at runtime by spaced_repetition.ensure_schedule_table)
+CREATE TABLE IF NOT EXISTS user_question_schedule (
+    user_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    interval_days REAL NOT NULL DEFAULT 0,
+    easiness REAL NOT NULL DEFAULT 2.5,
+    due_at TIMESTAMP NOT NULL,
+    reviewed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, question_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_schedule_due ON user_question_schedule (user_id, due_at);
+
+-- Latest outcome per user and question, for the "mistakes" mode and weak-question list
+-- (maintained by helpers.record_result; created at runtime by question_state.ensure_question_state_table)
+CREATE TABLE IF NOT EXISTS user_question_state (
+    user_id INTEGER NOT NULL,
+    question_id INTEGER NOT NULL,
+    last_answer_id INTEGER,
+    last_correct INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    correct_count INTEGER NOT NULL DEFAULT 0,
+    streak INTEGER NOT NULL DEFAULT 0,  -- consecutive correct answers, 0 after a miss
+    last_answered_at TIMESTAMP,
+    PRIMARY KEY (user_id, question_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_question_state_last ON user_question_state (user_id, last_correct, last_answered_at);
+
+-- Leaderboard totals per board (category_id 0 = global) and period ('all' or ISO week 'YYYY-Www')
+-- (maintained by helpers.record_result; created at runtime by leaderboard.ensure_leaderboard_table)
+CREATE TABLE IF NOT EXISTS leaderboard_entries (
+    category_id INTEGER NOT NULL,
+    period TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    answered INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0,
+    accuracy REAL GENERATED ALWAYS AS (CAST(correct AS REAL) / answered) VIRTUAL,
+    PRIMARY KEY (category_id, period, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_leaderboard_correct ON leaderboard_entries (category_id, period, correct DESC);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_accuracy ON leaderboard_entries (category_id, period, accuracy DESC, correct DESC);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_user ON leaderboard_entries (user_id);
+
+-- Item analysis per question and per answer option, replaced wholesale by item_analysis.py
+-- (created at runtime by item_analysis.ensure_question_stats_table)
+CREATE TABLE IF NOT EXISTS question_stats (
+    question_id INTEGER PRIMARY KEY,
+    responses INTEGER NOT NULL,
+    p_value REAL,
+    point_biserial REAL,
+    flags TEXT,  -- comma-separated: easy, hard, low_discrimination, misleading_distractor
+    computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS answer_stats (
+    answer_id INTEGER PRIMARY KEY,
+    question_id INTEGER NOT NULL,
+    picks INTEGER NOT NULL,
+    pick_rate REAL,
+    point_biserial REAL
+);
+CREATE INDEX IF NOT EXISTS idx_answer_stats_question ON answer_stats (question_id);
+
+-- Online 1PL/Elo estimates: ability per user and category, difficulty per question
+-- (maintained by helpers.record_result; created at runtime by adaptive.ensure_ratings_tables)
+CREATE TABLE IF NOT EXISTS user_ability (
+    user_id INTEGER NOT NULL,
+    category_id INTEGER NOT NULL,
+    ability REAL NOT NULL DEFAULT 0,
+    answers INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, category_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS question_ratings (
+    question_id INTEGER PRIMARY KEY,
+    difficulty REAL NOT NULL,
+    answers INTEGER NOT NULL DEFAULT 0
+);
+
+-- Live answer-distribution counters: attempts/correct per question, picks per answer
+-- (maintained by helpers.record_result; created at runtime by answer_counts.ensure_answer_counts_tables)
+CREATE TABLE IF NOT EXISTS question_counters (
+    question_id INTEGER PRIMARY KEY,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS answer_counters (
+    answer_id INTEGER PRIMARY KEY,
+    question_id INTEGER NOT NULL,
+    picks INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_answer_counters_question ON answer_counters (question_id);
+
+-- Admin dashboard counters and hourly activity, maintained by the triggers below
+-- (created and seeded at runtime by stats.ensure_stats_tables)
+CREATE TABLE IF NOT EXISTS stats_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO stats_counters (name) VALUES
+    ('questions'), ('categories'), ('users'), ('answers'), ('correct_answers'),
+    ('quizzes_started'), ('quizzes_completed'), ('active_sessions');
+CREATE TABLE IF NOT EXISTS stats_activity (
+    hour TEXT PRIMARY KEY,  -- UTC, 'YYYY-MM-DD HH'
+    answers INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0,
+    quizzes_started INTEGER NOT NULL DEFAULT 0,
+    quizzes_completed INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS stats_questions_ai AFTER INSERT ON questions BEGIN
+    UPDATE stats_counters SET value = value + 1 WHERE name = 'questions';
+END;
+CREATE TRIGGER IF NOT EXISTS stats_questions_ad AFTER DELETE ON questions BEGIN
+    UPDATE stats_counters SET value = value - 1 WHERE name = 'questions';
+END;
+CREATE TRIGGER IF NOT EXISTS stats_categories_ai AFTER INSERT ON categories BEGIN
+    UPDATE stats_counters SET value = value + 1 WHERE name = 'categories';
+END;
+CREATE TRIGGER IF NOT EXISTS stats_categories_ad AFTER DELETE ON categories BEGIN
+    UPDATE stats_counters SET value = value - 1 WHERE name = 'categories';
+END;
+CREATE TRIGGER IF NOT EXISTS stats_users_ai AFTER INSERT ON users BEGIN
+    UPDATE stats_counters SET value = value + 1 WHERE name = 'users';
+END;
+CREATE TRIGGER IF NOT EXISTS stats_users_ad AFTER DELETE ON users BEGIN
+    UPDATE stats_counters SET value = value - 1 WHERE name = 'users';
+END;
+CREATE TRIGGER IF NOT EXISTS stats_results_ai AFTER INSERT ON results BEGIN
+    UPDATE stats_counters SET value = value + 1 WHERE name = 'answers';
+    UPDATE stats_counters SET value = value + new.is_correct WHERE name = 'correct_answers';
+    INSERT INTO stats_activity (hour, answers, correct) VALUES (strftime('%Y-%m-%d %H', 'now'), 1, new.is_correct)
+    ON CONFLICT (hour) DO UPDATE SET answers = answers + 1, correct = correct + excluded.correct;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_quiz_sessions_ai AFTER INSERT ON quiz_sessions BEGIN
+    UPDATE stats_counters SET value = value + 1 WHERE name = 'quizzes_started';
+    UPDATE stats_counters SET value = value + 1 WHERE name = 'active_sessions';
+    INSERT INTO stats_activity (hour, quizzes_started) VALUES (strftime('%Y-%m-%d %H', 'now'), 1)
+    ON CONFLICT (hour) DO UPDATE SET quizzes_started = quizzes_started + excluded.quizzes_started;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_quiz_sessions_au AFTER UPDATE OF completed ON quiz_sessions
+WHEN new.completed = 1 AND old.completed = 0 BEGIN
+    UPDATE stats_counters SET value = value + 1 WHERE name = 'quizzes_completed';
+    UPDATE stats_counters SET value = value - 1 WHERE name = 'active_sessions';
+    INSERT INTO stats_activity (hour, quizzes_completed) VALUES (strftime('%Y-%m-%d %H', 'now'), 1)
+    ON CONFLICT (hour) DO UPDATE SET quizzes_completed = quizzes_completed + excluded.quizzes_completed;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_quiz_sessions_ad AFTER DELETE ON quiz_sessions
+WHEN old.completed = 0 BEGIN
+    UPDATE stats_counters SET value = value - 1 WHERE name = 'active_sessions';
+END;
+
+-- Full-text index over the question bank, rowid = questions.id (created at runtime by
+-- search.ensure_search_index; the triggers keep it in sync with questions and answers)
+CREATE VIRTUAL TABLE IF NOT EXISTS question_search USING fts5(
+    question_text, explanation, source, answers,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS question_search_ai AFTER INSERT ON questions BEGIN
+    INSERT INTO question_search (rowid, question_text, explanation, source, answers)
+    VALUES (new.id, new.question_text, new.explanation, new.source,
+            (SELECT group_concat(answer_text, ' ') FROM answers WHERE question_id = new.id));
+END;
+CREATE TRIGGER IF NOT EXISTS question_search_au AFTER UPDATE OF question_text, explanation, source ON questions BEGIN
+    UPDATE question_search
+    SET question_text = new.question_text, explanation = new.explanation, source = new.source
+    WHERE rowid = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS question_search_ad AFTER DELETE ON questions BEGIN
+    DELETE FROM question_search WHERE rowid = old.id;
+END;
+CREATE TRIGGER IF NOT EXISTS question_search_answers_ai AFTER INSERT ON answers BEGIN
+    UPDATE question_search
+    SET answers = (SELECT group_concat(answer_text, ' ') FROM answers WHERE question_id = new.question_id)
+    WHERE rowid = new.question_id;
+END;
+CREATE TRIGGER IF NOT EXISTS question_search_answers_au AFTER UPDATE OF answer_text, question_id ON answers BEGIN
+    UPDATE question_search
+    SET answers = (SELECT group_concat(answer_text, ' ') FROM answers WHERE question_id = old.question_id)
+    WHERE rowid = old.question_id;
+    UPDATE question_search
+    SET answers = (SELECT group_concat(answer_text, ' ') FROM answers WHERE question_id = new.question_id)
+    WHERE rowid = new.question_id;
+END;
+CREATE TRIGGER IF NOT EXISTS question_search_answers_ad AFTER DELETE ON answers BEGIN
+    UPDATE question_search
+    SET answers = (SELECT group_concat(answer_text, ' ') FROM answers WHERE question_id = old.question_id)
+    WHERE rowid = old.question_id;
+END;
+
+-- content.db only: the bank's version (incremented on every swap) and the question and category
+-- counts for the admin dashboard, stamped by content_db.edit_content / install_content.
+-- CREATE TABLE content_info (
+--     name TEXT PRIMARY KEY,  -- version, built_at, questions, categories
+--     value
+-- ) WITHOUT ROWID;
@@ -0,0 +1,164 @@
+"""
+search.py
+Full-text search over the question bank (SQLite FTS5).
+
+question_search has one row per question (rowid = questions.id) holding the
+question text, explanation, source and all of its answer texts. Triggers on
+questions and answers keep it in step with every write path — the admin form,
+init_db.py, add_questions.py, deduplicate_db.py — so nothing else has to know
+it exists.
+
+Results are ranked by bm25 with question text weighted highest and paged by
+keyset: the cursor is the (score, id) of the last row shown, so page 50 costs
+the same as page 1.
+"""
+
+import html
+
+from markupsafe import Markup
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+# bm25 column weights: question_text, explanation, source, answers
+_BM25 = "bm25(question_search, 10.0, 2.0, 4.0, 1.0)"
+# Control characters mark the hit inside snippets; swapped for <mark> after escaping
+_HIT_START, _HIT_END = "\x02", "\x03"
+
+SEARCH_TRIGGERS = {
+    "question_search_ai": """
+        CREATE TRIGGER question_search_ai AFTER INSERT ON questions BEGIN
+            INSERT INTO question_search (rowid, question_text, explanation, source, answers)
+            VALUES (new.id, new.question_text, new.explanation, new.source,
+                    (SELECT group_concat(answer_text, ' ') FROM answers WHERE question_id = new.id));
+        END""",
+    "question_search_au": """
+        CREATE TRIGGER question_search_au AFTER UPDATE OF question_text, explanation, source ON questions BEGIN
+            UPDATE question_search
+            SET question_text = new.question_text, explanation = new.explanation, source = new.source
+            WHERE rowid = new.id;
+        END""",
+    "question_search_ad": """
+        CREATE TRIGGER question_search_ad AFTER DELETE ON questions BEGIN
+            DELETE FROM question_search WHERE rowid = old.id;
+        END""",
+    "question_search_answers_ai": """
+        CREATE TRIGGER question_search_answers_ai AFTER INSERT ON answers BEGIN
+            UPDATE question_search
+            SET answers = (SELECT group_concat(answer_text, ' ') FROM answers WHERE question_id = new.question_id)
+            WHERE rowid = new.question_id;
+        END""",
+    "question_search_answers_au": """
+        CREATE TRIGGER question_search_answers_au AFTER UPDATE OF answer_text, question_id ON answers BEGIN
+            UPDATE question_search
+            SET answers = (SELECT group_concat(answer_text, ' ') FROM answers WHERE question_id = old.question_id)
+            WHERE rowid = old.question_id;
+            UPDATE question_search
+            SET answers = (SELECT group_concat(answer_text, ' ') FROM answers WHERE question_id = new.question_id)
+            WHERE rowid = new.question_id;
+        END""",
+    "question_search_answers_ad": """
+        CREATE TRIGGER question_search_answers_ad AFTER DELETE ON answers BEGIN
+            UPDATE question_search
+            SET answers = (SELECT group_concat(answer_text, ' ') FROM answers WHERE question_id = old.question_id)
+            WHERE rowid = old.question_id;
+        END""",
+}
+
+
+def ensure_search_index(db):
+    """Create the FTS5 table and its sync triggers, filling the index the first
+    time. Safe to call on every startup."""
+    exists = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'question_search'"
+    ).fetchone()
+    if not exists:
+        db.execute("""
+            CREATE VIRTUAL TABLE question_search USING fts5(
+                question_text, explanation, source, answers,
+                tokenize = 'porter unicode61 remove_diacritics 2'
+            )
+        """)
+    # The answer triggers re-read one question's answers; without this they scan the table
+    db.execute("CREATE INDEX IF NOT EXISTS idx_answers_question ON answers (question_id, is_correct)")
+    existing = {r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    for name, sql in SEARCH_TRIGGERS.items():
+        if name not in existing:
+            db.execute(sql)
+    if not exists:
+        rebuild_search_index(db)
+    db.commit()
+
+
+def rebuild_search_index(db):
+    """Repopulate question_search from questions and answers. Caller commits."""
+    db.execute("DELETE FROM question_search")
+    db.execute("""
+        INSERT INTO question_search (rowid, question_text, explanation, source, answers)
+        SELECT q.id, q.question_text, q.explanation, q.source,
+               (SELECT group_concat(answer_text, ' ') FROM answers WHERE question_id = q.id)
+        FROM questions q
+    """)
+    db.execute("INSERT INTO question_search (question_search) VALUES ('optimize')")
+
+
+def match_expression(text):
+    """Turn free text into an FTS5 query: every word must appear, the last one
+    as a prefix ("xeno" finds xenon). Quoting keeps FTS5 syntax characters in
+    user input from being interpreted. Returns None when nothing is searchable."""
+    words = [w for w in text.split() if any(ch.isalnum() for ch in w)]
+    if not words:
+        return None
+    terms = ['"' + w.replace('"', '""') + '"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def parse_cursor(cursor):
+    """'<score>:<id>' from a previous page → (score, id). Raises ValueError."""
+    score, _, last_id = (cursor or "").partition(":")
+    return float(score), int(last_id)
+
+
+def highlight(snippet):
+    """Escape a snippet and wrap its hits in <mark>."""
+    return Markup(html.escape(snippet or "")
+                  .replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>"))
+
+
+def search_questions(db, text, limit=SEARCH_PAGE_SIZE, after=None, category_id=None):
+    """
+    Ranked matches for `text`, best first. `after` is the (score, id) of the
+    last row of the previous page. Returns (rows, next_cursor); next_cursor is
+    None on the last page.
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return [], None
+
+    where, params = ["question_search MATCH ?"], [expression]
+    if after is not None:
+        where.append(f"({_BM25} > ? OR ({_BM25} = ? AND question_search.rowid > ?))")
+        params += [after[0], after[0], after[1]]
+    if category_id is not None:
+        where.append("q.category_id = ?")
+        params.append(category_id)
+
+    rows = db.execute(f"""
+        SELECT q.id, q.category_id, c.name AS category_name, q.difficulty, q.source,
+               q.question_text, {_BM25} AS score,
+               snippet(question_search, -1, '{_HIT_START}', '{_HIT_END}', '…', 16) AS snippet
+        FROM question_search
+        JOIN questions q ON q.id = question_search.rowid
+        JOIN categories c ON c.id = q.category_id
+        WHERE {" AND ".join(where)}
+        ORDER BY score, q.id
+        LIMIT ?
+    """, (*params, limit + 1)).fetchall()
+
+    results = [dict(r, snippet=highlight(r["snippet"])) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = results[-1]
+        next_cursor = f"{last['score']!r}:{last['id']}"
+    return results, next_cursor
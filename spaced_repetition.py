@@ -0,0 +1,123 @@
+"""
+spaced_repetition.py
+SM-2 scheduling for the "review" quiz mode.
+
+user_question_schedule holds one row per (user, question) the user has
+answered. record_result() updates it in the same transaction as the answer,
+so building a review quiz is a range scan on (user_id, due_at) rather than a
+replay of the user's history.
+"""
+
+import os
+
+QUALITY_CORRECT = 4    # SM-2 response quality for a correct answer
+QUALITY_INCORRECT = 1  # … and for a wrong one
+MIN_EASINESS = 1.3
+RELEARN_MINUTES = int(os.environ.get("REVIEW_RELEARN_MINUTES", 10))  # wrong answers come back soon
+
+
+def ensure_schedule_table(db):
+    """Create user_question_schedule if it does not exist. Safe to call on every startup."""
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS user_question_schedule (
+            user_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            repetitions INTEGER NOT NULL DEFAULT 0,
+            interval_days REAL NOT NULL DEFAULT 0,
+            easiness REAL NOT NULL DEFAULT 2.5,
+            due_at TIMESTAMP NOT NULL,
+            reviewed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, question_id)
+        ) WITHOUT ROWID
+    """)
+    db.execute("CREATE INDEX IF NOT EXISTS idx_schedule_due ON user_question_schedule (user_id, due_at)")
+    db.commit()
+
+
+def next_review(repetitions, interval_days, easiness, is_correct):
+    """One SM-2 step. Returns (repetitions, interval_days, easiness, minutes_until_due)."""
+    quality = QUALITY_CORRECT if is_correct else QUALITY_INCORRECT
+    easiness = max(MIN_EASINESS, easiness + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if not is_correct:
+        return 0, 0.0, easiness, RELEARN_MINUTES
+    if repetitions == 0:
+        interval_days = 1.0
+    elif repetitions == 1:
+        interval_days = 6.0
+    else:
+        interval_days = round(interval_days * easiness, 2)
+    return repetitions + 1, interval_days, easiness, int(interval_days * 24 * 60)
+
+
+def update_schedule(db, user_id, question_id, is_correct):
+    """Apply one answer to the user's schedule for this question. Caller commits."""
+    row = db.execute("""
+        SELECT repetitions, interval_days, easiness FROM user_question_schedule
+        WHERE user_id = ? AND question_id = ?
+    """, (user_id, question_id)).fetchone()
+    repetitions, interval_days, easiness, minutes = next_review(
+        *(tuple(row) if row else (0, 0.0, 2.5)), is_correct)
+    db.execute("""
+        INSERT OR REPLACE INTO user_question_schedule
+            (user_id, question_id, repetitions, interval_days, easiness, due_at, reviewed_at)
+        VALUES (?, ?, ?, ?, ?, datetime('now', ?), CURRENT_TIMESTAMP)
+    """, (user_id, question_id, repetitions, interval_days, easiness, f"+{minutes} minutes"))
+
+
+def due_question_ids(db, user_id, limit=10, category_id=None):
+    """Questions due for review, most overdue first."""
+    if category_id is None:
+        rows = db.execute("""
+            SELECT question_id FROM user_question_schedule
+            WHERE user_id = ? AND due_at <= datetime('now')
+            ORDER BY due_at
+            LIMIT ?
+        """, (user_id, limit))
+    else:
+        rows = db.execute("""
+            SELECT s.question_id FROM user_question_schedule s
+            JOIN questions q ON q.id = s.question_id
+            WHERE s.user_id = ? AND s.due_at <= datetime('now') AND q.category_id = ?
+            ORDER BY s.due_at
+            LIMIT ?
+        """, (user_id, category_id, limit))
+    return [r[0] for r in rows]
+
+
+def due_count(db, user_id):
+    return db.execute("""
+        SELECT COUNT(*) FROM user_question_schedule
+        WHERE user_id = ? AND due_at <= datetime('now')
+    """, (user_id,)).fetchone()[0]
+
+
+def next_due_at(db, user_id):
+    row = db.execute(
+        "SELECT MIN(due_at) FROM user_question_schedule WHERE user_id = ?", (user_id,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def backfill_schedules(db):
+    """Rebuild every schedule by replaying all results in order, archived months
+    included. Only needed once for answers given before spaced repetition existed.
+    The replay runs under the write lock, so answers graded meanwhile wait for it
+    instead of being overwritten by the swap."""
+    from partitions import replay_results  # imported here: partitions → helpers → this module
+
+    db.execute("BEGIN IMMEDIATE")
+    state = {}
+    for user_id, question_id, is_correct in replay_results(db, ("user_id", "question_id", "is_correct")):
+        reps, interval, ease = state.get((user_id, question_id), (0, 0.0, 2.5))[:3]
+        state[(user_id, question_id)] = next_review(reps, interval, ease, is_correct)
+
+    db.execute("DELETE FROM user_question_schedule")
+    # Due dates restart from now: history decides the interval, not the calendar
+    db.executemany("""
+        INSERT INTO user_question_schedule
+            (user_id, question_id, repetitions, interval_days, easiness, due_at)
+        VALUES (?, ?, ?, ?, ?, datetime('now', ?))
+    """, [(u, q, reps, interval, ease, f"+{minutes} minutes")
+          for (u, q), (reps, interval, ease, minutes) in state.items()])
+    db.commit()
+    return len(state)
@@ -0,0 +1,192 @@
+"""
+stats.py
+Materialized counters for the admin dashboard.
+
+stats_counters holds one row per named counter and stats_activity one row
+per UTC hour. Both are maintained by triggers on users, results and
+quiz_sessions, so every write path (web, API, admin, the seeding and dedup
+scripts) keeps them current without code changes, and the dashboard reads a
+handful of rows instead of counting tables. The question and category counts
+come from content_info in content.db, restamped whenever the bank changes
+(content_db.py).
+
+Counters are lifetime totals: rows that maintenance.py moves out of results
+or quiz_sessions (rollover, archive, expiry) are not subtracted, except that
+expiring an abandoned session does drop it from active_sessions.
+`maintenance.py rebuild-stats` recomputes everything from the tables.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+from content_db import content_info
+
+COUNTERS = ("questions", "categories", "users", "answers", "correct_answers",
+            "quizzes_started", "quizzes_completed", "active_sessions")
+
+_HOUR = "strftime('%Y-%m-%d %H', 'now')"
+_TRIGGER_TABLE = re.compile(r" ON (\w+)")
+
+
+def _bump(name, delta):
+    return f"UPDATE stats_counters SET value = value {'+' if delta > 0 else '-'} {abs(delta)} WHERE name = '{name}';"
+
+
+def _bump_activity(column):
+    return f"""INSERT INTO stats_activity (hour, {column}) VALUES ({_HOUR}, 1)
+            ON CONFLICT (hour) DO UPDATE SET {column} = {column} + excluded.{column};"""
+
+
+STATS_TRIGGERS = {
+    "stats_questions_ai": f"CREATE TRIGGER stats_questions_ai AFTER INSERT ON questions BEGIN {_bump('questions', 1)} END",
+    "stats_questions_ad": f"CREATE TRIGGER stats_questions_ad AFTER DELETE ON questions BEGIN {_bump('questions', -1)} END",
+    "stats_categories_ai": f"CREATE TRIGGER stats_categories_ai AFTER INSERT ON categories BEGIN {_bump('categories', 1)} END",
+    "stats_categories_ad": f"CREATE TRIGGER stats_categories_ad AFTER DELETE ON categories BEGIN {_bump('categories', -1)} END",
+    "stats_users_ai": f"CREATE TRIGGER stats_users_ai AFTER INSERT ON users BEGIN {_bump('users', 1)} END",
+    "stats_users_ad": f"CREATE TRIGGER stats_users_ad AFTER DELETE ON users BEGIN {_bump('users', -1)} END",
+    "stats_results_ai": f"""
+        CREATE TRIGGER stats_results_ai AFTER INSERT ON results BEGIN
+            {_bump('answers', 1)}
+            UPDATE stats_counters SET value = value + new.is_correct WHERE name = 'correct_answers';
+            INSERT INTO stats_activity (hour, answers, correct) VALUES ({_HOUR}, 1, new.is_correct)
+            ON CONFLICT (hour) DO UPDATE SET answers = answers + 1, correct = correct + excluded.correct;
+        END""",
+    "stats_quiz_sessions_ai": f"""
+        CREATE TRIGGER stats_quiz_sessions_ai AFTER INSERT ON quiz_sessions BEGIN
+            {_bump('quizzes_started', 1)}
+            {_bump('active_sessions', 1)}
+            {_bump_activity('quizzes_started')}
+        END""",
+    "stats_quiz_sessions_au": f"""
+        CREATE TRIGGER stats_quiz_sessions_au AFTER UPDATE OF completed ON quiz_sessions
+        WHEN new.completed = 1 AND old.completed = 0 BEGIN
+            {_bump('quizzes_completed', 1)}
+            {_bump('active_sessions', -1)}
+            {_bump_activity('quizzes_completed')}
+        END""",
+    "stats_quiz_sessions_ad": f"""
+        CREATE TRIGGER stats_quiz_sessions_ad AFTER DELETE ON quiz_sessions
+        WHEN old.completed = 0 BEGIN
+            {_bump('active_sessions', -1)}
+        END""",
+}
+
+
+def ensure_stats_tables(db):
+    """Create stats_counters / stats_activity and their triggers, seeding them
+    from the existing tables the first time. Safe to call on every startup;
+    needs results_all (partitions.py) and quiz_sessions_archive (helpers.py)."""
+    exists = db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stats_counters'"
+    ).fetchone()
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS stats_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS stats_activity (
+            hour TEXT PRIMARY KEY,  -- UTC, 'YYYY-MM-DD HH'
+            answers INTEGER NOT NULL DEFAULT 0,
+            correct INTEGER NOT NULL DEFAULT 0,
+            quizzes_started INTEGER NOT NULL DEFAULT 0,
+            quizzes_completed INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    db.executemany("INSERT OR IGNORE INTO stats_counters (name) VALUES (?)", [(c,) for c in COUNTERS])
+    existing = {r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    tables = {r[0] for r in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for name, sql in STATS_TRIGGERS.items():
+        # Once the question bank is in content.db there is nothing here to hang the
+        # questions/categories triggers on; read_counters takes those from content_info
+        if name not in existing and _TRIGGER_TABLE.search(sql).group(1) in tables:
+            db.execute(sql)
+    db.commit()
+    if not exists:
+        rebuild_stats(db)
+
+
+def rebuild_stats(db):
+    """Recompute every counter and the hourly activity from the underlying
+    tables (one full pass over results_all). Returns the counters. Reads and
+    writes share one IMMEDIATE transaction, so nothing the triggers count
+    meanwhile is overwritten; writers wait for the pass to finish."""
+    counters = {
+        "questions": "SELECT COUNT(*) FROM questions",
+        "categories": "SELECT COUNT(*) FROM categories",
+        "users": "SELECT COUNT(*) FROM users",
+        "answers": "SELECT COUNT(*) FROM results_all",
+        "correct_answers": "SELECT COALESCE(SUM(is_correct), 0) FROM results_all",
+        "quizzes_started": """SELECT (SELECT COUNT(*) FROM quiz_sessions)
+                                   + (SELECT COUNT(*) FROM quiz_sessions_archive)""",
+        "quizzes_completed": """SELECT (SELECT COUNT(*) FROM quiz_sessions WHERE completed = 1)
+                                     + (SELECT COUNT(*) FROM quiz_sessions_archive)""",
+        "active_sessions": "SELECT COUNT(*) FROM quiz_sessions WHERE completed = 0",
+    }
+    db.execute("BEGIN IMMEDIATE")
+    values = {name: db.execute(sql).fetchone()[0] for name, sql in counters.items()}
+    db.executemany("INSERT OR REPLACE INTO stats_counters (name, value) VALUES (?, ?)", values.items())
+    db.execute("DELETE FROM stats_activity")
+    db.execute("""
+        INSERT INTO stats_activity (hour, answers, correct)
+        SELECT strftime('%Y-%m-%d %H', answered_at) AS hour, COUNT(*), SUM(is_correct)
+        FROM results_all WHERE answered_at IS NOT NULL GROUP BY hour
+    """)
+    # Completion time is not recorded, so history counts a quiz as completed in the hour it started
+    db.execute("""
+        INSERT INTO stats_activity (hour, quizzes_started, quizzes_completed)
+        SELECT strftime('%Y-%m-%d %H', created_at) AS hour, COUNT(*), SUM(completed) FROM (
+            SELECT created_at, completed FROM quiz_sessions
+            UNION ALL SELECT created_at, 1 FROM quiz_sessions_archive
+        ) WHERE created_at IS NOT NULL GROUP BY hour
+        ON CONFLICT (hour) DO UPDATE SET
+            quizzes_started = excluded.quizzes_started, quizzes_completed = excluded.quizzes_completed
+    """)
+    db.commit()
+    return values
+
+
+def read_counters(db):
+    """{name: value} plus the derived completion_rate (%) and answers_today."""
+    counters = dict(db.execute("SELECT name, value FROM stats_counters").fetchall())
+    info = content_info(db)
+    counters.update((name, info[name]) for name in ("questions", "categories") if name in info)
+    started = counters.get("quizzes_started", 0)
+    counters["completion_rate"] = round(counters.get("quizzes_completed", 0) * 100 / started) if started else 0
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    counters["answers_today"] = db.execute(
+        "SELECT COALESCE(SUM(answers), 0) FROM stats_activity WHERE hour >= ?", (today,)
+    ).fetchone()[0]
+    return counters
+
+
+def hourly_activity(db, hours=24):
+    """The last `hours` hours (UTC), oldest first, with empty hours filled in."""
+    now = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    keys = [(now - timedelta(hours=h)).strftime("%Y-%m-%d %H") for h in range(hours - 1, -1, -1)]
+    rows = {r["hour"]: r for r in db.execute(
+        "SELECT * FROM stats_activity WHERE hour >= ?", (keys[0],))}
+    return [_bucket(key[-2:] + ":00", rows.get(key)) for key in keys]
+
+
+def daily_activity(db, days=30):
+    """The last `days` days (UTC), oldest first, summed from the hourly rows."""
+    today = datetime.now(timezone.utc).date()
+    keys = [(today - timedelta(days=d)).isoformat() for d in range(days - 1, -1, -1)]
+    rows = {r["day"]: r for r in db.execute("""
+        SELECT substr(hour, 1, 10) AS day, SUM(answers) AS answers, SUM(correct) AS correct,
+               SUM(quizzes_started) AS quizzes_started, SUM(quizzes_completed) AS quizzes_completed
+        FROM stats_activity WHERE hour >= ? GROUP BY day
+    """, (keys[0],))}
+    return [_bucket(key[5:], rows.get(key)) for key in keys]
+
+
+def _bucket(label, row):
+    return {
+        "label": label,
+        "answers": row["answers"] if row else 0,
+        "correct": row["correct"] if row else 0,
+        "quizzes_started": row["quizzes_started"] if row else 0,
+        "quizzes_completed": row["quizzes_completed"] if row else 0,
+    }
@@ -0,0 +1,165 @@
+"""
+training_records.py
+Streaming export of answer history (training records) as CSV or JSONL.
+
+A user's history can live in three places (see partitions.py): archived
+months as .csv.gz files, monthly partition tables and the hot results table.
+The export walks them oldest first, so output is chronological without ever
+sorting the whole history, and reads each SQL source from one cursor in
+fetchmany() chunks. Per-user reads use the (user_id, answered_at) index that
+every results table carries; memory stays flat whatever the history size.
+
+since/until bound answered_at as [since, until); a bare date for `until`
+includes that whole day.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from partitions import iter_archive
+
+RECORD_FORMATS = ("csv", "jsonl")
+CHUNK_SIZE = 1000
+
+USER_COLUMNS = ("result_id", "answered_at", "category", "question_id", "question_text",
+                "answer_id", "answer_text", "is_correct", "quiz_id")
+ADMIN_COLUMNS = ("result_id", "user_id", "username") + USER_COLUMNS[1:]
+
+
+def ensure_results_user_index(db):
+    """Index the hot results table like the partitions. Safe on every startup."""
+    db.execute("CREATE INDEX IF NOT EXISTS idx_results_user_time ON results (user_id, answered_at)")
+    db.commit()
+
+
+def parse_bound(value, upper=False):
+    """'2025-01-31' or '2025-01-31T12:00[:00]' → 'YYYY-MM-DD HH:MM:SS' as stored in
+    answered_at. A bare date as an upper bound moves to the next midnight.
+    Returns None for empty input; raises ValueError on anything else."""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.strip().replace("Z", ""))
+    if upper and len(value.strip()) == 10:
+        parsed += timedelta(days=1)
+    return parsed.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _sources(db, since=None, until=None):
+    """(kind, name) of every place results live, oldest first, skipping whole
+    months outside [since, until)."""
+    first, last = (since or "")[:7], (until or "9999-12")[:7]
+    partitions = db.execute("""
+        SELECT name, state, archive_path FROM results_partitions
+        WHERE month >= ? AND month <= ? ORDER BY month
+    """, (first, last)).fetchall()
+    for p in partitions:
+        if p["state"] == "archived":
+            yield "archive", p["archive_path"]
+        else:
+            yield "table", p["name"]
+    yield "table", "results"
+
+
+def _chunks(cursor):
+    while True:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            return
+        yield from rows
+
+
+def iter_records(db, user_id=None, since=None, until=None):
+    """
+    Yield one dict per answer, oldest source first. With user_id, only that
+    user's answers (index range scan per source, in answered_at order);
+    without, everyone's in id order with the username added.
+    """
+    where, params = [], []
+    if user_id is not None:
+        where.append("r.user_id = ?")
+        params.append(user_id)
+    if since:
+        where.append("r.answered_at >= ?")
+        params.append(since)
+    if until:
+        where.append("r.answered_at < ?")
+        params.append(until)
+    where_sql = "WHERE " + " AND ".join(where) if where else ""
+    order = "r.answered_at, r.id" if user_id is not None else "r.id"
+    usernames = None
+    lookup = None
+
+    for kind, name in _sources(db, since, until):
+        if kind == "archive":
+            # Archived months are gzip'd CSV; names come from small per-question lookups
+            if lookup is None:
+                lookup = _question_lookup(db)
+                usernames = dict(db.execute("SELECT id, username FROM users")) if user_id is None else None
+            for row in iter_archive(name):
+                if user_id is not None and row["user_id"] != user_id:
+                    continue
+                if (since and row["answered_at"] < since) or (until and row["answered_at"] >= until):
+                    continue
+                question_text, category, answers = lookup.get(row["question_id"], (None, None, {}))
+                yield _record(row["id"], row["user_id"],
+                              usernames.get(row["user_id"]) if usernames is not None else None,
+                              row["answered_at"], category, row["question_id"], question_text,
+                              row["answer_id"], answers.get(row["answer_id"]), row["is_correct"], row["quiz_id"])
+            continue
+
+        cursor = db.execute(f"""
+            SELECT r.id, r.user_id, u.username, r.answered_at, c.name, r.question_id, q.question_text,
+                   r.answer_id, a.answer_text, r.is_correct, r.quiz_id
+            FROM {name} r
+            LEFT JOIN users u ON u.id = r.user_id
+            LEFT JOIN questions q ON q.id = r.question_id
+            LEFT JOIN categories c ON c.id = q.category_id
+            LEFT JOIN answers a ON a.id = r.answer_id
+            {where_sql}
+            ORDER BY {order}
+        """, params)
+        for row in _chunks(cursor):
+            yield _record(*row)
+
+
+def _question_lookup(db):
+    lookup = {}
+    for qid, text, category in db.execute("""
+            SELECT q.id, q.question_text, c.name FROM questions q
+            LEFT JOIN categories c ON c.id = q.category_id"""):
+        lookup[qid] = (text, category, {})
+    for answer_id, qid, text in db.execute("SELECT id, question_id, answer_text FROM answers"):
+        if qid in lookup:
+            lookup[qid][2][answer_id] = text
+    return lookup
+
+
+def _record(result_id, user_id, username, answered_at, category, question_id, question_text,
+            answer_id, answer_text, is_correct, quiz_id):
+    return {
+        "result_id": result_id, "user_id": user_id, "username": username,
+        "answered_at": answered_at, "category": category,
+        "question_id": question_id, "question_text": question_text,
+        "answer_id": answer_id, "answer_text": answer_text,
+        "is_correct": bool(is_correct), "quiz_id": quiz_id,
+    }
+
+
+def export_records(records, columns, fmt):
+    """Serialise an iterable of record dicts to CSV or JSONL text chunks."""
+    if fmt == "jsonl":
+        for record in records:
+            yield json.dumps({k: record[k] for k in columns}, ensure_ascii=False) + "\n"
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for i, record in enumerate(records, 1):
+        writer.writerow([int(record[k]) if k == "is_correct" else record[k] for k in columns])
+        if i % 100 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()